@@ -1,74 +1,256 @@
 # backend/app/api.py
 
-import os
+import math
 import logging
-from fastapi import APIRouter, HTTPException, File, UploadFile
+from typing import Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import StreamingResponse
-from .services import generate_ai_response, process_resume_file, generate_chat_response_stream
-from .schemas import TextPayload, ChatPayload
+from .services import (
+    generate_ai_response, stream_ai_response, replay_ai_response,
+    extract_upload, generate_chat_response_stream, response_cache_key, estimate_chat_tokens,
+)
+from .schemas import TextPayload, ChatPayload, TodoList, MentalHealthAnalysis, ResumeAnalysis
+from .model_client import model_limiter, chat_limiter, scheduler_stats
+from .scheduler import CircuitOpenError
+from .llm import get_llm_backend, ModelOutputError
+from .cache import response_cache
+from .semantic_cache import semantic_cache
+from .sse import ClosingStreamingResponse, sse_stream
+from .extraction import ExtractionLimitError
+from .uploads import read_resume_upload
+from .auth import get_optional_user
+from .usage import QuotaExceededError, current_reservation, usage_account, usage_ledger
+from . import models
 
 logger = logging.getLogger(__name__)
-router = APIRouter()
+# Every AI route is optionally authenticated: model usage is charged to, and limited by
+# the budget of, the signed-in user, or the client address for anonymous requests.
+router = APIRouter(dependencies=[Depends(usage_account)])
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-PROMPTS_DIR = os.path.join(BASE_DIR, "prompts")
+# The resume routes read their multipart body themselves (see uploads), so the upload
+# is described here for the OpenAPI docs.
+RESUME_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {"file": {"type": "string", "format": "binary", "description": "PDF or DOCX"}},
+            "required": ["file"],
+        }}},
+    }
+}
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
 
-@router.post("/generate-todo")
+def _bad_model_output(e: ModelOutputError) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
+
+
+def _semantic_cache_allowed(user: Optional[models.User]) -> bool:
+    """Signed-in users can turn off being served stored answers to similar questions."""
+    return user is None or user.semantic_cache_enabled
+
+
+def _model_unavailable(e: CircuitOpenError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": str(math.ceil(e.retry_after))},
+    )
+
+
+def _quota_exceeded(e: QuotaExceededError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=str(e),
+        headers={"Retry-After": str(math.ceil(e.retry_after))},
+    )
+
+
+# The response models document each tool's output and let FastAPI serialize it with
+# pydantic-core straight to JSON bytes.
+@router.post("/generate-todo", response_model=TodoList)
 async def handle_generate_todo(payload: TextPayload):
     logger.info("Received request for to-do generation.")
     try:
-        prompt_path = os.path.join(PROMPTS_DIR, "todo_prompt.txt")
-        if not os.path.exists(prompt_path): raise FileNotFoundError("todo_prompt.txt not found")
-        response_data = generate_ai_response(prompt_path, payload.text)
+        response_data = await generate_ai_response("todo", payload.text, endpoint="todo")
         return response_data
+    except CircuitOpenError as e:
+        raise _model_unavailable(e)
+    except QuotaExceededError as e:
+        raise _quota_exceeded(e)
+    except ModelOutputError as e:
+        raise _bad_model_output(e)
     except Exception as e:
         logger.error(f"Error generating to-do list: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/generate-todo/stream")
+async def handle_generate_todo_stream(payload: TextPayload, request: Request):
+    """Streams the to-do list over SSE: a "field" event per task as it is generated, then "result"."""
+    logger.info("Received request for streamed to-do generation.")
+    return StreamingResponse(
+        sse_stream(request, stream_ai_response("todo", payload.text, endpoint="todo")),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
 # FIX: Added the missing analyze-mental-health endpoint
-@router.post("/analyze-mental-health")
-async def handle_analyze_mental_health(payload: TextPayload):
+@router.post("/analyze-mental-health", response_model=MentalHealthAnalysis)
+async def handle_analyze_mental_health(
+    payload: TextPayload,
+    current_user: Optional[models.User] = Depends(get_optional_user),
+):
     """Handles the mental health analysis request."""
     logger.info("Received request for mental health analysis.")
     try:
-        prompt_path = os.path.join(PROMPTS_DIR, "mental_health_prompt.txt")
-        response_data = generate_ai_response(prompt_path, payload.text)
+        response_data = await generate_ai_response(
+            "mental_health", payload.text, endpoint="mental_health", semantic=_semantic_cache_allowed(current_user)
+        )
         return response_data
+    except CircuitOpenError as e:
+        raise _model_unavailable(e)
+    except QuotaExceededError as e:
+        raise _quota_exceeded(e)
+    except ModelOutputError as e:
+        raise _bad_model_output(e)
     except Exception as e:
         logger.error(f"Error during mental health analysis: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/analyze-mental-health/stream")
+async def handle_analyze_mental_health_stream(
+    payload: TextPayload,
+    request: Request,
+    current_user: Optional[models.User] = Depends(get_optional_user),
+):
+    """Streams the mental health analysis over SSE, field by field."""
+    logger.info("Received request for streamed mental health analysis.")
+    return StreamingResponse(
+        sse_stream(request, stream_ai_response(
+            "mental_health", payload.text, endpoint="mental_health", semantic=_semantic_cache_allowed(current_user)
+        )),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+async def _read_resume(request: Request) -> Tuple[str, Optional[dict], Optional[str]]:
+    """
+    Receives an uploaded resume and returns (cache_key, cached response, extracted text).
+    The text is only extracted on a cache miss. Bad uploads raise HTTP 400, oversized ones 413.
+    """
+    upload = await read_resume_upload(request)
+    try:
+        logger.info(f"Received resume {upload.filename} ({upload.size} bytes).")
+        # Key the cache on the upload's hash, taken as it arrived, so a repeat file skips
+        # extraction as well as the model call.
+        cache_key = response_cache_key("resume", "resume", upload.sha256)
+        cached = await response_cache.aget(cache_key, "resume")
+        if cached is not None:
+            return cache_key, cached, None
+
+        try:
+            resume_text = await extract_upload(upload)
+        except ExtractionLimitError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            # The type was sniffed, so this is a damaged or unsupported PDF or DOCX.
+            logger.warning(f"Could not read resume {upload.filename}: {e}")
+            raise HTTPException(status_code=400, detail="Could not read the uploaded file.")
+    finally:
+        upload.close()
+    if not resume_text or not resume_text.strip():
+        raise HTTPException(status_code=400, detail="Could not extract text from the uploaded file.")
+    return cache_key, None, resume_text
+
 # FIX: Added the missing analyze-resume endpoint
-@router.post("/analyze-resume")
-async def handle_analyze_resume(file: UploadFile = File(...)):
+@router.post("/analyze-resume", response_model=ResumeAnalysis, openapi_extra=RESUME_UPLOAD_BODY)
+async def handle_analyze_resume(request: Request):
     """Handles resume upload (PDF or DOCX) for analysis."""
-    logger.info(f"Received request for resume analysis for file: {file.filename}")
-    if not file.content_type in ["application/pdf", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"]:
-        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PDF or DOCX file.")
+    logger.info("Received request for resume analysis.")
     try:
-        resume_text = await process_resume_file(file)
-        if not resume_text or not resume_text.strip():
-            raise HTTPException(status_code=400, detail="Could not extract text from the uploaded file.")
-        
-        prompt_path = os.path.join(PROMPTS_DIR, "resume_prompt.txt")
-        response_data = generate_ai_response(prompt_path, resume_text)
+        cache_key, cached, resume_text = await _read_resume(request)
+        if cached is not None:
+            return cached
+
+        response_data = await generate_ai_response("resume", resume_text, endpoint="resume", cache_key=cache_key)
         return response_data
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        raise _model_unavailable(e)
+    except QuotaExceededError as e:
+        raise _quota_exceeded(e)
+    except ModelOutputError as e:
+        raise _bad_model_output(e)
     except Exception as e:
         logger.error(f"An error occurred during resume analysis: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/analyze-resume/stream", openapi_extra=RESUME_UPLOAD_BODY)
+async def handle_analyze_resume_stream(request: Request):
+    """
+    Streams the resume analysis over SSE. The upload is validated and its text extracted
+    before the stream opens, so a bad file is still a plain HTTP 400.
+    """
+    logger.info("Received request for streamed resume analysis.")
+    try:
+        cache_key, cached, resume_text = await _read_resume(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"An error occurred reading the resume: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    events = replay_ai_response(cached) if cached is not None else stream_ai_response(
+        "resume", resume_text, endpoint="resume", cache_key=cache_key
+    )
+    return StreamingResponse(sse_stream(request, events), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.post("/chat")
-async def handle_chat(payload: ChatPayload):
-    """Handles streaming chat requests for the interview coach."""
+async def handle_chat(
+    payload: ChatPayload,
+    request: Request,
+    current_user: Optional[models.User] = Depends(get_optional_user),
+):
+    """
+    Handles streaming chat requests for the interview coach.
+    Signed-in users get their rolling conversation summary stored with their conversation.
+    """
     logger.info("Received request for streaming chat.")
+    # Checked before the stream opens, so a user over budget gets a plain 429. The
+    # response gives back what is left of the reservation even if its body never runs.
+    try:
+        await usage_ledger.admit(estimate_chat_tokens(payload.messages))
+    except QuotaExceededError as e:
+        raise _quota_exceeded(e)
+    reservation = current_reservation.get()
     try:
-        prompt_path = os.path.join(PROMPTS_DIR, "interview_prompt.txt")
-        if not os.path.exists(prompt_path): raise FileNotFoundError("interview_prompt.txt not found")
-        return StreamingResponse(
-            generate_chat_response_stream(prompt_path, payload.messages),
-            media_type="text/event-stream"
+        return ClosingStreamingResponse(
+            sse_stream(request, generate_chat_response_stream(
+                "interview",
+                payload.messages,
+                user_id=current_user.id if current_user else None,
+                category=payload.category,
+                semantic=_semantic_cache_allowed(current_user),
+            )),
+            on_close=lambda: usage_ledger.release(reservation),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS,
         )
     except Exception as e:
+        usage_ledger.release(reservation)
         logger.error(f"Error in chat endpoint: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/model-stats")
+async def handle_model_stats():
+    """Reports the per-worker model call concurrency, queue depth, latency and upstream health."""
+    return {
+        "backend": get_llm_backend().name,
+        "json": model_limiter.stats(),
+        "chat": chat_limiter.stats(),
+        "scheduler": scheduler_stats(),
+        "cache": response_cache.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "usage": usage_ledger.stats(),
+    }
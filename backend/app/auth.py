@@ -1,22 +1,46 @@
 # backend/app/auth.py
 import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
 from . import models
-from .db import SessionLocal
+from .db import SessionLocal, get_async_session_factory
 from .schemas_auth import TokenData
+from .cache import TTLCache
+from .shared_state import shared_state
 
 JWT_SECRET = os.getenv("JWT_SECRET", "change-this-secret")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+# bcrypt cost factor. Raising it rehashes existing passwords on their next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so one thread per core hashes in parallel.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+# Hashing requests allowed to wait for a worker before new ones are shed with a 503.
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "64"))
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Decoded tokens are kept until they expire; users are kept for a short TTL. A change to
+# a user's row bumps their version counter in the shared state (when STATE_BACKEND shares
+# it), so every worker drops its copy; with per-worker state only this worker's goes.
+_token_cache = TTLCache(USER_CACHE_MAX_ENTRIES, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+_user_cache = TTLCache(USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS)
+
+logger = logging.getLogger(__name__)
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 # FIX: Update tokenUrl to match the new consistent /api prefix
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
 def get_db():
     db = SessionLocal()
@@ -25,12 +49,55 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """Async counterpart of get_db for async routes."""
+    async with get_async_session_factory()() as db:
+        yield db
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+class PasswordHashPool:
+    """Dedicated worker pool for bcrypt so logins never occupy the shared request threadpool."""
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        # Only touched from the event loop, so no lock is needed.
+        self.pending = 0
+        self.rejected = 0
+
+    async def run(self, fn, *args):
+        if self.pending >= self.workers + self.queue_limit:
+            self.rejected += 1
+            logger.warning("Password hashing pool saturated; shedding request.")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again shortly.",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+password_pool = PasswordHashPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
+
+async def hash_password_async(password: str) -> str:
+    return await password_pool.run(get_password_hash, password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verifies a password; also returns a new hash if the stored one uses outdated cost settings."""
+    return await password_pool.run(pwd_context.verify_and_update, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta if expires_delta else timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -39,13 +106,20 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return token
 
 def decode_token(token: str) -> TokenData:
+    cached = _token_cache.get(token)
+    if cached is not None:
+        return cached
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         user_id: int = payload.get("user_id")
         if username is None or user_id is None:
             raise JWTError("Missing username or user_id in token")
-        return TokenData(username=username, user_id=user_id)
+        token_data = TokenData(username=username, user_id=user_id)
+        # The signature and claims never change, so the result is valid until "exp".
+        if payload.get("exp") is not None:
+            _token_cache.set(token, token_data, expires_at=float(payload["exp"]))
+        return token_data
     except JWTError as e:
         # Re-raise with a more informative detail for debugging if needed
         raise HTTPException(
@@ -54,7 +128,56 @@ def decode_token(token: str) -> TokenData:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def _user_version(user_id: int) -> Optional[float]:
+    """The user's shared version counter; None without shared state or if it cannot be read."""
+    if shared_state is None:
+        return None
+    try:
+        return shared_state.counter(f"user-version:{user_id}")
+    except Exception as e:
+        logger.warning(f"Could not read the version of user {user_id} from {shared_state.name}: {e}")
+        return None
+
+def invalidate_user(user_id: int):
+    _user_cache.pop(user_id)
+    if shared_state is not None:
+        try:
+            # Outlives every cached copy, so no worker can miss the bump.
+            shared_state.incr(f"user-version:{user_id}", 1, USER_CACHE_TTL_SECONDS * 2)
+        except Exception as e:
+            logger.warning(f"Could not publish the change of user {user_id} to {shared_state.name}: {e}")
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _user_changed(mapper, connection, target):
+    _user_cache.pop(target.id)
+    # Other workers are told once the change has committed, so they cannot reload the old row.
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_users", set()).add(target.id)
+
+@event.listens_for(Session, "after_commit")
+def _publish_user_changes(session):
+    for user_id in session.info.pop("changed_users", ()):
+        invalidate_user(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_user_changes(session):
+    session.info.pop("changed_users", None)
+
+def _load_user(user_id: int):
+    # Only opened on a cache miss, so cached requests never check out a session.
+    db = SessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.id == user_id).first()
+        if user is not None:
+            # Detach the loaded row so it can be shared safely after the session closes.
+            db.expunge(user)
+        return user
+    finally:
+        db.close()
+
+def get_current_user(token: str = Depends(oauth2_scheme)):
     # FIX: Catch the specific HTTPException from decode_token
     try:
         token_data = decode_token(token)
@@ -62,7 +185,23 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         # Forward the specific error from decode_token
         raise e
     
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
-    if not user:
+    # Read before loading: a change committed in between then shows as a newer version.
+    version = _user_version(token_data.user_id)
+    cached = _user_cache.get(token_data.user_id)
+    user = cached[1] if cached is not None and cached[0] == version else None
+    if user is None:
+        user = _load_user(token_data.user_id)
+        if user is not None:
+            _user_cache.set(token_data.user_id, (version, user))
+    if not user or user.username != token_data.username:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    return user
\ No newline at end of file
+    return user
+
+def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme)):
+    """Like get_current_user, but anonymous or invalid credentials yield None instead of a 401."""
+    if not token:
+        return None
+    try:
+        return get_current_user(token)
+    except HTTPException:
+        return None
@@ -0,0 +1,271 @@
+# backend/app/batch.py
+import os
+import uuid
+import json
+import random
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from . import models
+from .db import SessionLocal
+from .extraction import ExtractionLimitError
+from .services import extract_resume, generate_ai_response
+from .scheduler import PRIORITY_BATCH
+from .usage import Account, USAGE_TOKEN_BUDGET, current_account
+
+logger = logging.getLogger(__name__)
+
+# Items of one worker processed at the same time, across all jobs.
+BATCH_MAX_PARALLEL = int(os.getenv("BATCH_MAX_PARALLEL", "4"))
+BATCH_MAX_ATTEMPTS = int(os.getenv("BATCH_MAX_ATTEMPTS", "3"))
+BATCH_RETRY_BASE_SECONDS = float(os.getenv("BATCH_RETRY_BASE_SECONDS", "2"))
+# A running job whose worker has not written progress for this long is taken over by another worker.
+BATCH_STALE_SECONDS = int(os.getenv("BATCH_STALE_SECONDS", "120"))
+# The owner of a running job touches it this often, however long its items take.
+BATCH_HEARTBEAT_SECONDS = BATCH_STALE_SECONDS / 3
+
+# Identifies this worker process as the owner of the jobs it runs.
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class PermanentItemError(Exception):
+    """An item that will fail the same way on every attempt, so it is not retried."""
+
+
+class JobLostError(Exception):
+    """Another worker has taken the job over; this one must stop working on it."""
+
+
+def create_job(kind: str, user_id: Optional[int], items: List[Tuple[str, Optional[str], bytes]]) -> str:
+    """Stores a job and its inputs. items are (name, content_type, payload) tuples."""
+    db = SessionLocal()
+    try:
+        job = models.BatchJob(
+            id=str(uuid.uuid4()), user_id=user_id, kind=kind, status="queued", total=len(items), worker_id=WORKER_ID
+        )
+        db.add(job)
+        db.add_all(
+            models.BatchItem(job_id=job.id, position=position, name=name, content_type=content_type, payload=payload)
+            for position, (name, content_type, payload) in enumerate(items)
+        )
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+
+def _pending_items(job_id: str) -> List[Tuple[int, str, Optional[str], bytes, int]]:
+    db = SessionLocal()
+    try:
+        return [
+            tuple(row) for row in db.query(
+                models.BatchItem.id, models.BatchItem.name, models.BatchItem.content_type,
+                models.BatchItem.payload, models.BatchItem.attempts,
+            ).filter(
+                models.BatchItem.job_id == job_id, models.BatchItem.status == "pending"
+            ).order_by(models.BatchItem.position)
+        ]
+    finally:
+        db.close()
+
+
+def _touch_owned_job(db, job_id: str, values: Optional[dict] = None) -> bool:
+    """Touches the job if this worker still owns it; False if another worker took it over."""
+    return db.query(models.BatchJob).filter(
+        models.BatchJob.id == job_id, models.BatchJob.worker_id == WORKER_ID
+    ).update({"updated_at": datetime.utcnow(), **(values or {})}, synchronize_session=False) > 0
+
+
+def _heartbeat(job_id: str) -> bool:
+    db = SessionLocal()
+    try:
+        owned = _touch_owned_job(db, job_id)
+        db.commit()
+        return owned
+    finally:
+        db.close()
+
+
+def _record_attempt(item_id: int, job_id: str, status: str, attempts: int, result: Optional[dict] = None, error: Optional[str] = None):
+    """Stores an item's attempt, in the same transaction as the job's heartbeat; raises JobLostError if the job is no longer ours."""
+    db = SessionLocal()
+    try:
+        if not _touch_owned_job(db, job_id):
+            db.rollback()
+            raise JobLostError(job_id)
+        values = {"status": status, "attempts": attempts, "error": error}
+        if result is not None:
+            values["result"] = json.dumps(result)
+        if status != "pending":
+            values["finished_at"] = datetime.utcnow()
+            values["payload"] = b""  # the input is no longer needed once the item is settled
+        db.query(models.BatchItem).filter(models.BatchItem.id == item_id).update(values, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _job_owner(job_id: str) -> Optional[int]:
+    db = SessionLocal()
+    try:
+        return db.query(models.BatchJob.user_id).filter(models.BatchJob.id == job_id).scalar()
+    finally:
+        db.close()
+
+
+def _set_job_status(job_id: str, status: str):
+    db = SessionLocal()
+    try:
+        owned = _touch_owned_job(db, job_id, {"status": status})
+        db.commit()
+    finally:
+        db.close()
+    if not owned:
+        raise JobLostError(job_id)
+
+
+def _claim_stale_jobs() -> List[str]:
+    """Takes over unfinished jobs whose worker stopped reporting progress, e.g. after a restart."""
+    db = SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - timedelta(seconds=BATCH_STALE_SECONDS)
+        stale = db.query(models.BatchJob.id).filter(
+            models.BatchJob.status.in_(("queued", "running")),
+            models.BatchJob.updated_at < cutoff,
+        ).all()
+        claimed = []
+        for (job_id,) in stale:
+            # Conditional update, so only one worker wins each job.
+            won = db.query(models.BatchJob).filter(
+                models.BatchJob.id == job_id, models.BatchJob.updated_at < cutoff
+            ).update({"worker_id": WORKER_ID, "updated_at": datetime.utcnow()}, synchronize_session=False)
+            if won:
+                claimed.append(job_id)
+        db.commit()
+        return claimed
+    finally:
+        db.close()
+
+
+async def _process_item(kind: str, name: str, content_type: Optional[str], payload: bytes) -> dict:
+    if kind == "resume":
+        try:
+            text = await extract_resume(content_type, payload)
+        except ExtractionLimitError:
+            raise
+        except Exception as e:
+            # A file that cannot be parsed will not parse on the next attempt either.
+            raise PermanentItemError(f"Could not read the file: {e}")
+        if not text or not text.strip():
+            raise PermanentItemError("Could not extract text from the uploaded file.")
+        return await generate_ai_response("resume", text, endpoint="resume", priority=PRIORITY_BATCH)
+    return await generate_ai_response("todo", payload.decode("utf-8"), endpoint="todo", priority=PRIORITY_BATCH)
+
+
+class BatchRunner:
+    """Runs batch jobs in the background with bounded parallelism and retries."""
+
+    def __init__(self, max_parallel: int):
+        self._semaphore = asyncio.Semaphore(max_parallel)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._recovery_task: Optional[asyncio.Task] = None
+
+    def start(self, job_id: str, kind: str):
+        if job_id not in self._tasks:
+            task = asyncio.create_task(self._run_job(job_id, kind))
+            self._tasks[job_id] = task
+            task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def resume_stale_jobs(self):
+        for job_id in await run_in_threadpool(_claim_stale_jobs):
+            db = SessionLocal()
+            try:
+                kind = db.query(models.BatchJob.kind).filter(models.BatchJob.id == job_id).scalar()
+            finally:
+                db.close()
+            logger.info(f"Resuming batch job {job_id}.")
+            self.start(job_id, kind)
+
+    def start_recovery(self):
+        """Periodically adopts jobs left unfinished by a worker that stopped or restarted."""
+        async def loop():
+            while True:
+                try:
+                    await self.resume_stale_jobs()
+                except Exception as e:
+                    logger.error(f"Batch job recovery failed: {e}", exc_info=True)
+                await asyncio.sleep(BATCH_STALE_SECONDS / 2)
+        self._recovery_task = asyncio.create_task(loop())
+
+    async def _heartbeat(self, job_id: str):
+        """
+        Keeps the job from looking stale while its items wait for a slot, the model or a
+        retry. Returns once another worker has taken the job over.
+        """
+        while True:
+            await asyncio.sleep(BATCH_HEARTBEAT_SECONDS)
+            try:
+                if not await run_in_threadpool(_heartbeat, job_id):
+                    return
+            except Exception as e:
+                logger.warning(f"Heartbeat of batch job {job_id} failed: {e}")
+
+    async def _run_job(self, job_id: str, kind: str):
+        # The job's model calls count towards its owner's usage, but are not held back by
+        # their budget: batch work already queues behind interactive requests.
+        user_id = await run_in_threadpool(_job_owner, job_id)
+        current_account.set(Account(f"user:{user_id}", user_id, USAGE_TOKEN_BUDGET, enforce=False) if user_id else None)
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        item_tasks = []
+        try:
+            await run_in_threadpool(_set_job_status, job_id, "running")
+            items = await run_in_threadpool(_pending_items, job_id)
+            item_tasks = [asyncio.create_task(self._run_item(job_id, kind, *item)) for item in items]
+            all_items = asyncio.gather(*item_tasks)
+            await asyncio.wait((all_items, heartbeat), return_when=asyncio.FIRST_COMPLETED)
+            if heartbeat.done():
+                raise JobLostError(job_id)
+            all_items.result()
+            await run_in_threadpool(_set_job_status, job_id, "done")
+            logger.info(f"Batch job {job_id} finished.")
+        except JobLostError:
+            logger.warning(f"Batch job {job_id} was taken over by another worker; stopping it here.")
+        finally:
+            heartbeat.cancel()
+            for task in item_tasks:
+                task.cancel()
+            await asyncio.gather(*item_tasks, return_exceptions=True)
+
+    async def _run_item(self, job_id: str, kind: str, item_id: int, name: str, content_type: Optional[str], payload: bytes, attempts: int):
+        async with self._semaphore:
+            while True:
+                attempts += 1
+                try:
+                    result = await _process_item(kind, name, content_type, payload)
+                except (PermanentItemError, ExtractionLimitError) as e:
+                    await run_in_threadpool(_record_attempt, item_id, job_id, "failed", attempts, error=str(e))
+                    return
+                except Exception as e:
+                    if attempts >= BATCH_MAX_ATTEMPTS:
+                        logger.error(f"Batch item {name} of job {job_id} failed after {attempts} attempts: {e}")
+                        await run_in_threadpool(_record_attempt, item_id, job_id, "failed", attempts, error=str(e))
+                        return
+                    await run_in_threadpool(_record_attempt, item_id, job_id, "pending", attempts, error=str(e))
+                    # Exponential backoff with full jitter.
+                    await asyncio.sleep(random.uniform(0, BATCH_RETRY_BASE_SECONDS * 2 ** (attempts - 1)))
+                    continue
+                await run_in_threadpool(_record_attempt, item_id, job_id, "done", attempts, result=result)
+                return
+
+    async def shutdown(self):
+        """Stops running jobs; their pending items are picked up again after a restart."""
+        if self._recovery_task is not None:
+            self._recovery_task.cancel()
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+
+batch_runner = BatchRunner(BATCH_MAX_PARALLEL)
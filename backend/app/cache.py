@@ -0,0 +1,258 @@
+# backend/app/cache.py
+import os
+import json
+import asyncio
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Union
+from .shared_state import SharedState, shared_state
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+RESPONSE_CACHE_DISK_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_DISK_MAX_ENTRIES", "10000"))
+# Path to a SQLite file for a cache tier that survives restarts. Empty disables it; the
+# shared state store (STATE_BACKEND) is then used as the second tier when there is one.
+RESPONSE_CACHE_DB_PATH = os.getenv("RESPONSE_CACHE_DB_PATH", "")
+# Comma-separated endpoint names that must never be served from the cache.
+RESPONSE_CACHE_DISABLED = {
+    name.strip() for name in os.getenv("RESPONSE_CACHE_DISABLED", "mental_health").split(",") if name.strip()
+}
+
+
+def normalize_text(text: str) -> str:
+    """Collapses whitespace so trivially different submissions share a cache entry."""
+    return " ".join(text.split())
+
+
+def make_key(*parts: Union[str, bytes]) -> str:
+    """Builds a content-addressed key from the given parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class TTLCache:
+    """Small thread-safe LRU mapping whose entries expire after a TTL or at an explicit time."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[object, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if now < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, expires_at: Optional[float] = None):
+        ttl_expiry = time.time() + self.ttl_seconds
+        expires_at = ttl_expiry if expires_at is None else min(expires_at, ttl_expiry)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class _DiskTier:
+    """SQLite-backed second tier, shared by every worker that points at the same file."""
+
+    name = "file"
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_created_at ON response_cache (created_at)")
+        self._conn.commit()
+
+    def get(self, key: str, min_created_at: float) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM response_cache WHERE key = ? AND created_at >= ?", (key, min_created_at)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: dict, min_created_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time()),
+            )
+            self._conn.execute("DELETE FROM response_cache WHERE created_at < ?", (min_created_at,))
+            self._conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                "SELECT key FROM response_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+
+class _SharedTier:
+    """Second tier in the shared state store, which expires entries itself."""
+
+    def __init__(self, store: SharedState, ttl_seconds: int):
+        self.name = store.name
+        self._store = store
+        self._ttl_seconds = ttl_seconds
+
+    def get(self, key: str, min_created_at: float) -> Optional[dict]:
+        try:
+            value = self._store.get(f"cache:{key}")
+        except Exception as e:
+            logger.warning(f"Could not read response cache entry from {self.name}: {e}")
+            return None
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, value: dict, min_created_at: float):
+        self._store.set(f"cache:{key}", json.dumps(value).encode("utf-8"), self._ttl_seconds)
+
+
+class ResponseCache:
+    """In-process LRU cache of model responses with TTL and an optional shared second tier."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int, db_path: str = "", disabled=(), shared: Optional[SharedState] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disabled = set(disabled)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        if db_path:
+            self._disk = _DiskTier(db_path, RESPONSE_CACHE_DISK_MAX_ENTRIES)
+        elif shared is not None:
+            self._disk = _SharedTier(shared, ttl_seconds)
+        else:
+            self._disk = None
+        self._counters = {}
+
+    def enabled_for(self, endpoint: str) -> bool:
+        return endpoint not in self.disabled
+
+    def _count(self, endpoint: str, name: str):
+        counters = self._counters.setdefault(endpoint, {"hits": 0, "disk_hits": 0, "misses": 0})
+        counters[name] += 1
+
+    def get(self, key: Optional[str], endpoint: str) -> Optional[dict]:
+        if key is None:
+            return None
+        now = time.time()
+        value = self._memory_get(key, endpoint, now)
+        if value is None and self._disk is not None:
+            value = self._tier_get(key, endpoint, now)
+        if value is None:
+            self._count(endpoint, "misses")
+        return value
+
+    async def aget(self, key: Optional[str], endpoint: str) -> Optional[dict]:
+        """get() for async callers: an in-memory hit is returned at once, the second tier is read on a thread."""
+        if key is None:
+            return None
+        now = time.time()
+        value = self._memory_get(key, endpoint, now)
+        if value is None and self._disk is not None:
+            value = await asyncio.to_thread(self._tier_get, key, endpoint, now)
+        if value is None:
+            self._count(endpoint, "misses")
+        return value
+
+    def set(self, key: Optional[str], value: dict):
+        if key is None:
+            return
+        now = time.time()
+        self._remember(key, value, now)
+        if self._disk is not None:
+            self._tier_set(key, value, now)
+
+    async def aset(self, key: Optional[str], value: dict):
+        """set() for async callers: the second tier is written on a thread."""
+        if key is None:
+            return
+        now = time.time()
+        self._remember(key, value, now)
+        if self._disk is not None:
+            await asyncio.to_thread(self._tier_set, key, value, now)
+
+    def _memory_get(self, key: str, endpoint: str, now: float) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._count(endpoint, "hits")
+                    return value
+                del self._entries[key]
+        return None
+
+    def _tier_get(self, key: str, endpoint: str, now: float) -> Optional[dict]:
+        value = self._disk.get(key, now - self.ttl_seconds)
+        if value is not None:
+            self._remember(key, value, now)
+            self._count(endpoint, "disk_hits")
+        return value
+
+    def _tier_set(self, key: str, value: dict, now: float):
+        try:
+            self._disk.set(key, value, now - self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Could not write response cache entry to the {self._disk.name} tier: {e}")
+
+    def _remember(self, key: str, value: dict, stored_at: float):
+        with self._lock:
+            self._entries[key] = (stored_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "second_tier": self._disk.name if self._disk is not None else None,
+            "disabled": sorted(self.disabled),
+            "endpoints": {name: dict(counters) for name, counters in self._counters.items()},
+        }
+
+
+response_cache = ResponseCache(
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_TTL_SECONDS,
+    db_path=RESPONSE_CACHE_DB_PATH,
+    disabled=RESPONSE_CACHE_DISABLED,
+    shared=shared_state,
+)
@@ -0,0 +1,175 @@
+# backend/app/chat_context.py
+import os
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from . import models
+from .cache import TTLCache
+from .db import SessionLocal
+from .etags import bump_versions
+from .llm import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Estimated tokens of chat history sent verbatim; older turns are folded into a summary.
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "6000"))
+# Messages are folded in fixed-size chunks so the summary only changes every few turns
+# and the same fold points are reached no matter who computes them.
+CHAT_SUMMARY_CHUNK = int(os.getenv("CHAT_SUMMARY_CHUNK", "10"))
+
+NO_SUMMARY_NOTE = "(The full conversation so far is provided as the chat history.)"
+
+_summary_cache = TTLCache(max_entries=2048, ttl_seconds=24 * 3600)
+
+Summarizer = Callable[[str, str], Awaitable[str]]
+
+
+@dataclass
+class ChatContext:
+    history: List[Dict]
+    current_message: str
+    summary: str = ""
+    summarized_messages: int = 0
+    history_tokens: int = 0
+    stats: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def chat_history_note(self) -> str:
+        """Text for the interview prompt's {chat_history} slot."""
+        if not self.summary:
+            return NO_SUMMARY_NOTE
+        return f"Summary of the earlier part of the conversation:\n{self.summary}\n\nThe most recent turns follow as chat messages."
+
+
+def _fold_point(token_counts: List[int], budget: int, chunk: int) -> int:
+    """Smallest chunk boundary after which the remaining history fits in the budget."""
+    remaining = sum(token_counts)
+    upto = 0
+    # The newest message is always sent verbatim.
+    while remaining > budget and upto + chunk <= len(token_counts) - 1:
+        remaining -= sum(token_counts[upto:upto + chunk])
+        upto += chunk
+    return upto
+
+
+def _prefix_keys(messages: List[Dict[str, str]], upto: int, chunk: int) -> Dict[int, str]:
+    """Hash of messages[:n] for every chunk boundary n <= upto, computed in one pass."""
+    digest = hashlib.sha256()
+    keys = {}
+    for index, msg in enumerate(messages[:upto], start=1):
+        digest.update(f"{msg['role']}\0{msg['content']}\0".encode("utf-8"))
+        if index % chunk == 0:
+            keys[index] = digest.hexdigest()
+    return keys
+
+
+def _transcript(messages: List[Dict[str, str]]) -> str:
+    return "\n\n".join(f"{'Student' if m['role'] == 'user' else 'Coach'}: {m['content']}" for m in messages)
+
+
+def _load_stored_summary(user_id: int, category: str) -> Optional[Tuple[str, int, str]]:
+    db = SessionLocal()
+    try:
+        row = db.query(
+            models.Conversation.summary, models.Conversation.summary_upto, models.Conversation.summary_key
+        ).filter(
+            models.Conversation.user_id == user_id,
+            models.Conversation.category == category,
+        ).first()
+        if row and row.summary and row.summary_key:
+            return row.summary, row.summary_upto, row.summary_key
+        return None
+    finally:
+        db.close()
+
+
+def _store_summary(user_id: int, category: str, summary: str, upto: int, key: str):
+    db = SessionLocal()
+    try:
+        db.query(models.Conversation).filter(
+            models.Conversation.user_id == user_id,
+            models.Conversation.category == category,
+        ).update({"summary": summary, "summary_upto": upto, "summary_key": key}, synchronize_session=False)
+        # The update moves the conversation's updated_at, which its GET returns.
+        bump_versions(db, user_id, conversations=True)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _resolve_summary(
+    messages: List[Dict[str, str]],
+    upto: int,
+    summarize: Summarizer,
+    user_id: Optional[int],
+    category: str,
+) -> str:
+    keys = _prefix_keys(messages, upto, CHAT_SUMMARY_CHUNK)
+    key = keys[upto]
+    cached = _summary_cache.get(key)
+    if cached is not None:
+        return cached
+
+    stored = await run_in_threadpool(_load_stored_summary, user_id, category) if user_id else None
+    if stored and stored[2] == key:
+        _summary_cache.set(key, stored[0])
+        return stored[0]
+
+    # Start from the newest summary we already have for an earlier fold point, so only
+    # the newly folded turns are sent to the model.
+    base, base_upto = "", 0
+    for boundary in sorted(keys, reverse=True):
+        if boundary >= upto:
+            continue
+        earlier = _summary_cache.get(keys[boundary])
+        if earlier is None and stored and stored[1] == boundary and stored[2] == keys[boundary]:
+            earlier = stored[0]
+        if earlier is not None:
+            base, base_upto = earlier, boundary
+            break
+
+    logger.info(f"Summarizing chat messages {base_upto + 1}-{upto}.")
+    summary = (await summarize(base, _transcript(messages[base_upto:upto]))).strip()
+    _summary_cache.set(key, summary)
+    if user_id:
+        await run_in_threadpool(_store_summary, user_id, category, summary, upto, key)
+    return summary
+
+
+async def build_chat_context(
+    messages: List[Dict[str, str]],
+    summarize: Summarizer,
+    user_id: Optional[int] = None,
+    category: str = "chat",
+    budget: int = CHAT_CONTEXT_TOKEN_BUDGET,
+) -> ChatContext:
+    """
+    Splits the client's messages into a rolling summary plus a verbatim window of recent
+    turns that fits the token budget. Summaries are cached in-process and, for signed-in
+    users, stored on the conversation so other workers and later sessions can reuse them.
+    """
+    token_counts = [estimate_tokens(m["content"]) for m in messages]
+    upto = _fold_point(token_counts, budget, CHAT_SUMMARY_CHUNK)
+    summary = await _resolve_summary(messages, upto, summarize, user_id, category) if upto else ""
+
+    history = [
+        {"role": "user" if m["role"] == "user" else "assistant", "content": m["content"]}
+        for m in messages[upto:-1]
+    ]
+    history_tokens = sum(token_counts[upto:])
+    return ChatContext(
+        history=history,
+        current_message=messages[-1]["content"],
+        summary=summary,
+        summarized_messages=upto,
+        history_tokens=history_tokens,
+        stats={
+            "messages": len(messages),
+            "summarized_messages": upto,
+            "history_tokens": history_tokens,
+            "summary_tokens": estimate_tokens(summary) if summary else 0,
+            "full_history_tokens": sum(token_counts),
+        },
+    )
@@ -1,19 +1,126 @@
 # backend/app/db.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import StaticPool
 import os
+from .metrics import instrument_engine
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+# Optional override for the async engine; derived from DATABASE_URL when unset.
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
 
-# For SQLite: check_same_thread
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+# Bring the schema up to date when a worker starts. Safe with several workers (they
+# take turns under a lock); turn it off to run `python -m app.migrations` as a deploy step.
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args, future=True)
-SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# NORMAL (under WAL) survives a crash of the process but may lose the last commits on a
+# power loss; FULL syncs every commit to disk, which makes commits much slower.
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+if SQLITE_SYNCHRONOUS not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+    raise RuntimeError(f"SQLITE_SYNCHRONOUS must be OFF, NORMAL, FULL or EXTRA, not {SQLITE_SYNCHRONOUS!r}.")
+
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    return _is_sqlite(url) and make_url(url).database in (None, "", ":memory:")
+
+
+def _engine_options(url: str) -> dict:
+    options = {"pool_pre_ping": True}
+    if _is_sqlite(url):
+        # For SQLite: check_same_thread
+        options["connect_args"] = {"check_same_thread": False}
+        if _is_sqlite_memory(url):
+            # An in-memory database lives and dies with its connection, so every thread
+            # has to share the one connection; pool sizing does not apply.
+            options["poolclass"] = StaticPool
+            return options
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers run alongside the single writer; NORMAL sync (the default) is safe under WAL."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+
+engine = create_engine(DATABASE_URL, future=True, **_engine_options(DATABASE_URL))
+if _is_sqlite(DATABASE_URL):
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+instrument_engine(engine)
+
+# A plain sessionmaker: each request gets its own session from get_db, independent of
+# whichever threadpool thread happens to run it.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
 
 Base = declarative_base()
 
+_async_engine = None
+_async_session_factory = None
+
+
+def _async_url() -> str:
+    if ASYNC_DATABASE_URL:
+        return ASYNC_DATABASE_URL
+    if _is_sqlite_memory(DATABASE_URL):
+        # The async engine would open a second, empty database of its own.
+        raise RuntimeError("An in-memory SQLite database cannot be shared with the async engine; use a file.")
+    url = make_url(DATABASE_URL)
+    driver = _ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise RuntimeError(f"No async driver known for {url.get_backend_name()}; set ASYNC_DATABASE_URL.")
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def get_async_session_factory():
+    """Creates the async engine on first use, so the async driver is only needed if it is used."""
+    global _async_engine, _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        url = _async_url()
+        _async_engine = create_async_engine(url, **_engine_options(url))
+        if _is_sqlite(url):
+            event.listen(_async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+        instrument_engine(_async_engine.sync_engine)
+        _async_session_factory = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_session_factory
+
+
+async def dispose_engines():
+    engine.dispose()
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
+
 def init_db():
+    """Creates missing tables and applies pending migrations, one process at a time."""
     # Import models here to ensure they are registered with metadata
     from app import models  # noqa
-    Base.metadata.create_all(bind=engine)
+    from app.migrations import migration_lock, run_migrations
+    with migration_lock(engine):
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
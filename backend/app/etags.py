@@ -0,0 +1,83 @@
+# backend/app/etags.py
+import hashlib
+import logging
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request, Response
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# Browsers keep the body but check it is still current before every use; the check is
+# a 304 with no body when it is.
+CACHE_CONTROL = "private, no-cache"
+
+
+def bump_versions(db: Session, user_id: int, results: bool = False, conversations: bool = False):
+    """
+    Marks a user's results and/or conversations as changed, invalidating the ETags
+    handed out for them. Call it in the same transaction as the write, before the commit.
+    """
+    values = {models.User.data_updated_at: datetime.utcnow()}
+    if results:
+        values[models.User.results_version] = models.User.results_version + 1
+    if conversations:
+        values[models.User.conversations_version] = models.User.conversations_version + 1
+    # A bulk UPDATE: it does not load the user or fire the ORM events that would evict it from the user cache.
+    db.execute(
+        update(models.User).where(models.User.id == user_id).values(values),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def read_versions(db: Session, user_id: int):
+    """The user's version counters: a primary-key lookup, far cheaper than the data they stand for."""
+    return db.execute(
+        select(
+            models.User.results_version, models.User.conversations_version, models.User.data_updated_at
+        ).where(models.User.id == user_id)
+    ).one()
+
+
+def make_etag(request: Request, *parts) -> str:
+    """
+    A weak ETag for this URL (path and query) and the given version parts. Weak, as the
+    same representation may be sent gzip-compressed or not.
+    """
+    digest = hashlib.sha1(repr((request.url.path, request.url.query, *parts)).encode("utf-8")).hexdigest()
+    return f'W/"{digest[:24]}"'
+
+
+def cache_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+    return headers
+
+
+def _is_fresh(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison: W/"x" and "x" match.
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).astimezone(timezone.utc).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have whole seconds, so two changes within a second look the same here;
+    # clients that send If-None-Match (all browsers) are not affected.
+    return last_modified.replace(microsecond=0) <= since
+
+
+def not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """Returns a 304 response if the client's copy (If-None-Match, else If-Modified-Since) is current, else None."""
+    if not _is_fresh(request, etag, last_modified):
+        return None
+    return Response(status_code=304, headers=cache_headers(etag, last_modified))
@@ -0,0 +1,131 @@
+# backend/app/extraction.py
+# Resume text extraction. Runs in worker processes, so everything here must be
+# importable on its own and every entry point must take and return picklable values.
+# python-docx and PyPDF2 are imported on first use, so importing this module (the API
+# does, for the constants and exception) stays cheap.
+import io
+import os
+import mmap
+import time
+from typing import IO, Iterator, Union
+from .resume_text import PAGE_BREAK, RESUME_NORMALIZE, normalize_resume_text
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PDF_MIME = "application/pdf"
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+RESUME_MAX_PAGES = int(os.getenv("RESUME_MAX_PAGES", "50"))
+RESUME_EXTRACT_CPU_SECONDS = int(os.getenv("RESUME_EXTRACT_CPU_SECONDS", "10"))
+# Extraction stops once this many (estimated) tokens of text have been collected.
+RESUME_TOKEN_BUDGET = int(os.getenv("RESUME_TOKEN_BUDGET", "12000"))
+CHARS_PER_TOKEN = 4
+
+
+class ExtractionLimitError(ValueError):
+    """Raised when a file exceeds the page-count or CPU-time limits for extraction."""
+
+
+def iter_pdf_pages(file: IO[bytes], max_pages: int = RESUME_MAX_PAGES) -> Iterator[str]:
+    """Yields the text of a PDF one page at a time."""
+    from PyPDF2 import PdfReader
+
+    pdf_reader = PdfReader(file)
+    page_count = len(pdf_reader.pages)
+    if page_count > max_pages:
+        raise ExtractionLimitError(f"PDF has {page_count} pages; the limit is {max_pages}.")
+    for page in pdf_reader.pages:
+        yield page.extract_text() or ""
+
+
+def iter_docx_paragraphs(file: IO[bytes]) -> Iterator[str]:
+    """Yields the text of a DOCX one paragraph at a time."""
+    import docx
+
+    doc = docx.Document(file)
+    for paragraph in doc.paragraphs:
+        yield paragraph.text
+
+
+def preload():
+    """Imports the parsers ahead of the first resume. Run in each extraction worker by the warm-up."""
+    import docx  # noqa: F401
+    import PyPDF2  # noqa: F401
+
+
+def _set_cpu_limit(seconds: int):
+    """Hard backstop: the kernel kills the worker if a single page spins past the budget."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime)
+    previous = resource.getrlimit(resource.RLIMIT_CPU)
+    hard = previous[1]
+    soft = used + 2 * seconds + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    return previous
+
+
+def extract_resume_text(
+    content_type: str,
+    data: Union[bytes, mmap.mmap],
+    max_pages: int = RESUME_MAX_PAGES,
+    token_budget: int = RESUME_TOKEN_BUDGET,
+    cpu_seconds: int = RESUME_EXTRACT_CPU_SECONDS,
+) -> str:
+    """
+    Extracts resume text page by page, stopping early once the token budget is reached.
+    data is the file's bytes or a memory map of it, which the parsers read in place.
+    Raises ExtractionLimitError if the file has too many pages or uses too much CPU.
+    """
+    stream = data if isinstance(data, mmap.mmap) else io.BytesIO(data)
+    if content_type == PDF_MIME:
+        pieces = iter_pdf_pages(stream, max_pages)
+        separator = PAGE_BREAK
+    elif content_type == DOCX_MIME:
+        pieces = iter_docx_paragraphs(stream)
+        separator = "\n"
+    else:
+        raise ValueError("Unsupported file type")
+
+    max_chars = token_budget * CHARS_PER_TOKEN
+    previous_limit = _set_cpu_limit(cpu_seconds)
+    deadline = time.process_time() + cpu_seconds
+    chunks = []
+    total = 0
+    try:
+        for piece in pieces:
+            chunks.append(piece)
+            total += len(piece) + 1
+            if total >= max_chars:
+                break
+            if time.process_time() > deadline:
+                raise ExtractionLimitError(f"Extraction exceeded {cpu_seconds}s of CPU time.")
+    finally:
+        if previous_limit is not None:
+            resource.setrlimit(resource.RLIMIT_CPU, previous_limit)
+    return separator.join(chunks)[:max_chars]
+
+
+def prepare_resume_text(content_type: str, data: Union[bytes, mmap.mmap]) -> str:
+    """Extracts resume text and cleans it up for the prompt (see resume_text)."""
+    text = extract_resume_text(content_type, data)
+    return normalize_resume_text(text) if RESUME_NORMALIZE else text
+
+
+class _MappedFile(mmap.mmap):
+    """A read-only memory map the parsers can use as a file (zipfile asks for seekable(), added to mmap in 3.13)."""
+
+    def seekable(self) -> bool:
+        return True
+
+
+def prepare_resume_file(content_type: str, path: str) -> str:
+    """prepare_resume_text for a file on disk, memory-mapped rather than read into a copy."""
+    with open(path, "rb") as f, _MappedFile(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return prepare_resume_text(content_type, mapped)
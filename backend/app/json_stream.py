@@ -0,0 +1,187 @@
+# backend/app/json_stream.py
+import orjson
+from typing import Any, Iterator, List, Optional, Tuple, Union
+
+PathKey = Union[str, int]
+Path = Tuple[PathKey, ...]
+
+WHITESPACE = " \t\r\n"
+
+
+def _emits(path: Path, is_container: bool) -> bool:
+    """
+    Which completed values are worth sending on their own: each element of an array
+    (whole, however deep it is), and each scalar field on the way down to one. Objects are
+    not sent whole because their fields already were; arrays because their elements were.
+    """
+    indexes = [i for i, key in enumerate(path) if isinstance(key, int)]
+    if indexes:
+        return indexes == [len(path) - 1]
+    return not is_container and bool(path)
+
+
+def iter_fields(value: Any, path: Path = ()) -> Iterator[Tuple[Path, Any]]:
+    """The (path, value) pairs JSONStreamParser would emit for an already complete value."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from iter_fields(item, path + (key,))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            yield path + (index,), item
+    elif _emits(path, False):
+        yield path, value
+
+
+class _Frame:
+    __slots__ = ("is_object", "start", "key", "index", "expect_key")
+
+    def __init__(self, is_object: bool, start: int):
+        self.is_object = is_object
+        self.start = start
+        self.key: Optional[str] = None
+        self.index = -1
+        self.expect_key = is_object
+
+
+class JSONStreamParser:
+    """
+    Parses a JSON document that arrives in pieces and reports each value as soon as its
+    closing character is seen. Every character is scanned once; only the values that are
+    emitted are handed to orjson. Text before the first { or [ (e.g. a ```json fence)
+    and after the end of the document is ignored.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._string_is_key = False
+        self._scalar_start: Optional[int] = None
+        self._root_started = False
+        # Where a truncated document can be cut and closed: the end of the last complete
+        # value or opening bracket that is not inside a half-written array element.
+        self._safe_end = 0
+        self._safe_depth = 0
+        self.done = False
+        self.result: Any = None
+
+    def feed(self, chunk: str) -> List[Tuple[Path, Any]]:
+        """Adds text and returns the (path, value) pairs completed by it, in document order."""
+        self._text += chunk
+        events: List[Tuple[Path, Any]] = []
+        text = self._text
+        i = self._pos
+        while i < len(text) and not self.done:
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._string_is_key:
+                        self._stack[-1].key = orjson.loads(text[self._string_start:i + 1])
+                    else:
+                        self._complete(self._string_start, i + 1, events)
+                i += 1
+                continue
+
+            if self._scalar_start is not None:
+                if c not in ",}]" and c not in WHITESPACE:
+                    i += 1
+                    continue
+                self._complete(self._scalar_start, i, events)
+                self._scalar_start = None
+
+            if not self._root_started:
+                if c in "{[":
+                    self._root_started = True
+                else:
+                    i += 1
+                    continue
+
+            if c == ":":
+                self._stack[-1].expect_key = False
+            elif c == ",":
+                if self._stack[-1].is_object:
+                    self._stack[-1].expect_key = True
+            elif c == '"':
+                self._in_string = True
+                self._string_start = i
+                self._string_is_key = bool(self._stack) and self._stack[-1].expect_key
+                if not self._string_is_key:
+                    self._begin()
+            elif c in "{[":
+                self._begin()
+                self._stack.append(_Frame(c == "{", i))
+                self._mark_safe(i + 1)
+            elif c in "}]":
+                frame = self._stack.pop()
+                self._complete(frame.start, i + 1, events)
+            elif c not in WHITESPACE:
+                self._begin()
+                self._scalar_start = i
+            i += 1
+        self._pos = i
+        return events
+
+    def close(self) -> str:
+        """
+        The document so far, cut after its last complete value and with the open arrays
+        and objects closed. Used to salvage output the model stopped generating part way.
+        """
+        if not self._root_started:
+            raise ValueError("No JSON document found in the model output.")
+        if self.done:
+            return self._text
+        closers = "".join("}" if frame.is_object else "]" for frame in reversed(self._stack[:self._safe_depth]))
+        return self._text[:self._safe_end] + closers
+
+    def _mark_safe(self, end: int):
+        if all(frame.is_object for frame in self._stack[:-1]):
+            self._safe_end, self._safe_depth = end, len(self._stack)
+
+    def _begin(self):
+        if self._stack and not self._stack[-1].is_object:
+            self._stack[-1].index += 1
+
+    def _complete(self, start: int, end: int, events: List[Tuple[Path, Any]]):
+        if not self._stack:
+            self.result = orjson.loads(self._text[start:end])
+            self.done = True
+            return
+        self._mark_safe(end)
+        path = tuple(frame.key if frame.is_object else frame.index for frame in self._stack)
+        if _emits(path, self._text[start] in "{["):
+            events.append((path, orjson.loads(self._text[start:end])))
+
+
+def parse_model_json(text: str) -> Tuple[Any, bool]:
+    """
+    Parses the JSON a model returned, returning (value, repaired). Output that is not
+    valid as it stands is repaired locally where possible: text around the document
+    (code fences, a preamble) is dropped and a truncated document is cut after its last
+    complete value and closed. Raises ValueError if the output cannot be salvaged.
+    """
+    try:
+        return orjson.loads(text), False
+    except orjson.JSONDecodeError:
+        pass
+    # Usually the document is whole and only wrapped (a fence, a preamble): try the span
+    # from its first opening to its last closing bracket before scanning in Python.
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    end = max(text.rfind("}"), text.rfind("]"))
+    if 0 <= start < end:
+        try:
+            return orjson.loads(text[start:end + 1]), True
+        except orjson.JSONDecodeError:
+            pass
+    parser = JSONStreamParser()
+    parser.feed(text)
+    if parser.done:
+        return parser.result, True
+    return orjson.loads(parser.close()), True
@@ -0,0 +1,97 @@
+# backend/app/lifecycle.py
+import os
+import signal
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# How long open streams (chat replies, batch result feeds) may keep running once the
+# server starts shutting down. Keep it below the server's own graceful timeout
+# (uvicorn --timeout-graceful-shutdown, gunicorn --graceful-timeout).
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "20"))
+
+
+class StreamDrain:
+    """
+    Tracks open streaming responses so shutdown can let them finish instead of cutting
+    them off. Draining starts on SIGTERM/SIGINT: from then on streams that can end early
+    (result feeds) do so, and after SHUTDOWN_DRAIN_SECONDS the rest are told to stop.
+    """
+
+    def __init__(self):
+        self.active = 0
+        self.draining = False
+        self._stop: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def stop_event(self) -> asyncio.Event:
+        """Set when streams still open must stop."""
+        if self._stop is None:
+            self._stop = asyncio.Event()
+        return self._stop
+
+    def _idle_event(self) -> asyncio.Event:
+        if self._idle is None:
+            self._idle = asyncio.Event()
+            if self.active == 0:
+                self._idle.set()
+        return self._idle
+
+    @contextmanager
+    def track(self):
+        self.active += 1
+        self._idle_event().clear()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            if self.active == 0:
+                self._idle_event().set()
+
+    def start(self, timeout: float = SHUTDOWN_DRAIN_SECONDS) -> asyncio.Task:
+        if self._task is None:
+            self.draining = True
+            logger.info(f"Draining {self.active} open streams (up to {timeout:.0f}s).")
+            self._task = asyncio.ensure_future(self._drain(timeout))
+        return self._task
+
+    async def _drain(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._idle_event().wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping {self.active} streams still open after {timeout:.0f}s.")
+            self.stop_event().set()
+            # Give them a moment to send their last frame and close.
+            try:
+                await asyncio.wait_for(self._idle_event().wait(), 2)
+            except asyncio.TimeoutError:
+                pass
+
+    def install_signal_handlers(self):
+        """
+        Starts draining as soon as the server is told to stop, by chaining onto the server's
+        own SIGTERM/SIGINT handlers. The server stops accepting connections and waits for
+        open ones before it runs the lifespan shutdown, so that would be too late.
+        """
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            previous = signal.getsignal(sig)
+            if not callable(previous):
+                continue
+
+            def handler(signum, frame, previous=previous):
+                loop.call_soon_threadsafe(self.start)
+                previous(signum, frame)
+
+            try:
+                signal.signal(sig, handler)
+            except ValueError:
+                # Not the main thread (e.g. the test client); the lifespan shutdown still drains.
+                return
+
+
+stream_drain = StreamDrain()
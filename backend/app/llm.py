@@ -0,0 +1,353 @@
+# backend/app/llm.py
+import os
+import json
+import math
+import random
+import asyncio
+import hashlib
+import logging
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Which model backend serves AI requests: "gemini" in production, "stub" for offline
+# development, load tests and profiling.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-2.5-flash")
+
+json_generation_config = { "temperature": 1, "top_p": 0.95, "top_k": 64, "max_output_tokens": 8192, "response_mime_type": "application/json",}
+chat_generation_config = { "temperature": 0.9, "top_p": 1, "top_k": 32, "max_output_tokens": 8192, "response_mime_type": "text/plain",}
+
+# HTTP statuses from the Gemini API that are retried.
+GEMINI_TRANSIENT_CODES = (429, 500, 502, 503, 504)
+
+# Stub behaviour. Latency is the time until the first token; output then arrives at
+# LLM_STUB_TOKENS_PER_SECOND. The latency distribution is one of fixed, uniform,
+# exponential or lognormal, with LLM_STUB_LATENCY_SPREAD as its relative spread.
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "300"))
+LLM_STUB_LATENCY_DIST = os.getenv("LLM_STUB_LATENCY_DIST", "lognormal").lower()
+LLM_STUB_LATENCY_SPREAD = float(os.getenv("LLM_STUB_LATENCY_SPREAD", "0.5"))
+LLM_STUB_TOKENS_PER_SECOND = float(os.getenv("LLM_STUB_TOKENS_PER_SECOND", "80"))
+# Rate at which the stub "reads" the prompt before answering; 0 makes prompt size free.
+LLM_STUB_PREFILL_TOKENS_PER_SECOND = float(os.getenv("LLM_STUB_PREFILL_TOKENS_PER_SECOND", "0"))
+LLM_STUB_FAILURE_RATE = float(os.getenv("LLM_STUB_FAILURE_RATE", "0"))
+# Share of JSON replies returned malformed: wrapped in a code fence or cut off part way.
+LLM_STUB_MALFORMED_RATE = float(os.getenv("LLM_STUB_MALFORMED_RATE", "0"))
+LLM_STUB_SEED = int(os.getenv("LLM_STUB_SEED", "0"))
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (about four characters per token for English text)."""
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
+
+
+class LLMError(RuntimeError):
+    """Raised when the model backend fails to produce a response."""
+
+
+class TransientLLMError(LLMError):
+    """A failure that is likely to go away on retry, such as a rate limit or an overloaded upstream."""
+
+
+class ModelOutputError(LLMError):
+    """Raised when a model response cannot be parsed or does not match its schema."""
+
+
+class LLMBackend:
+    """
+    The operations the API needs from a language model. Chat history is a list of
+    {"role": "user" | "assistant", "content": str} messages, oldest first.
+    """
+
+    name = "base"
+
+    def check(self):
+        """Validates the configuration at startup. Raises RuntimeError if the backend cannot work."""
+
+    def warm_up(self):
+        """Loads SDKs and clients ahead of the first call. Runs in a thread, after startup."""
+
+    def fingerprint(self) -> str:
+        """Identifies the model and settings, for cache keys: a different backend never shares cached responses."""
+        raise NotImplementedError
+
+    async def generate_json(self, prompt: str, kind: Optional[str] = None) -> str:
+        """Returns the raw JSON text for a prompt. kind names the prompt template, if known."""
+        raise NotImplementedError
+
+    def stream_json(self, prompt: str, kind: Optional[str] = None) -> AsyncIterator[str]:
+        """Yields the JSON text for a prompt in pieces, as the model produces it."""
+        raise NotImplementedError
+
+    async def generate_text(self, prompt: str, kind: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    def stream_chat(self, system_instruction: str, history: List[Dict[str, str]], message: str) -> AsyncIterator[str]:
+        """Yields the reply to message as text chunks."""
+        raise NotImplementedError
+
+    async def count_tokens(self, text: str) -> int:
+        raise NotImplementedError
+
+    def is_transient(self, exc: BaseException) -> bool:
+        """Whether a failed call is worth retrying, and counts as the upstream being unhealthy."""
+        return isinstance(exc, (TransientLLMError, asyncio.TimeoutError, ConnectionError))
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini via the google-generativeai SDK."""
+
+    name = "gemini"
+
+    def __init__(self, model_name: str = GEMINI_MODEL_NAME):
+        self.model_name = model_name
+        self._genai = None
+        self._json_model = None
+        self._chat_model = None
+        self._chat_model_for = lru_cache(maxsize=64)(self._build_chat_model)
+
+    def check(self):
+        # Only the key is checked here; importing and configuring the SDK is left to
+        # warm_up or the first call, so it does not hold up startup.
+        if not os.getenv("GEMINI_API_KEY"):
+            logger.error("GEMINI_API_KEY not set.")
+            raise RuntimeError("GEMINI_API_KEY environment variable not found.")
+
+    def warm_up(self):
+        self._configure()
+
+    def _configure(self):
+        """Lazily configure the Gemini API and initialize model instances."""
+        if self._json_model is not None:
+            return
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            logger.error("GEMINI_API_KEY not set.")
+            raise RuntimeError("GEMINI_API_KEY environment variable not found.")
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self._json_model = genai.GenerativeModel(self.model_name, generation_config=json_generation_config)
+        self._chat_model = genai.GenerativeModel(self.model_name, generation_config=chat_generation_config)
+        logger.info("Gemini models initialized.")
+
+    def _build_chat_model(self, system_instruction: str):
+        """Chat model with the coach instructions in the system-instruction slot."""
+        return self._genai.GenerativeModel(
+            self.model_name, generation_config=chat_generation_config, system_instruction=system_instruction
+        )
+
+    def fingerprint(self) -> str:
+        return f"gemini:{self.model_name}:{json.dumps(json_generation_config, sort_keys=True)}"
+
+    @staticmethod
+    def _text(response) -> str:
+        if hasattr(response, "text") and response.text:
+            return response.text
+        logger.error("Model response had no text field.")
+        raise LLMError("No response text from model.")
+
+    async def generate_json(self, prompt: str, kind: Optional[str] = None) -> str:
+        self._configure()
+        return self._text(await self._json_model.generate_content_async(prompt))
+
+    async def stream_json(self, prompt: str, kind: Optional[str] = None) -> AsyncIterator[str]:
+        self._configure()
+        response = await self._json_model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    async def generate_text(self, prompt: str, kind: Optional[str] = None) -> str:
+        self._configure()
+        return self._text(await self._chat_model.generate_content_async(prompt))
+
+    async def stream_chat(self, system_instruction: str, history: List[Dict[str, str]], message: str) -> AsyncIterator[str]:
+        self._configure()
+        chat_session = self._chat_model_for(system_instruction).start_chat(history=[
+            {"role": "user" if m["role"] == "user" else "model", "parts": [m["content"]]} for m in history
+        ])
+        response = await chat_session.send_message_async(message, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    async def count_tokens(self, text: str) -> int:
+        self._configure()
+        return (await self._json_model.count_tokens_async(text)).total_tokens
+
+    def is_transient(self, exc: BaseException) -> bool:
+        # google.api_core errors carry the HTTP status: 429 quota, 5xx upstream trouble.
+        return super().is_transient(exc) or getattr(exc, "code", None) in GEMINI_TRANSIENT_CODES
+
+
+# Canned JSON for each template, shaped like the real model's output so the frontend and
+# any response validation behave the same against the stub.
+STUB_JSON_RESPONSES = {
+    "todo": lambda n: {"todos": [
+        {"id": i + 1, "task": f"Stub task {i + 1}", "steps": ["Plan the work.", "Do the work.", "Review the result."]}
+        for i in range(1 + n % 4)
+    ]},
+    "mental_health": lambda n: {"analysis": {
+        "summary": "This is a stub reflection on what you wrote.",
+        "key_emotion": ["calm", "stress", "hope", "worry"][n % 4],
+        "suggestions": ["Take a short walk.", "Write down one thing that went well.", "Talk to someone you trust."],
+        "affirmation": "You are doing your best, and that is enough.",
+    }},
+    "resume": lambda n: {"analysis": {
+        "overall_summary": "This is a stub resume analysis.",
+        "ats_compatibility_score": {"score": 40 + n % 60, "explanation": "Stub score derived from the resume text."},
+        "section_feedback": {
+            "contact_info": "Stub feedback.",
+            "work_experience": "Stub feedback.",
+            "skills": "Stub feedback.",
+            "education": "Stub feedback.",
+        },
+        "recommendations": [f"Stub recommendation {i + 1}." for i in range(5)],
+    }},
+}
+
+STUB_WORDS = (
+    "that is a good start let us go one level deeper tell me about a time you had to make "
+    "a difficult trade off what did you measure and what would you do differently next time"
+).split()
+
+
+class StubBackend(LLMBackend):
+    """
+    A local stand-in for the model with configurable latency, token rate and failure
+    injection. Output depends only on the prompt, so repeated runs produce the same
+    responses; timing and failures come from a seeded generator.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        latency_ms: float = LLM_STUB_LATENCY_MS,
+        latency_dist: str = LLM_STUB_LATENCY_DIST,
+        latency_spread: float = LLM_STUB_LATENCY_SPREAD,
+        tokens_per_second: float = LLM_STUB_TOKENS_PER_SECOND,
+        prefill_tokens_per_second: float = LLM_STUB_PREFILL_TOKENS_PER_SECOND,
+        failure_rate: float = LLM_STUB_FAILURE_RATE,
+        malformed_rate: float = LLM_STUB_MALFORMED_RATE,
+        seed: int = LLM_STUB_SEED,
+    ):
+        if latency_dist not in ("fixed", "uniform", "exponential", "lognormal"):
+            raise RuntimeError(f"Unknown LLM_STUB_LATENCY_DIST: {latency_dist}")
+        self.latency_ms = latency_ms
+        self.latency_dist = latency_dist
+        self.latency_spread = latency_spread
+        self.tokens_per_second = tokens_per_second
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.failure_rate = failure_rate
+        self.malformed_rate = malformed_rate
+        self._random = random.Random(seed)
+
+    def fingerprint(self) -> str:
+        return "stub:v1"
+
+    def _prefill(self, prompt: str) -> float:
+        return estimate_tokens(prompt) / self.prefill_tokens_per_second if self.prefill_tokens_per_second else 0.0
+
+    def _latency(self) -> float:
+        mean = self.latency_ms / 1000
+        if self.latency_dist == "uniform":
+            return mean * self._random.uniform(1 - self.latency_spread, 1 + self.latency_spread)
+        if self.latency_dist == "exponential":
+            return self._random.expovariate(1 / mean) if mean > 0 else 0.0
+        if self.latency_dist == "lognormal":
+            # Parameterized so that the mean stays latency_ms whatever the spread.
+            sigma = self.latency_spread
+            return self._random.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma) if mean > 0 else 0.0
+        return mean
+
+    def _maybe_fail(self):
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise TransientLLMError("Injected stub failure.")
+
+    async def _respond(self, prompt: str, text: str):
+        """Sleeps as long as the real model would take to read prompt and return text in one piece."""
+        await asyncio.sleep(self._prefill(prompt) + self._latency() + estimate_tokens(text) / self.tokens_per_second)
+        self._maybe_fail()
+
+    @staticmethod
+    def _digest(prompt: str) -> int:
+        return int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:4], "big")
+
+    def _reply(self, prompt: str, words: int) -> str:
+        n = self._digest(prompt)
+        return " ".join(STUB_WORDS[(n + i) % len(STUB_WORDS)] for i in range(words)).capitalize() + "?"
+
+    def _json_reply(self, prompt: str, kind: Optional[str]) -> str:
+        return json.dumps(STUB_JSON_RESPONSES.get(kind, lambda n: {"stub": n})(self._digest(prompt)))
+
+    def _maybe_malform(self, text: str) -> str:
+        if not self.malformed_rate or self._random.random() >= self.malformed_rate:
+            return text
+        if self._random.random() < 0.5:
+            return f"```json\n{text}\n```"
+        return text[:self._random.randrange(len(text) // 2, len(text))]
+
+    async def generate_json(self, prompt: str, kind: Optional[str] = None) -> str:
+        text = self._maybe_malform(self._json_reply(prompt, kind))
+        await self._respond(prompt, text)
+        return text
+
+    async def stream_json(self, prompt: str, kind: Optional[str] = None) -> AsyncIterator[str]:
+        async for chunk in self._paced(prompt, self._json_reply(prompt, kind), 64):
+            yield chunk
+
+    async def generate_text(self, prompt: str, kind: Optional[str] = None) -> str:
+        text = self._reply(prompt, 40)
+        await self._respond(prompt, text)
+        return text
+
+    async def _paced(self, prompt: str, text: str, chunk_chars: int) -> AsyncIterator[str]:
+        """Yields text in chunks at the configured token rate, failing part way through if a failure is injected."""
+        await asyncio.sleep(self._prefill(prompt) + self._latency())
+        # Fail at a random point of the reply, as a dropped upstream stream would.
+        fail_at = len(text) + 1
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            fail_at = self._random.randrange(len(text))
+        for start in range(0, len(text), chunk_chars):
+            if start >= fail_at:
+                raise TransientLLMError("Injected stub failure.")
+            chunk = text[start:start + chunk_chars]
+            await asyncio.sleep(estimate_tokens(chunk) / self.tokens_per_second)
+            yield chunk
+
+    async def stream_chat(self, system_instruction: str, history: List[Dict[str, str]], message: str) -> AsyncIterator[str]:
+        prompt = "\n".join([system_instruction, *(turn["content"] for turn in history), message])
+        async for chunk in self._paced(prompt, self._reply(f"{len(history)}\0{message}", 60), 24):
+            yield chunk
+
+    async def count_tokens(self, text: str) -> int:
+        return estimate_tokens(text)
+
+
+BACKENDS = {"gemini": GeminiBackend, "stub": StubBackend}
+
+_backend: Optional[LLMBackend] = None
+
+
+def get_llm_backend() -> LLMBackend:
+    """The configured backend, created on first use."""
+    global _backend
+    if _backend is None:
+        if LLM_BACKEND not in BACKENDS:
+            raise RuntimeError(f"Unknown LLM_BACKEND '{LLM_BACKEND}'; expected one of {', '.join(BACKENDS)}.")
+        _backend = BACKENDS[LLM_BACKEND]()
+        logger.info(f"Using the '{_backend.name}' model backend.")
+    return _backend
+
+
+def set_llm_backend(backend: LLMBackend):
+    """Replaces the configured backend, e.g. with a differently tuned stub."""
+    global _backend
+    _backend = backend
@@ -0,0 +1,200 @@
+# backend/app/metrics.py
+import os
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Send stage timings as OpenTelemetry spans too. Spans go to whichever tracer provider
+# is configured, e.g. by running the server under `opentelemetry-instrument`.
+OTEL_TRACING = os.getenv("OTEL_TRACING", "false").lower() in ("1", "true", "yes")
+
+# Per-request sampling profiler, switched on by sending the X-Profile header. When
+# PROFILER_TOKEN is set the header must carry it. Needs pyinstrument installed.
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")
+PROFILER_OUTPUT_DIR = os.getenv("PROFILER_OUTPUT_DIR", "./profiles")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time from request start to the end of the response body.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge("http_requests_in_progress", "Requests currently being served.", ["method"])
+STAGE_DURATION = Histogram(
+    "stage_duration_seconds", "Time spent in one stage of handling a request.", ["stage"], buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time.", ["operation"], buckets=LATENCY_BUCKETS,
+)
+CHAT_TIME_TO_FIRST_TOKEN = Histogram(
+    "chat_time_to_first_token_seconds", "Time from sending a chat turn to the first streamed chunk.", buckets=LATENCY_BUCKETS,
+)
+CHAT_TOKENS_PER_SECOND = Histogram(
+    "chat_tokens_per_second", "Estimated output tokens per second of a streamed chat reply, after the first chunk.",
+    buckets=(5, 10, 20, 40, 60, 80, 100, 150, 200, 400),
+)
+MODEL_CALLS = Counter("model_calls_total", "Upstream model calls by outcome.", ["kind", "outcome"])
+MODEL_JSON_OUTPUTS = Counter(
+    "model_json_outputs_total", "Structured model responses by how they were made usable.", ["prompt", "outcome"],
+)
+SEMANTIC_CACHE_LOOKUPS = Counter(
+    "semantic_cache_lookups_total", "Semantic cache lookups by outcome.", ["prompt", "outcome"],
+)
+SEMANTIC_CACHE_SECONDS_SAVED = Counter(
+    "semantic_cache_seconds_saved_total", "Model time saved by semantic cache hits.", ["prompt"],
+)
+MODEL_TOKENS = Counter(
+    "model_tokens_total", "Estimated model tokens by kind of call and direction (prompt or output).", ["kind", "direction"],
+)
+USAGE_ADMISSIONS = Counter(
+    "usage_admissions_total", "Checks of a model request against its user's token budget, by outcome.", ["outcome"],
+)
+WRITE_BEHIND_BATCH_SIZE = Histogram(
+    "write_behind_batch_size", "Writes committed per write-behind transaction.",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 200, 500, 1000),
+)
+
+_tracer = None
+if OTEL_TRACING:
+    try:
+        from opentelemetry import trace
+
+        _tracer = trace.get_tracer("studai")
+    except ImportError:
+        logger.warning("OTEL_TRACING is set but opentelemetry is not installed; spans are disabled.")
+
+
+@contextmanager
+def span(stage: str):
+    """Times a stage of request handling into stage_duration_seconds (and a tracing span, if enabled)."""
+    started = time.perf_counter()
+    if _tracer is None:
+        try:
+            yield
+        finally:
+            STAGE_DURATION.labels(stage).observe(time.perf_counter() - started)
+        return
+    with _tracer.start_as_current_span(stage):
+        try:
+            yield
+        finally:
+            STAGE_DURATION.labels(stage).observe(time.perf_counter() - started)
+
+
+def register_gauge(name: str, documentation: str, label: str, values: dict):
+    """A gauge whose children read their value from a callable at scrape time."""
+    gauge = Gauge(name, documentation, [label])
+    for value, read in values.items():
+        gauge.labels(value).set_function(read)
+    return gauge
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "other"
+    DB_QUERY_DURATION.labels(operation).observe(time.perf_counter() - started)
+
+
+def instrument_engine(engine):
+    """Times every statement run through a (sync) SQLAlchemy engine."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _start_profiler(headers: dict):
+    if not PROFILER_ENABLED:
+        return None
+    requested = headers.get(b"x-profile")
+    if requested is None or (PROFILER_TOKEN and requested.decode("latin-1") != PROFILER_TOKEN):
+        return None
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        logger.warning("X-Profile requested but pyinstrument is not installed.")
+        return None
+    profiler = Profiler(async_mode="enabled")
+    profiler.start()
+    return profiler
+
+
+def _save_profile(profiler, profile_id: str, method: str, path: str):
+    profiler.stop()
+    os.makedirs(PROFILER_OUTPUT_DIR, exist_ok=True)
+    filename = os.path.join(PROFILER_OUTPUT_DIR, f"{profile_id}.html")
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(profiler.output_html())
+    logger.info(f"Profile of {method} {path} written to {filename}")
+
+
+def _route_template(scope) -> str:
+    """The request path with path parameters put back as {name}, e.g. /api/batch/{job_id}."""
+    if scope.get("route") is None:
+        return "unmatched"
+    names = {str(value): name for name, value in scope.get("path_params", {}).items()}
+    return "/".join(f"{{{names[segment]}}}" if segment in names else segment for segment in scope["path"].split("/"))
+
+
+class MetricsMiddleware:
+    """
+    Records request duration by route template and status. Written as plain ASGI so a
+    streamed response (SSE, NDJSON) is timed to its last byte without being buffered.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = {"code": 500}
+        profiler = _start_profiler(dict(scope["headers"]))
+        profile_id = uuid.uuid4().hex if profiler else None
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if profile_id:
+                    message.setdefault("headers", []).append((b"x-profile-id", profile_id.encode()))
+            await send(message)
+
+        started = time.perf_counter()
+        REQUESTS_IN_PROGRESS.labels(method).inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_PROGRESS.labels(method).dec()
+            # Labelling by route template rather than raw path keeps label cardinality bounded.
+            REQUEST_DURATION.labels(method, _route_template(scope), str(status["code"])).observe(
+                time.perf_counter() - started
+            )
+            if profiler:
+                _save_profile(profiler, profile_id, method, scope["path"])
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    """Prometheus scrape endpoint. With several workers set PROMETHEUS_MULTIPROC_DIR to aggregate them."""
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
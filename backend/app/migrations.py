@@ -0,0 +1,139 @@
+# backend/app/migrations.py
+import os
+import hashlib
+import logging
+import tempfile
+from contextlib import contextmanager
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+# File locked while migrating a SQLite database, so workers starting together take turns.
+# By default it sits next to the database file, so every process migrating the same
+# database locks the same file whatever directory it was started from.
+MIGRATION_LOCK_PATH = os.getenv("MIGRATION_LOCK_PATH", "")
+# Arbitrary constant identifying the migration lock among PostgreSQL advisory locks.
+PG_MIGRATION_LOCK_ID = 724_115_001
+
+def _add_column_if_missing(table: str, column: str, ddl: str):
+    """Builds a migration step for a column that create_all may already have added on a fresh database."""
+    def step(conn):
+        existing = {col["name"] for col in inspect(conn).get_columns(table)}
+        if column not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    return step
+
+
+# Ordered, append-only list of (version, name, steps). A step is a SQL string or a
+# callable taking the connection. Never edit an entry once it has shipped; add a new
+# one instead. Steps must work on SQLite and PostgreSQL.
+MIGRATIONS = [
+    (
+        1,
+        "results composite indexes",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_results_user_category_created ON results (user_id, category, created_at)",
+            "CREATE INDEX IF NOT EXISTS ix_results_user_created ON results (user_id, created_at, id)",
+        ],
+    ),
+    (
+        2,
+        "conversation rolling summary",
+        [
+            _add_column_if_missing("conversations", "summary", "TEXT"),
+            _add_column_if_missing("conversations", "summary_upto", "INTEGER NOT NULL DEFAULT 0"),
+            _add_column_if_missing("conversations", "summary_key", "VARCHAR(64)"),
+        ],
+    ),
+    (
+        3,
+        "per-user semantic cache opt-out",
+        [
+            _add_column_if_missing("users", "semantic_cache_enabled", "BOOLEAN NOT NULL DEFAULT TRUE"),
+        ],
+    ),
+    (
+        4,
+        "per-user data versions for conditional GETs",
+        [
+            _add_column_if_missing("users", "results_version", "INTEGER NOT NULL DEFAULT 0"),
+            _add_column_if_missing("users", "conversations_version", "INTEGER NOT NULL DEFAULT 0"),
+            _add_column_if_missing("users", "data_updated_at", "TIMESTAMP"),
+        ],
+    ),
+]
+
+
+def run_migrations(engine):
+    """Applies every migration that has not been recorded in schema_migrations yet."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, name VARCHAR(200) NOT NULL, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+        for version, name, steps in MIGRATIONS:
+            if version in applied:
+                continue
+            logger.info(f"Applying migration {version}: {name}")
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(text(step))
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                {"version": version, "name": name},
+            )
+
+
+def _lock_path(engine) -> str:
+    if MIGRATION_LOCK_PATH:
+        return MIGRATION_LOCK_PATH
+    database = engine.url.database
+    if database and database != ":memory:" and not database.startswith("file:"):
+        return os.path.abspath(database) + ".migrations.lock"
+    # No database file: a lock in the temp dir, keyed on the URL.
+    key = hashlib.sha256(engine.url.render_as_string(hide_password=True).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), f"migrations-{key}.lock")
+
+
+@contextmanager
+def migration_lock(engine):
+    """
+    Serializes migrations between processes: a PostgreSQL advisory lock, or an exclusive
+    file lock for SQLite. Where file locks are not available (Windows) migrations are
+    expected to be run once, by hand, before the workers start.
+    """
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": PG_MIGRATION_LOCK_ID})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": PG_MIGRATION_LOCK_ID})
+        return
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(_lock_path(engine), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+if __name__ == "__main__":
+    # python -m app.migrations: brings the database schema up to date and exits. Run it
+    # once per deployment before starting the workers when DB_AUTO_MIGRATE is off.
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    from app.db import init_db
+
+    init_db()
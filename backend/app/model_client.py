@@ -0,0 +1,293 @@
+# backend/app/model_client.py
+import os
+import time
+import random
+import asyncio
+import logging
+from contextlib import aclosing, asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from .llm import get_llm_backend, estimate_tokens
+from .metrics import CHAT_TIME_TO_FIRST_TOKEN, CHAT_TOKENS_PER_SECOND, MODEL_CALLS, register_gauge, span
+from .cache import make_key
+from .shared_state import shared_state
+from .usage import usage_ledger
+from .scheduler import (
+    PRIORITY_CHAT, PRIORITY_INTERACTIVE, PRIORITY_BATCH,
+    LatencyWindow, PriorityGate, TokenBucket, CircuitBreaker, SingleFlight,
+)
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of model calls a single worker keeps in flight at once.
+MODEL_MAX_CONCURRENCY = int(os.getenv("MODEL_MAX_CONCURRENCY", "32"))
+# Chat streams are long-lived but cheap to hold open, so they get their own, larger limit.
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "256"))
+
+# Upstream requests per minute, shared by JSON calls and chat streams; 0 disables the
+# limit. With STATE_BACKEND=memory it applies per worker, so set it to the API quota
+# divided by the number of workers. With a shared backend it applies to all of them.
+MODEL_RATE_LIMIT_PER_MINUTE = float(os.getenv("MODEL_RATE_LIMIT_PER_MINUTE", "0"))
+MODEL_RATE_BURST = int(os.getenv("MODEL_RATE_BURST", "10"))
+
+MODEL_RETRY_ATTEMPTS = int(os.getenv("MODEL_RETRY_ATTEMPTS", "3"))
+MODEL_RETRY_BASE_SECONDS = float(os.getenv("MODEL_RETRY_BASE_SECONDS", "0.5"))
+MODEL_RETRY_MAX_SECONDS = float(os.getenv("MODEL_RETRY_MAX_SECONDS", "8"))
+
+# Consecutive transient failures that open the circuit, and how long it stays open.
+MODEL_CIRCUIT_FAILURES = int(os.getenv("MODEL_CIRCUIT_FAILURES", "5"))
+MODEL_CIRCUIT_RESET_SECONDS = float(os.getenv("MODEL_CIRCUIT_RESET_SECONDS", "30"))
+
+PRIORITY_NAMES = {PRIORITY_CHAT: "chat", PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch"}
+
+
+class ModelCallLimiter:
+    """Bounds concurrent model calls per worker, serving queued calls by priority, and tracks queue depth and latency."""
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._gate = PriorityGate(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.queue_wait = LatencyWindow()
+        self.duration = LatencyWindow()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE):
+        """Waits for a free slot, then holds it for the duration of the call."""
+        self.waiting += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        queued_at = time.monotonic()
+        try:
+            await self._gate.acquire(priority)
+        finally:
+            self.waiting -= 1
+
+        started_at = time.monotonic()
+        self.queue_wait.observe(started_at - queued_at)
+        self.in_flight += 1
+        try:
+            yield
+        except (asyncio.CancelledError, GeneratorExit):
+            self.cancelled += 1
+            raise
+        except BaseException:
+            self.failed += 1
+            raise
+        else:
+            self.completed += 1
+        finally:
+            self.in_flight -= 1
+            self.duration.observe(time.monotonic() - started_at)
+            self._gate.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "waiting_by_priority": {name: self._gate.waiting(p) for p, name in PRIORITY_NAMES.items()},
+            "peak_waiting": self.peak_waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "queue_wait_seconds": self.queue_wait.stats(),
+            "duration_seconds": self.duration.stats(),
+        }
+
+
+model_limiter = ModelCallLimiter(MODEL_MAX_CONCURRENCY)
+chat_limiter = ModelCallLimiter(CHAT_MAX_CONCURRENCY)
+rate_limiter = TokenBucket(MODEL_RATE_LIMIT_PER_MINUTE / 60, MODEL_RATE_BURST, store=shared_state)
+circuit_breaker = CircuitBreaker(MODEL_CIRCUIT_FAILURES, MODEL_CIRCUIT_RESET_SECONDS)
+_single_flight = SingleFlight()
+retry_stats = {"retries": 0, "gave_up": 0}
+
+register_gauge("model_calls_in_flight", "Model calls holding a concurrency slot.", "pool", {
+    "json": lambda: model_limiter.in_flight, "chat": lambda: chat_limiter.in_flight,
+})
+register_gauge("model_calls_waiting", "Model calls queued for a concurrency slot.", "pool", {
+    "json": lambda: model_limiter.waiting, "chat": lambda: chat_limiter.waiting,
+})
+register_gauge("model_rate_limit_waiting", "Model calls queued by the rate limiter.", "pool", {
+    "all": rate_limiter.waiting,
+})
+register_gauge("model_circuit_open", "1 while the model circuit breaker rejects calls.", "state", {
+    "open": lambda: 1 if circuit_breaker.state == "open" else 0,
+})
+
+
+def _retry_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(MODEL_RETRY_MAX_SECONDS, MODEL_RETRY_BASE_SECONDS * 2 ** (attempt - 1)))
+
+
+async def _admit(priority: int):
+    """Fails fast while the circuit is open, then waits for the rate limit."""
+    circuit_breaker.before_call()
+    try:
+        await rate_limiter.acquire(priority)
+    except asyncio.CancelledError:
+        circuit_breaker.release_probe()
+        raise
+
+
+def _outcome(exc: Optional[BaseException]) -> str:
+    if exc is None:
+        return "ok"
+    if isinstance(exc, (asyncio.CancelledError, GeneratorExit)):
+        return "cancelled"
+    return "transient_error" if get_llm_backend().is_transient(exc) else "error"
+
+
+def _record_outcome(exc: Optional[BaseException], kind: str):
+    MODEL_CALLS.labels(kind, _outcome(exc)).inc()
+    if exc is None:
+        circuit_breaker.record_success()
+    elif isinstance(exc, (asyncio.CancelledError, GeneratorExit)):
+        circuit_breaker.release_probe()
+    elif get_llm_backend().is_transient(exc):
+        circuit_breaker.record_failure()
+    else:
+        # The upstream answered; the request itself was bad.
+        circuit_breaker.record_success()
+
+
+async def _call_with_retries(call: Callable[[], Awaitable], priority: int, kind: str):
+    attempt = 0
+    while True:
+        attempt += 1
+        await _admit(priority)
+        try:
+            async with model_limiter.slot(priority):
+                with span("model_call"):
+                    result = await call()
+        except BaseException as e:
+            _record_outcome(e, kind)
+            if isinstance(e, asyncio.CancelledError) or not get_llm_backend().is_transient(e):
+                raise
+            if attempt >= MODEL_RETRY_ATTEMPTS:
+                retry_stats["gave_up"] += 1
+                raise
+            retry_stats["retries"] += 1
+            delay = _retry_delay(attempt)
+            logger.warning(f"Model call failed ({e}); retry {attempt} in {delay:.2f}s.")
+            await asyncio.sleep(delay)
+            continue
+        _record_outcome(None, kind)
+        return result
+
+
+async def _metered(call: Callable[[], Awaitable[str]], prompt: str, kind: str) -> str:
+    """Runs a call and charges its tokens and latency to the current account (usage ledger)."""
+    started = time.perf_counter()
+    text = await call()
+    usage_ledger.record(kind, estimate_tokens(prompt), estimate_tokens(text), time.perf_counter() - started)
+    return text
+
+
+async def generate_json(prompt: str, kind: Optional[str] = None, priority: int = PRIORITY_INTERACTIVE) -> str:
+    """
+    Runs a JSON generation on the configured backend. Identical concurrent prompts share
+    one upstream call, charged to the caller that made it; transient failures are retried with backoff.
+    """
+    backend = get_llm_backend()
+    key = make_key("json", backend.fingerprint(), kind or "", prompt)
+    return await _single_flight.do(key, lambda: _metered(
+        lambda: _call_with_retries(lambda: backend.generate_json(prompt, kind), priority, "json"), prompt, kind or "json"
+    ))
+
+
+async def generate_text(prompt: str, kind: Optional[str] = None, priority: int = PRIORITY_INTERACTIVE) -> str:
+    backend = get_llm_backend()
+    key = make_key("text", backend.fingerprint(), kind or "", prompt)
+    return await _single_flight.do(key, lambda: _metered(
+        lambda: _call_with_retries(lambda: backend.generate_text(prompt, kind), priority, "text"), prompt, kind or "text"
+    ))
+
+
+async def _stream_with_retries(open_stream: Callable[[], AsyncIterator[str]], limiter: ModelCallLimiter, priority: int, kind: str) -> AsyncIterator[str]:
+    """
+    Streams chunks from the backend; closing the generator abandons the upstream stream.
+    A failure before the first chunk is retried; once text has been sent it is not.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        await _admit(priority)
+        started = False
+        try:
+            async with limiter.slot(priority):
+                async with aclosing(open_stream()) as stream:
+                    async for chunk in stream:
+                        started = True
+                        yield chunk
+        except BaseException as e:
+            _record_outcome(e, kind)
+            if started or isinstance(e, (asyncio.CancelledError, GeneratorExit)) or not get_llm_backend().is_transient(e):
+                raise
+            if attempt >= MODEL_RETRY_ATTEMPTS:
+                retry_stats["gave_up"] += 1
+                raise
+            retry_stats["retries"] += 1
+            await asyncio.sleep(_retry_delay(attempt))
+            continue
+        _record_outcome(None, kind)
+        return
+
+
+async def stream_chat_message(system_instruction: str, history: List[Dict[str, str]], message: str) -> AsyncIterator[str]:
+    """
+    Streams a chat reply chunk by chunk, recording time to first chunk and output rate.
+    The tokens streamed are charged to the current account even if the client leaves early.
+    """
+    backend = get_llm_backend()
+    sent_at = time.perf_counter()
+    first_chunk_at, tokens, output_tokens = None, 0, 0
+    stream = _stream_with_retries(lambda: backend.stream_chat(system_instruction, history, message), chat_limiter, PRIORITY_CHAT, "chat")
+    try:
+        async with aclosing(stream):
+            async for chunk in stream:
+                output_tokens += estimate_tokens(chunk)
+                if first_chunk_at is None:
+                    first_chunk_at = time.perf_counter()
+                    CHAT_TIME_TO_FIRST_TOKEN.observe(first_chunk_at - sent_at)
+                else:
+                    tokens += estimate_tokens(chunk)
+                yield chunk
+    finally:
+        if first_chunk_at is not None:
+            prompt_tokens = estimate_tokens(system_instruction + message + "".join(m.get("content", "") for m in history))
+            usage_ledger.record("chat", prompt_tokens, output_tokens, time.perf_counter() - sent_at)
+    if first_chunk_at is not None and tokens:
+        elapsed = time.perf_counter() - first_chunk_at
+        if elapsed > 0:
+            CHAT_TOKENS_PER_SECOND.observe(tokens / elapsed)
+
+
+async def stream_json(prompt: str, kind: Optional[str] = None, priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[str]:
+    """Streams the raw JSON text of a generation as the model produces it."""
+    backend = get_llm_backend()
+    started = time.perf_counter()
+    output_tokens = None
+    stream = _stream_with_retries(lambda: backend.stream_json(prompt, kind), model_limiter, priority, "json_stream")
+    try:
+        async with aclosing(stream):
+            async for chunk in stream:
+                output_tokens = (output_tokens or 0) + estimate_tokens(chunk)
+                yield chunk
+    finally:
+        if output_tokens is not None:
+            usage_ledger.record(kind or "json", estimate_tokens(prompt), output_tokens, time.perf_counter() - started)
+
+
+def scheduler_stats() -> dict:
+    return {
+        "rate_limit": rate_limiter.stats(),
+        "circuit": circuit_breaker.stats(),
+        "single_flight": {"in_flight": _single_flight.in_flight(), "coalesced": _single_flight.coalesced},
+        **retry_stats,
+    }
@@ -1,5 +1,5 @@
 # backend/app/models.py
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text, Index, UniqueConstraint, LargeBinary, Boolean, true
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .db import Base
@@ -11,8 +11,15 @@ class User(Base):
     email = Column(String(200), unique=True, index=True, nullable=True)
     hashed_password = Column(String(256), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Whether this user may be served a stored answer to a similar question (semantic cache).
+    semantic_cache_enabled = Column(Boolean, nullable=False, default=True, server_default=true())
+    # Bumped with every change to the user's results / conversations; they key the ETags of those reads.
+    results_version = Column(Integer, nullable=False, default=0, server_default="0")
+    conversations_version = Column(Integer, nullable=False, default=0, server_default="0")
+    data_updated_at = Column(DateTime, nullable=True)  # time of the last such change
 
     results = relationship("Result", back_populates="user", cascade="all, delete-orphan")
+    conversations = relationship("Conversation", back_populates="user", cascade="all, delete-orphan")
 
 class Result(Base):
     __tablename__ = "results"
@@ -24,3 +31,104 @@ class Result(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="results")
+
+    # Existing databases get these through app.migrations.
+    __table_args__ = (
+        Index("ix_results_user_category_created", "user_id", "category", "created_at"),
+        Index("ix_results_user_created", "user_id", "created_at", "id"),
+    )
+
+
+class Conversation(Base):
+    __tablename__ = "conversations"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    category = Column(String(120), nullable=False)  # e.g., 'chat'
+    last_seq = Column(Integer, nullable=False, default=0)  # seq of the newest message
+    # Rolling summary of the first summary_upto messages, used to keep chat prompts bounded.
+    summary = Column(Text, nullable=True)
+    summary_upto = Column(Integer, nullable=False, default=0)
+    summary_key = Column(String(64), nullable=True)  # hash of the summarized messages
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    user = relationship("User", back_populates="conversations")
+    messages = relationship(
+        "ConversationMessage",
+        back_populates="conversation",
+        cascade="all, delete-orphan",
+        order_by="ConversationMessage.seq",
+        lazy="raise",  # history is read in windows, never loaded wholesale
+    )
+
+    __table_args__ = (UniqueConstraint("user_id", "category", name="uq_conversations_user_category"),)
+
+class ConversationMessage(Base):
+    __tablename__ = "conversation_messages"
+    id = Column(Integer, primary_key=True, index=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False)
+    seq = Column(Integer, nullable=False)  # 1-based position within the conversation
+    role = Column(String(20), nullable=False)
+    content = Column(Text, nullable=False)
+    # Set on the first message of an append so a retried request is not stored twice.
+    idempotency_key = Column(String(100), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    conversation = relationship("Conversation", back_populates="messages")
+
+    __table_args__ = (
+        UniqueConstraint("conversation_id", "seq", name="uq_conversation_messages_seq"),
+        Index("ix_conversation_messages_idempotency", "conversation_id", "idempotency_key"),
+    )
+
+
+class BatchJob(Base):
+    __tablename__ = "batch_jobs"
+    id = Column(String(36), primary_key=True)  # uuid4
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    kind = Column(String(20), nullable=False)  # 'resume' or 'todo'
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, done
+    total = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String(64), nullable=True)  # worker currently processing the job
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    items = relationship("BatchItem", back_populates="job", cascade="all, delete-orphan", lazy="raise")  # queried by status and position, never loaded wholesale
+
+class BatchItem(Base):
+    __tablename__ = "batch_items"
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String(36), ForeignKey("batch_jobs.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)
+    name = Column(String(255), nullable=False)  # file name, or 'item-N' for texts
+    content_type = Column(String(120), nullable=True)
+    payload = Column(LargeBinary, nullable=False)  # raw file bytes or UTF-8 text, kept so jobs survive restarts
+    status = Column(String(20), nullable=False, default="pending")  # pending, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(Text, nullable=True)  # JSON
+    error = Column(Text, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    job = relationship("BatchJob", back_populates="items")
+
+    __table_args__ = (
+        UniqueConstraint("job_id", "position", name="uq_batch_items_position"),
+        Index("ix_batch_items_job_status", "job_id", "status"),
+    )
+
+
+class UsageRecord(Base):
+    """Model usage of one user in one hour for one kind of call, added to by app.usage as counters are flushed."""
+    __tablename__ = "usage_records"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    period_start = Column(DateTime, nullable=False)  # start of the hour (UTC)
+    kind = Column(String(32), nullable=False)  # prompt name, 'chat' or 'summary'
+    calls = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)  # local estimates, see llm.estimate_tokens
+    output_tokens = Column(Integer, nullable=False, default=0)
+    latency_ms = Column(Integer, nullable=False, default=0)  # summed over the calls
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "period_start", "kind", name="uq_usage_records_user_period_kind"),
+    )
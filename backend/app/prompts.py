@@ -0,0 +1,130 @@
+# backend/app/prompts.py
+import os
+import time
+import hashlib
+import logging
+import threading
+from string import Formatter
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPTS_DIR = os.path.join(BASE_DIR, "prompts")
+
+# Reload templates from disk when they change. Meant for development only.
+PROMPTS_WATCH = os.getenv("PROMPTS_WATCH", "false").lower() in ("1", "true", "yes")
+PROMPTS_WATCH_INTERVAL_SECONDS = 1.0
+
+# Every template the API depends on, with the placeholders it must contain.
+REQUIRED_PROMPTS: Dict[str, FrozenSet[str]] = {
+    "todo": frozenset({"user_text"}),
+    "mental_health": frozenset({"user_text"}),
+    "resume": frozenset({"user_text", "ats_hints"}),
+    "interview": frozenset({"chat_history"}),
+    "summary": frozenset({"previous_summary", "transcript"}),
+    "json_repair": frozenset({"error", "schema", "response"}),
+}
+
+
+class PromptTemplateError(RuntimeError):
+    """Raised when a prompt template is missing or malformed."""
+
+
+class PromptTemplate:
+    """A prompt file parsed once into literal chunks and placeholder names."""
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text
+        self.version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        self._parts: List[Tuple[str, Optional[str]]] = []
+        placeholders = set()
+        try:
+            parsed = list(Formatter().parse(text))
+        except ValueError as e:
+            raise PromptTemplateError(f"Prompt '{name}' is not a valid template: {e}")
+        for literal, field, spec, conversion in parsed:
+            if field is not None:
+                if not field.isidentifier() or spec or conversion:
+                    raise PromptTemplateError(f"Prompt '{name}' has an unsupported placeholder: {{{field}}}")
+                placeholders.add(field)
+            self._parts.append((literal, field))
+        self.placeholders = frozenset(placeholders)
+
+    def render(self, **values: str) -> str:
+        """Fills in the placeholders. Equivalent to str.format without re-parsing the template."""
+        missing = self.placeholders - values.keys()
+        if missing:
+            raise KeyError(f"Prompt '{self.name}' is missing values for: {', '.join(sorted(missing))}")
+        return "".join(literal + (values[field] if field else "") for literal, field in self._parts)
+
+
+class PromptRegistry:
+    """Loads every template in the prompts directory once and hands out parsed templates."""
+
+    def __init__(self, prompts_dir: str, required: Dict[str, FrozenSet[str]], watch: bool = False):
+        self.prompts_dir = prompts_dir
+        self.required = required
+        self.watch = watch
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._mtimes: Dict[str, float] = {}
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Reads and validates all templates. Raises PromptTemplateError on any problem."""
+        templates, mtimes = {}, {}
+        if not os.path.isdir(self.prompts_dir):
+            raise PromptTemplateError(f"Prompts directory not found: {self.prompts_dir}")
+        for filename in sorted(os.listdir(self.prompts_dir)):
+            if not filename.endswith("_prompt.txt"):
+                continue
+            path = os.path.join(self.prompts_dir, filename)
+            name = filename[: -len("_prompt.txt")]
+            with open(path, "r", encoding="utf-8") as f:
+                templates[name] = PromptTemplate(name, f.read())
+            mtimes[path] = os.path.getmtime(path)
+
+        for name, placeholders in self.required.items():
+            if name not in templates:
+                raise PromptTemplateError(f"Required prompt template '{name}_prompt.txt' not found in {self.prompts_dir}")
+            if templates[name].placeholders != placeholders:
+                raise PromptTemplateError(
+                    f"Prompt '{name}' has placeholders {sorted(templates[name].placeholders)}, expected {sorted(placeholders)}"
+                )
+
+        with self._lock:
+            self._templates, self._mtimes = templates, mtimes
+            self._last_check = time.monotonic()
+        logger.info("Loaded prompt templates: " + ", ".join(f"{n}@{t.version}" for n, t in templates.items()))
+
+    def _reload_if_changed(self):
+        now = time.monotonic()
+        if now - self._last_check < PROMPTS_WATCH_INTERVAL_SECONDS:
+            return
+        self._last_check = now
+        try:
+            changed = any(os.path.getmtime(path) != mtime for path, mtime in self._mtimes.items())
+        except OSError:
+            changed = True
+        if changed:
+            try:
+                self.load()
+            except (OSError, PromptTemplateError) as e:
+                # Keep serving the last good templates while the file is being edited.
+                logger.error(f"Prompt reload failed, keeping previous templates: {e}")
+
+    def get(self, name: str) -> PromptTemplate:
+        if self.watch:
+            self._reload_if_changed()
+        try:
+            return self._templates[name]
+        except KeyError:
+            raise PromptTemplateError(f"Prompt template '{name}' is not loaded.")
+
+    def versions(self) -> Dict[str, str]:
+        return {name: template.version for name, template in self._templates.items()}
+
+
+prompt_registry = PromptRegistry(PROMPTS_DIR, REQUIRED_PROMPTS, watch=PROMPTS_WATCH)
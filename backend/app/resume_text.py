@@ -0,0 +1,206 @@
+# backend/app/resume_text.py
+# Resume text clean-up before the model sees it, and the local ATS checks that go into
+# the prompt. Runs in the extraction workers (see extraction.prepare_resume_text), so it
+# uses the standard library only and stays deterministic: the same file always gives the
+# same text, which keeps the response cache and the model's answers stable.
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional
+
+# Separates the pages of extracted PDF text, so headers and footers can be recognised.
+PAGE_BREAK = "\f"
+# Clean up extracted text before it goes into the prompt. Off sends the raw extraction.
+RESUME_NORMALIZE = os.getenv("RESUME_NORMALIZE", "true").lower() in ("1", "true", "yes")
+# Token budget of the cleaned text sent to the model (about four characters per token).
+RESUME_PROMPT_TOKEN_BUDGET = int(os.getenv("RESUME_PROMPT_TOKEN_BUDGET", "3000"))
+CHARS_PER_TOKEN = 4
+TRUNCATION_NOTE = "[... rest of the resume omitted ...]"
+
+# Canonical section name -> headings that introduce it (compared lower-cased, without
+# punctuation). A heading line is short and consists of one of these and nothing else.
+SECTION_HEADINGS: Dict[str, tuple] = {
+    "Summary": ("summary", "professional summary", "profile", "professional profile", "about me", "objective", "career objective"),
+    "Experience": ("experience", "work experience", "professional experience", "employment", "employment history", "work history", "internships", "internship"),
+    "Education": ("education", "academic background", "academics", "education and training"),
+    "Skills": ("skills", "technical skills", "key skills", "core competencies", "competencies", "technologies", "tech stack"),
+    "Projects": ("projects", "personal projects", "academic projects", "key projects"),
+    "Certifications": ("certifications", "certificates", "licenses and certifications", "courses"),
+    "Achievements": ("achievements", "awards", "honors", "honours", "awards and achievements", "accomplishments"),
+    "Publications": ("publications", "research"),
+    "Languages": ("languages",),
+    "Volunteering": ("volunteering", "volunteer experience", "extracurricular activities", "activities", "leadership"),
+    "Contact": ("contact", "contact information", "personal details", "personal information"),
+}
+_HEADING_LOOKUP = {heading: section for section, headings in SECTION_HEADINGS.items() for heading in headings}
+CORE_SECTIONS = ("Experience", "Education", "Skills")
+
+ACTION_VERBS = frozenset(
+    "achieved analyzed architected automated built collaborated coordinated created cut decreased defined delivered "
+    "deployed designed developed drove engineered established evaluated expanded grew implemented improved increased "
+    "initiated integrated launched led maintained managed mentored migrated negotiated optimized organized owned "
+    "planned presented produced reduced redesigned refactored resolved scaled shipped simplified spearheaded "
+    "streamlined supervised taught tested trained transformed wrote".split()
+)
+
+_BULLET = re.compile(r"^\s*(?:[•●▪■◦‣∙·○◆◇►▶➢➤✓✔\-–—*]|o(?=\s)|||)\s*")
+_PAGE_NUMBER = re.compile(r"^(?:page\s*)?\d{1,3}(?:\s*(?:of|/)\s*\d{1,3})?$", re.IGNORECASE)
+_PAGE_SUFFIX = re.compile(r"\s+page\s*\d{1,3}(?:\s*(?:of|/)\s*\d{1,3})?$", re.IGNORECASE)
+_SPACES = re.compile(r"[ \t  -   　]+")
+_INVISIBLE = re.compile(r"[​-‍⁠﻿­]")
+# A wrapped line goes on with a lower-case word (not an email address or a URL).
+_CONTINUATION = re.compile(r"^[a-z]+(?:[\s,;:)]|\.(?:\s|$)|$)")
+_HYPHENATED = re.compile(r"([A-Za-z]{2,})-$")
+_QUANTIFIED = re.compile(r"\d|%|\$|€|£|₹")
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE = re.compile(r"(?:\+?\d[\d ()-]{7,}\d)")
+_LINKEDIN = re.compile(r"linkedin\.com/", re.IGNORECASE)
+_GITHUB = re.compile(r"github\.com/", re.IGNORECASE)
+
+
+def _clean_line(line: str) -> str:
+    line = _INVISIBLE.sub("", line)
+    return _SPACES.sub(" ", line).strip()
+
+
+def _furniture_key(line: str) -> str:
+    """Headers and footers often differ only by page number."""
+    return re.sub(r"\d+", "#", line.lower())
+
+
+def _strip_page_furniture(pages: List[List[str]]) -> List[List[str]]:
+    """
+    Drops page numbers, and lines repeated at the top or bottom of most pages. The
+    first page keeps its header, which usually carries the candidate's name.
+    """
+    pages = [[_PAGE_SUFFIX.sub("", line) for line in lines] for lines in pages]
+    repeated = set()
+    if len(pages) > 1:
+        edges = Counter()
+        for lines in pages:
+            content = [line for line in lines if line]
+            edges.update({_furniture_key(line) for line in content[:3] + content[-3:]})
+        repeated = {key for key, count in edges.items() if count >= max(2, (len(pages) + 1) // 2)}
+    stripped = []
+    for number, lines in enumerate(pages):
+        header = [position for position, line in enumerate(lines) if line][:3] if number == 0 else []
+        kept = []
+        for position, line in enumerate(lines):
+            if _PAGE_NUMBER.match(line):
+                continue
+            if _furniture_key(line) in repeated and position not in header:
+                continue
+            kept.append(line)
+        stripped.append(kept)
+    return stripped
+
+
+def _heading(line: str) -> Optional[str]:
+    """The canonical section name if the line is a section heading, else None."""
+    if len(line) > 40:
+        return None
+    key = re.sub(r"[^a-z& ]", "", line.lower().replace("&", "and")).strip()
+    return _HEADING_LOOKUP.get(re.sub(r"\s+", " ", key))
+
+
+def _join_lines(lines: List[str]) -> List[str]:
+    """Undoes hyphenation and the line wrapping of PDF text; bullets and headings start new lines."""
+    out: List[str] = []
+    for line in lines:
+        if not line:
+            if out and out[-1]:
+                out.append("")
+            continue
+        bullet = _BULLET.match(line)
+        if bullet and len(line) > bullet.end():
+            out.append("- " + line[bullet.end():])
+            continue
+        if _heading(line) or not out or not out[-1] or _heading(out[-1]):
+            out.append(line)
+            continue
+        previous = out[-1]
+        hyphenated = _HYPHENATED.search(previous)
+        if hyphenated and line[0].islower():
+            out[-1] = previous[:-1] + line
+        elif _CONTINUATION.match(line) or previous[-1] in ",(&/" or previous.endswith(" and"):
+            # A sentence wrapped onto the next line.
+            out[-1] = f"{previous} {line}"
+        else:
+            out.append(line)
+    return out
+
+
+def normalize_resume_text(raw: str, token_budget: int = RESUME_PROMPT_TOKEN_BUDGET) -> str:
+    """
+    Cleans extracted resume text for the prompt: Unicode normalisation (ligatures, odd
+    spaces), page numbers and repeated headers/footers removed, hyphenation and line
+    wrapping undone, bullets unified to "- ", duplicated lines (multi-column layouts)
+    dropped, section headings marked as "## Section", and the result capped at the
+    token budget on a line boundary.
+    """
+    text = unicodedata.normalize("NFKC", raw).replace("\r\n", "\n").replace("\r", "\n")
+    pages = [[_clean_line(line) for line in page.split("\n")] for page in text.split(PAGE_BREAK)]
+    lines = [line for page in _strip_page_furniture(pages) for line in page + [""]]
+
+    seen = set()
+    out: List[str] = []
+    for line in _join_lines(lines):
+        section = _heading(line) if line else None
+        if section:
+            out.append(f"## {section}")
+            continue
+        if len(line) >= 25:
+            # Two-column PDFs often yield the same text twice.
+            key = line.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+        out.append(line)
+    while out and not out[-1]:
+        out.pop()
+
+    max_chars = token_budget * CHARS_PER_TOKEN
+    cleaned = "\n".join(out)
+    if len(cleaned) > max_chars:
+        cut = cleaned.rfind("\n", 0, max_chars - len(TRUNCATION_NOTE) - 1)
+        cleaned = cleaned[:cut if cut > 0 else max_chars - len(TRUNCATION_NOTE) - 1] + "\n" + TRUNCATION_NOTE
+    return cleaned
+
+
+def ats_signals(text: str) -> dict:
+    """Cheap checks of normalised resume text: sections, contact details and bullet quality."""
+    sections = []
+    for line in text.split("\n"):
+        if line.startswith("## ") and line[3:] not in sections:
+            sections.append(line[3:])
+    bullets = [line[2:] for line in text.split("\n") if line.startswith("- ")]
+    quantified = sum(1 for bullet in bullets if _QUANTIFIED.search(bullet))
+    action = sum(1 for bullet in bullets if bullet.split(" ", 1)[0].lower().strip(",.;:") in ACTION_VERBS)
+    contact = [
+        name for name, pattern in (("email", _EMAIL), ("phone", _PHONE), ("linkedin", _LINKEDIN), ("github", _GITHUB))
+        if pattern.search(text)
+    ]
+    return {
+        "sections": sections,
+        "missing_sections": [section for section in CORE_SECTIONS if section not in sections],
+        "contact": contact,
+        "bullets": len(bullets),
+        "quantified_bullet_ratio": round(quantified / len(bullets), 2) if bullets else 0.0,
+        "action_verb_bullet_ratio": round(action / len(bullets), 2) if bullets else 0.0,
+        "words": len(text.split()),
+        "truncated": text.endswith(TRUNCATION_NOTE),
+    }
+
+
+def format_ats_hints(signals: dict) -> str:
+    """The signals as a few compact lines for the prompt."""
+    ratio = lambda value: f"{value:.0%}"  # noqa: E731
+    return "\n".join([
+        f"sections found: {', '.join(signals['sections']) or 'none detected'}",
+        f"core sections missing: {', '.join(signals['missing_sections']) or 'none'}",
+        f"contact details found: {', '.join(signals['contact']) or 'none'}",
+        f"bullets: {signals['bullets']}, with numbers: {ratio(signals['quantified_bullet_ratio'])}, "
+        f"starting with an action verb: {ratio(signals['action_verb_bullet_ratio'])}",
+        f"words: {signals['words']}" + (" (truncated to fit)" if signals["truncated"] else ""),
+    ])
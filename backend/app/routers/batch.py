@@ -0,0 +1,218 @@
+# backend/app/routers/batch.py
+
+import io
+import os
+import json
+import asyncio
+import zipfile
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
+from .. import models
+from ..auth import get_optional_user
+from ..batch import batch_runner, create_job
+from ..db import SessionLocal
+from ..lifecycle import stream_drain
+from ..extraction import PDF_MIME, DOCX_MIME
+from ..uploads import read_batch_upload
+from ..schemas import BatchTextsPayload, BatchJobOut
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_MAX_FILE_BYTES = int(os.getenv("BATCH_MAX_FILE_BYTES", str(10 * 1024 * 1024)))
+# All files of one batch together, counted both as uploaded and after unpacking zips.
+BATCH_MAX_TOTAL_BYTES = int(os.getenv("BATCH_MAX_TOTAL_BYTES", str(100 * 1024 * 1024)))
+BATCH_POLL_SECONDS = 1.0
+
+EXTENSION_TYPES = {".pdf": PDF_MIME, ".docx": DOCX_MIME}
+BATCH_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {"files": {
+                "type": "array", "items": {"type": "string", "format": "binary"}, "description": "PDF, DOCX or zip files",
+            }},
+            "required": ["files"],
+        }}},
+    }
+}
+
+router = APIRouter(prefix="/batch", tags=["Batch"])
+
+
+def _content_type_for(filename: str) -> Optional[str]:
+    return EXTENSION_TYPES.get(os.path.splitext(filename.lower())[1])
+
+
+def _too_large(detail: str) -> HTTPException:
+    return HTTPException(status_code=413, detail=detail)
+
+
+def _unpack_zip(data: bytes, budget: int) -> List[tuple]:
+    """The PDF and DOCX files in a zip archive, which may unpack to at most budget bytes in total."""
+    items = []
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid zip archive.")
+    for member in archive.infolist():
+        content_type = _content_type_for(member.filename)
+        if member.is_dir() or content_type is None or os.path.basename(member.filename).startswith("."):
+            continue
+        # Check the declared size before inflating, so a zip bomb is rejected cheaply.
+        # (Reading stops at the declared size, so it also bounds what is inflated.)
+        if member.file_size > BATCH_MAX_FILE_BYTES:
+            raise _too_large(f"{member.filename} is too large.")
+        budget -= member.file_size
+        if budget < 0:
+            raise _too_large(f"The batch unpacks to more than {BATCH_MAX_TOTAL_BYTES // (1024 * 1024)} MB.")
+        items.append((os.path.basename(member.filename), content_type, archive.read(member)))
+    return items
+
+
+def _get_job(job_id: str, user: Optional[models.User]) -> models.BatchJob:
+    db = SessionLocal()
+    try:
+        job = db.query(models.BatchJob).filter(models.BatchJob.id == job_id).first()
+    finally:
+        db.close()
+    # Jobs created by a signed-in user are only visible to that user.
+    if not job or (job.user_id is not None and (user is None or user.id != job.user_id)):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Batch job not found.")
+    return job
+
+
+def _job_summary(job_id: str) -> dict:
+    db = SessionLocal()
+    try:
+        job = db.query(models.BatchJob).filter(models.BatchJob.id == job_id).one()
+        counts = dict(
+            db.query(models.BatchItem.status, func.count(models.BatchItem.id))
+            .filter(models.BatchItem.job_id == job_id)
+            .group_by(models.BatchItem.status)
+            .all()
+        )
+        return {
+            "job_id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "total": job.total,
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "pending": counts.get("pending", 0),
+            "created_at": job.created_at,
+            "updated_at": job.updated_at,
+        }
+    finally:
+        db.close()
+
+
+def _finished_items(job_id: str, exclude: set) -> List[dict]:
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            models.BatchItem.position, models.BatchItem.name, models.BatchItem.status,
+            models.BatchItem.attempts, models.BatchItem.result, models.BatchItem.error,
+        ).filter(
+            models.BatchItem.job_id == job_id, models.BatchItem.status.in_(("done", "failed"))
+        ).order_by(models.BatchItem.finished_at, models.BatchItem.position).all()
+        return [
+            {
+                "position": row.position,
+                "name": row.name,
+                "status": row.status,
+                "attempts": row.attempts,
+                "result": json.loads(row.result) if row.result else None,
+                "error": row.error,
+            }
+            for row in rows if row.position not in exclude
+        ]
+    finally:
+        db.close()
+
+
+async def _start(kind: str, user: Optional[models.User], items: List[tuple]) -> dict:
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No items to process.")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise _too_large(f"A batch may contain at most {BATCH_MAX_ITEMS} items.")
+    job_id = await run_in_threadpool(create_job, kind, user.id if user else None, items)
+    batch_runner.start(job_id, kind)
+    return await run_in_threadpool(_job_summary, job_id)
+
+
+@router.post("/resumes", response_model=BatchJobOut, status_code=status.HTTP_202_ACCEPTED, openapi_extra=BATCH_UPLOAD_BODY)
+async def create_resume_batch(
+    request: Request,
+    current_user: Optional[models.User] = Depends(get_optional_user),
+):
+    """
+    Starts a batch resume analysis. Accepts PDF/DOCX files and zip archives of them, up
+    to BATCH_MAX_TOTAL_BYTES in all, uploaded and unpacked.
+    Returns a job id to poll, or to stream results from as NDJSON.
+    """
+    items = []
+    budget = BATCH_MAX_TOTAL_BYTES
+    for filename, client_type, data in await read_batch_upload(request, "files", BATCH_MAX_TOTAL_BYTES):
+        if filename.lower().endswith(".zip"):
+            unpacked = await run_in_threadpool(_unpack_zip, bytes(data), budget)
+            budget -= sum(len(member) for _, _, member in unpacked)
+            items.extend(unpacked)
+            continue
+        content_type = client_type if client_type in (PDF_MIME, DOCX_MIME) else _content_type_for(filename)
+        if content_type is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{filename}: please upload PDF, DOCX or zip files.")
+        if len(data) > BATCH_MAX_FILE_BYTES:
+            raise _too_large(f"{filename} is too large.")
+        budget -= len(data)
+        items.append((filename, content_type, bytes(data)))
+    return await _start("resume", current_user, items)
+
+
+@router.post("/todos", response_model=BatchJobOut, status_code=status.HTTP_202_ACCEPTED)
+async def create_todo_batch(
+    payload: BatchTextsPayload,
+    current_user: Optional[models.User] = Depends(get_optional_user),
+):
+    """Starts a batch to-do generation, one job item per text."""
+    items = [(f"item-{i + 1}", None, text.encode("utf-8")) for i, text in enumerate(payload.texts)]
+    return await _start("todo", current_user, items)
+
+
+@router.get("/{job_id}", response_model=BatchJobOut)
+async def get_batch_job(job_id: str, current_user: Optional[models.User] = Depends(get_optional_user)):
+    """Returns the progress of a batch job."""
+    await run_in_threadpool(_get_job, job_id, current_user)
+    return await run_in_threadpool(_job_summary, job_id)
+
+
+@router.get("/{job_id}/results")
+async def stream_batch_results(
+    job_id: str,
+    follow: bool = True,
+    current_user: Optional[models.User] = Depends(get_optional_user),
+):
+    """
+    Streams finished items as NDJSON, one line per item. With follow (the default) the
+    stream stays open and emits items as they finish, ending when the job is done (or
+    early, when the worker is shutting down).
+    """
+    await run_in_threadpool(_get_job, job_id, current_user)
+
+    async def lines():
+        sent = set()
+        with stream_drain.track():
+            while True:
+                summary = await run_in_threadpool(_job_summary, job_id)
+                for item in await run_in_threadpool(_finished_items, job_id, sent):
+                    sent.add(item["position"])
+                    yield json.dumps(item) + "\n"
+                # When the server is shutting down, end the feed after what is already
+                # done; the client can follow the job again on another worker.
+                if not follow or summary["status"] == "done" or stream_drain.draining:
+                    return
+                await asyncio.sleep(BATCH_POLL_SECONDS)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
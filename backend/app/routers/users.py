@@ -1,49 +1,79 @@
 # backend/app/routers/users.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+import base64
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from .. import models
-from ..auth import get_db, get_password_hash, verify_password, create_access_token, get_current_user
-from ..schemas_auth import UserCreate, UserLogin, Token, UserOut, ResultCreate, ResultOut, ResultsList,ConversationCreate, ConversationOut
-from sqlalchemy.orm.exc import NoResultFound
+from ..db import SessionLocal
+from ..usage import usage_summary
+from ..write_behind import write_behind, result_write, conversation_write
+from ..etags import bump_versions, read_versions, make_etag, cache_headers, not_modified
+from ..auth import get_db, get_async_db, hash_password_async, verify_and_update_password, create_access_token, get_current_user
+from ..schemas_auth import UserCreate, UserLogin, Token, UserOut, UserSettingsUpdate, UsageSummary, ResultCreate, ResultOut, ResultsList, ResultStats, ConversationCreate, ConversationOut, ConversationAppend, ConversationAppendOut
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
+async def _get_user_by(db: AsyncSession, column, value):
+    result = await db.execute(select(models.User).where(column == value))
+    return result.scalars().first()
+
+# Register and login are async so that bcrypt runs in its dedicated pool and the DB
+# calls go through the async session, instead of a request thread being held for the
+# whole hash.
 @router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def register(payload: UserCreate, db: Session = Depends(get_db)):
+async def register(payload: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Handles new user registration.
     Checks for existing username/email and hashes the password before saving.
     """
-    if db.query(models.User).filter(models.User.username == payload.username).first():
+    if await _get_user_by(db, models.User.username, payload.username):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already exists")
     
-    if payload.email and db.query(models.User).filter(models.User.email == payload.email).first():
+    if payload.email and await _get_user_by(db, models.User.email, payload.email):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
     
-    hashed_password = get_password_hash(payload.password)
+    await db.commit()  # hand the connection back while bcrypt runs
+    hashed_password = await hash_password_async(payload.password)
     user = models.User(username=payload.username, email=payload.email, hashed_password=hashed_password)
     
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     return user
 
 @router.post("/login", response_model=Token)
-def login(form_payload: UserLogin, db: Session = Depends(get_db)):
+async def login(form_payload: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """
     Handles user login.
     Verifies username and password and returns a JWT access token.
+    Passwords hashed with outdated bcrypt settings are transparently rehashed.
     """
-    user = db.query(models.User).filter(models.User.username == form_payload.username).first()
+    user = await _get_user_by(db, models.User.username, form_payload.username)
+    # End the read so the connection goes back to the pool while bcrypt runs (the
+    # session does not expire on commit); otherwise a burst of logins holds every
+    # connection and waits out DB_POOL_TIMEOUT instead of being shed with a 503.
+    await db.commit()
     
-    if not user or not verify_password(form_payload.password, user.hashed_password):
+    valid, new_hash = False, None
+    if user:
+        valid, new_hash = await verify_and_update_password(form_payload.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     
     access_token = create_access_token(data={"sub": user.username, "user_id": user.id})
     return {"access_token": access_token, "token_type": "bearer"}
@@ -53,89 +83,380 @@ def login(form_payload: UserLogin, db: Session = Depends(get_db)):
 user_router = APIRouter(prefix="/users", tags=["Users"])
 
 @user_router.get("/me", response_model=UserOut)
-def read_me(current_user: models.User = Depends(get_current_user)):
+def read_me(request: Request, response: Response, current_user: models.User = Depends(get_current_user)):
     """
     Returns the details of the currently authenticated user.
+    The user comes from the user cache, so the ETag is simply a hash of the body.
+    """
+    user = UserOut.model_validate(current_user)
+    etag = make_etag(request, user.model_dump_json())
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    response.headers.update(cache_headers(etag))
+    return user
+
+@user_router.patch("/me/settings", response_model=UserOut)
+def update_settings(
+    payload: UserSettingsUpdate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Updates the current user's preferences. Fields left out are unchanged.
+    """
+    user = db.get(models.User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    for field, value in payload.model_dump(exclude_unset=True).items():
+        if value is not None:
+            setattr(user, field, value)
+    db.commit()
+    db.refresh(user)
+    return user
+
+@user_router.get("/me/usage", response_model=UsageSummary)
+def read_usage(
+    days: int = Query(7, ge=1, le=90),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    The current user's model usage over the last `days` days, by kind of call and by day,
+    and how much of their token budget the current window has used. Counts are local
+    estimates and reach the database every USAGE_FLUSH_SECONDS, so other workers' most
+    recent calls may not be included yet.
     """
-    return current_user
+    return usage_summary(db, current_user, days)
+
+CONVERSATION_STREAM_BATCH = 200
+
+def _find_conversation(db: Session, user_id: int, category: str):
+    return db.query(models.Conversation).filter(
+        models.Conversation.user_id == user_id,
+        models.Conversation.category == category
+    ).first()
+
+def _get_or_create_conversation(db: Session, user_id: int, category: str) -> models.Conversation:
+    conversation = _find_conversation(db, user_id, category)
+    if conversation:
+        return conversation
+    conversation = models.Conversation(user_id=user_id, category=category, last_seq=0)
+    db.add(conversation)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another request created it first.
+        db.rollback()
+        conversation = _find_conversation(db, user_id, category)
+    return conversation
+
+def _stream_messages(conversation_id: int, header: dict, limit: Optional[int], before_seq: Optional[int]):
+    """Yields the ConversationOut JSON document in pieces, reading messages in batches."""
+    # The request's session may already be closed while the body streams, so use our own.
+    db = SessionLocal()
+    try:
+        message = models.ConversationMessage
+        query = select(message.role, message.content, message.seq).where(message.conversation_id == conversation_id)
+        if before_seq is not None:
+            query = query.where(message.seq < before_seq)
+        if limit is not None:
+            window = query.order_by(message.seq.desc()).limit(limit).subquery()
+            query = select(window.c.role, window.c.content, window.c.seq).order_by(window.c.seq)
+        else:
+            query = query.order_by(message.seq)
+
+        yield json.dumps(header)[:-1] + ', "messages": ['
+        separator = ""
+        for rows in db.execute(query.execution_options(yield_per=CONVERSATION_STREAM_BATCH)).partitions():
+            yield separator + ",".join(
+                json.dumps({"role": row.role, "content": row.content, "seq": row.seq}) for row in rows
+            )
+            separator = ","
+        yield "]}"
+    finally:
+        db.close()
 
 @user_router.get("/conversation/{category}", response_model=ConversationOut)
 def get_conversation(
     category: str,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    before_seq: Optional[int] = Query(None, ge=1),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    try:
-        conversation = db.query(models.Conversation).filter(
-            models.Conversation.user_id == current_user.id,
-            models.Conversation.category == category
-        ).one()
-        return conversation
-    except NoResultFound:
-        raise HTTPException(status_code=404, detail="Conversation not found for this category.")
+    """
+    Returns the conversation history, oldest message first.
+    `limit` returns only the newest N messages (before `before_seq`, if given); the
+    body is streamed so long histories are never held in memory all at once.
+    A client whose copy is current gets a 304 without the conversation being read.
+    A save of it still in the write-behind queue is returned as it will be stored.
+    """
+    versions = read_versions(db, current_user.id)
+    etag = make_etag(request, current_user.id, versions.conversations_version, write_behind.pending_marker(current_user.id))
+    cached = not_modified(request, etag, versions.data_updated_at)
+    if cached is not None:
+        return cached
 
+    pending = write_behind.pending_conversation(current_user.id, category)
+    if pending is not None:
+        messages = pending["messages"]
+        if before_seq is not None:
+            messages = [msg for msg in messages if msg["seq"] < before_seq]
+        if limit is not None:
+            messages = messages[-limit:]
+        response.headers.update(cache_headers(etag, versions.data_updated_at))
+        return pending | {"messages": messages}
 
-@user_router.post("/conversation", response_model=ConversationOut)
-def save_conversation(
-    payload: ConversationCreate,
+    conversation = _find_conversation(db, current_user.id, category)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found for this category.")
+    header = {
+        "category": conversation.category,
+        "updated_at": conversation.updated_at.isoformat(),
+        "last_seq": conversation.last_seq,
+    }
+    return StreamingResponse(
+        _stream_messages(conversation.id, header, limit, before_seq),
+        media_type="application/json",
+        headers=cache_headers(etag, versions.data_updated_at),
+    )
+
+@user_router.post("/conversation/{category}/messages", response_model=ConversationAppendOut)
+def append_conversation_messages(
+    category: str,
+    payload: ConversationAppend,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    # Try to find an existing conversation for this user and category
-    conversation = db.query(models.Conversation).filter(
-        models.Conversation.user_id == current_user.id,
-        models.Conversation.category == payload.category
-    ).first()
+    """
+    Appends new turns to a conversation. `after_seq` must match the newest stored
+    message, otherwise the client is out of date and gets a 409. Retrying with the
+    same idempotency_key returns the current state without storing the turns twice.
+    """
+    # A whole-conversation save still queued would otherwise overwrite these turns.
+    write_behind.wait_for_conversation(current_user.id, category)
+    conversation = _get_or_create_conversation(db, current_user.id, category)
 
-    if conversation:
-        # If it exists, update it
-        conversation.messages = [msg.dict() for msg in payload.messages]
-    else:
-        # If it doesn't exist, create a new one
-        conversation = models.Conversation(
-            user_id=current_user.id,
-            category=payload.category,
-            messages=[msg.dict() for msg in payload.messages]
-        )
-        db.add(conversation)
-    
-    db.commit()
-    db.refresh(conversation)
-    return conversation
+    if payload.idempotency_key:
+        already_stored = db.query(models.ConversationMessage.id).filter(
+            models.ConversationMessage.conversation_id == conversation.id,
+            models.ConversationMessage.idempotency_key == payload.idempotency_key
+        ).first()
+        if already_stored:
+            return {"category": category, "last_seq": conversation.last_seq, "updated_at": conversation.updated_at}
+
+    if payload.after_seq != conversation.last_seq:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Conversation has newer messages; reload it first.")
+
+    for offset, msg in enumerate(payload.messages, start=1):
+        db.add(models.ConversationMessage(
+            conversation_id=conversation.id,
+            seq=conversation.last_seq + offset,
+            role=msg.role,
+            content=msg.content,
+            idempotency_key=payload.idempotency_key if offset == 1 else None,
+        ))
+    conversation.last_seq += len(payload.messages)
+    conversation.updated_at = datetime.utcnow()
+    bump_versions(db, current_user.id, conversations=True)
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent append claimed the same sequence numbers.
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Conversation has newer messages; reload it first.")
+    return {"category": category, "last_seq": conversation.last_seq, "updated_at": conversation.updated_at}
 
 
+@user_router.post("/conversation", response_model=ConversationOut)
+async def save_conversation(
+    payload: ConversationCreate,
+    response: Response,
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Replaces the whole conversation. Kept for older clients; new clients should use
+    the append endpoint, which only writes the new turns. With write-behind on, saves
+    are committed in batches, and only the newest of several queued saves is written.
+    """
+    messages = [{"role": msg.role, "content": msg.content} for msg in payload.messages]
+    output, queued = await write_behind.save(conversation_write(current_user.id, payload.category, messages))
+    if queued:
+        response.status_code = status.HTTP_202_ACCEPTED
+    return output
+
 
 @user_router.post("/results", response_model=ResultOut, status_code=status.HTTP_201_CREATED)
-def create_result(
-    payload: ResultCreate, 
-    db: Session = Depends(get_db), 
+async def create_result(
+    payload: ResultCreate,
+    response: Response,
     current_user: models.User = Depends(get_current_user)
 ):
     """
     Saves a new result (e.g., from a practice test) for the current user.
+    With write-behind on, results are committed in batches (see app/write_behind.py);
+    with WRITE_BEHIND_ACK=queued the answer is a 202 without an id, sent once queued.
     """
-    result = models.Result(
-        user_id=current_user.id, 
-        category=payload.category, 
-        score=payload.score, 
-        meta=payload.meta
+    output, queued = await write_behind.save(
+        result_write(current_user.id, payload.category, payload.score, payload.meta)
     )
-    db.add(result)
-    db.commit()
-    db.refresh(result)
-    return result
+    if queued:
+        response.status_code = status.HTTP_202_ACCEPTED
+    return output
+
+RESULTS_PAGE_SIZE = 500
+RESULTS_MAX_PAGE_SIZE = 5000
+
+def _encode_cursor(result: models.Result) -> str:
+    raw = f"{result.created_at.isoformat()}|{result.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, result_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(result_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _pending_in_page(result: dict, category, since, until, after) -> bool:
+    """Whether a queued result falls within the filters and after the cursor, as the SQL ones do."""
+    created_at = result["created_at"]
+    if category and result["category"] != category:
+        return False
+    if since and created_at < _naive_utc(since):
+        return False
+    if until and created_at >= _naive_utc(until):
+        return False
+    if after is None or created_at > after[0]:
+        return True
+    return created_at == after[0] and (result["id"] is None or result["id"] > after[1])
+
+def _result_filters(user_id: int, category: Optional[str], since: Optional[datetime], until: Optional[datetime]):
+    filters = [models.Result.user_id == user_id]
+    if category:
+        filters.append(models.Result.category == category)
+    # created_at is stored as naive UTC; a query value with an offset is converted to it.
+    if since:
+        filters.append(models.Result.created_at >= _naive_utc(since))
+    if until:
+        filters.append(models.Result.created_at < _naive_utc(until))
+    return filters
 
 @user_router.get("/results", response_model=ResultsList)
 def list_results(
+    request: Request,
+    response: Response,
+    category: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(RESULTS_PAGE_SIZE, ge=1, le=RESULTS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db), 
     current_user: models.User = Depends(get_current_user)
 ):
     """
-    Lists all historical results for the currently authenticated user.
+    Lists historical results for the currently authenticated user, oldest first.
+    Pages are keyed on (created_at, id); pass next_cursor back to get the next page.
+    The user's own results still in the write-behind queue (id None until committed)
+    are added to the last page, which may then hold more than `limit`.
     """
+    pending = write_behind.pending_results(current_user.id)
+    versions = read_versions(db, current_user.id)
+    etag = make_etag(request, current_user.id, versions.results_version, write_behind.pending_marker(current_user.id))
+    cached = not_modified(request, etag, versions.data_updated_at)
+    if cached is not None:
+        return cached
+    response.headers.update(cache_headers(etag, versions.data_updated_at))
+
+    filters = _result_filters(current_user.id, category, since, until)
+    after = None
+    if cursor:
+        after = created_at, result_id = _decode_cursor(cursor)
+        filters.append(or_(
+            models.Result.created_at > created_at,
+            and_(models.Result.created_at == created_at, models.Result.id > result_id),
+        ))
+
     results = db.query(models.Result)\
-                .filter(models.Result.user_id == current_user.id)\
-                .order_by(models.Result.created_at.asc())\
+                .filter(*filters)\
+                .order_by(models.Result.created_at.asc(), models.Result.id.asc())\
+                .limit(limit + 1)\
                 .all()
     
-    return {"results": results}
\ No newline at end of file
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = _encode_cursor(results[-1])
+    elif pending:
+        # Read before the query: one committed in between is in `results` already.
+        stored = {result.id for result in results}
+        results = results + sorted(
+            (p for p in pending if p["id"] not in stored and _pending_in_page(p, category, since, until, after)),
+            key=lambda p: p["created_at"],
+        )
+    return {"results": results, "next_cursor": next_cursor}
+
+def _bucket_expression(dialect: str, bucket: str):
+    """Start date of the bucket each result falls in, as a YYYY-MM-DD string."""
+    created_at = models.Result.created_at
+    if dialect == "sqlite":
+        if bucket == "week":
+            return func.date(created_at, "weekday 0", "-6 days")
+        if bucket == "month":
+            return func.strftime("%Y-%m-01", created_at)
+        return func.date(created_at)
+    return func.to_char(func.date_trunc(bucket, created_at), "YYYY-MM-DD")
+
+@user_router.get("/results/stats", response_model=ResultStats)
+def results_stats(
+    request: Request,
+    response: Response,
+    bucket: str = Query("day", pattern="^(day|week|month)$"),
+    window: int = Query(7, ge=1, le=365),
+    category: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Returns per-category, time-bucketed score statistics computed in SQL.
+    rolling_avg averages the bucket averages over the last `window` buckets.
+    """
+    versions = read_versions(db, current_user.id)
+    etag = make_etag(request, current_user.id, versions.results_version, write_behind.pending_marker(current_user.id))
+    cached = not_modified(request, etag, versions.data_updated_at)
+    if cached is not None:
+        return cached
+    response.headers.update(cache_headers(etag, versions.data_updated_at))
+
+    bucket_start = _bucket_expression(db.get_bind().dialect.name, bucket).label("bucket")
+    per_bucket = select(
+        models.Result.category,
+        bucket_start,
+        func.count(models.Result.id).label("count"),
+        func.min(models.Result.score).label("min"),
+        func.max(models.Result.score).label("max"),
+        func.avg(models.Result.score).label("avg"),
+    ).where(*_result_filters(current_user.id, category, since, until))\
+     .group_by(models.Result.category, bucket_start)\
+     .subquery()
+
+    rolling_avg = func.avg(per_bucket.c.avg).over(
+        partition_by=per_bucket.c.category,
+        order_by=per_bucket.c.bucket,
+        rows=(-(window - 1), 0),
+    ).label("rolling_avg")
+    rows = db.execute(
+        select(per_bucket, rolling_avg).order_by(per_bucket.c.category, per_bucket.c.bucket)
+    ).mappings().all()
+
+    return {"bucket": bucket, "window": window, "stats": [dict(row) for row in rows]}
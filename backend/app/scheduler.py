@@ -0,0 +1,258 @@
+# backend/app/scheduler.py
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Lower numbers are served first.
+PRIORITY_CHAT = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_BATCH = 2
+
+
+class LatencyWindow:
+    """Keeps the most recent durations and reports percentiles over them."""
+
+    def __init__(self, size: int = 1000):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def stats(self) -> Dict[str, float]:
+        ordered = sorted(self._samples)
+        if not ordered:
+            return {"count": self.count, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+
+        def pct(p: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 4)
+
+        return {"count": self.count, "p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99)}
+
+
+class PriorityGate:
+    """
+    Hands out a fixed number of permits, serving waiters by priority and then arrival
+    order. Like asyncio.Semaphore, but a queued chat turn overtakes a queued batch item.
+    """
+
+    def __init__(self, permits: int):
+        self._available = permits
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    def waiting(self, priority: Optional[int] = None) -> int:
+        return sum(1 for p, _, f in self._waiters if not f.done() and (priority is None or p == priority))
+
+    async def acquire(self, priority: int):
+        if self._available > 0 and not self.waiting():
+            self._available -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The permit may have been handed over just as we were cancelled.
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._available += 1
+
+
+class TokenBucket:
+    """
+    Admits at most rate calls per second on average, with bursts of up to burst calls.
+    Waiters are admitted by priority. A rate of 0 disables the limit. With a shared
+    store the bucket is kept there under key, so the limit holds across every worker
+    using that store rather than per worker.
+    """
+
+    def __init__(self, rate: float, burst: int, store=None, key: str = "rate:model"):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.store = store
+        self.key = key
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._drainer: Optional[asyncio.Task] = None
+        self.throttled = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def _take(self) -> float:
+        """Takes a token. Returns 0 on success, else the seconds until one is available."""
+        if self.store is not None:
+            return await asyncio.to_thread(self.store.take_token, self.key, self.rate, self.burst)
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def waiting(self) -> int:
+        return sum(1 for _, _, f in self._waiters if not f.done())
+
+    async def acquire(self, priority: int):
+        if self.rate <= 0:
+            return
+        if not self.waiting() and await self._take() == 0:
+            return
+        self.throttled += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        if self._drainer is None or self._drainer.done():
+            self._drainer = asyncio.create_task(self._drain())
+        await future
+
+    async def _drain(self):
+        while True:
+            # Drop waiters that were cancelled, so no token is taken on their behalf.
+            while self._waiters and self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+            if not self._waiters:
+                return
+            wait = await self._take()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+
+    def stats(self) -> dict:
+        if self.rate <= 0:
+            return {"enabled": False}
+        stats = {
+            "enabled": True,
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "shared": self.store.name if self.store is not None else None,
+            "waiting": self.waiting(),
+            "throttled": self.throttled,
+        }
+        if self.store is None:
+            self._refill()
+            stats["tokens"] = round(self._tokens, 2)
+        return stats
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream that is known to be failing."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("The AI model is temporarily unavailable. Please try again shortly.")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive upstream failures and rejects calls for
+    reset_seconds. Then a single probe call is let through: success closes the circuit,
+    failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    def before_call(self):
+        if self.state == "closed":
+            return
+        remaining = self._opened_at + self.reset_seconds - time.monotonic()
+        if remaining > 0 or self._probing:
+            self.rejected += 1
+            raise CircuitOpenError(max(remaining, 1.0))
+        self.state = "half_open"
+        self._probing = True
+
+    def record_success(self):
+        if self.state != "closed":
+            logger.info("Model circuit closed.")
+        self.state = "closed"
+        self._failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._probing = False
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logger.error(f"Model circuit opened after {self._failures} consecutive failures.")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def release_probe(self):
+        """Called when a probe ends without telling us anything, e.g. it was cancelled."""
+        self._probing = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class SingleFlight:
+    """
+    Shares one in-flight call between identical concurrent requests. The call runs in
+    its own task, so one caller going away does not fail the others; it is cancelled
+    only when every caller has gone.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, Tuple[asyncio.Task, List[int]]] = {}
+        self.coalesced = 0
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, call: Callable[[], Awaitable]):
+        entry = self._calls.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(call())
+            entry = (task, [0])
+            self._calls[key] = entry
+            task.add_done_callback(lambda _: self._calls.pop(key, None) if self._calls.get(key) is entry else None)
+        else:
+            self.coalesced += 1
+        task, callers = entry
+        callers[0] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and callers[0] == 1:
+                task.cancel()
+            raise
+        finally:
+            callers[0] -= 1
@@ -1,7 +1,8 @@
 # backend/app/schemas.py
 
-from pydantic import BaseModel
-from typing import List, Dict
+from pydantic import BaseModel, Field
+from typing import List, Dict, Optional
+from datetime import datetime
 
 class TextPayload(BaseModel):
     """Defines the expected request body for text-based AI endpoints."""
@@ -9,4 +10,62 @@ class TextPayload(BaseModel):
 
 class ChatPayload(BaseModel):
     """Defines the expected request body for the chatbot."""
-    messages: List[Dict[str, str]]
\ No newline at end of file
+    messages: List[Dict[str, str]]
+    category: str = "chat"
+
+# --- Model output schemas, one per JSON prompt ---
+
+class TodoItem(BaseModel):
+    id: int
+    task: str
+    steps: List[str] = []
+
+class TodoList(BaseModel):
+    """Output of todo_prompt.txt."""
+    todos: List[TodoItem]
+
+class MentalHealthAnalysisBody(BaseModel):
+    summary: str
+    key_emotion: str
+    suggestions: List[str]
+    affirmation: str
+
+class MentalHealthAnalysis(BaseModel):
+    """Output of mental_health_prompt.txt."""
+    analysis: MentalHealthAnalysisBody
+
+class AtsScore(BaseModel):
+    score: int = Field(..., ge=0, le=100)
+    explanation: str
+
+class SectionFeedback(BaseModel):
+    contact_info: Optional[str] = None
+    work_experience: Optional[str] = None
+    skills: Optional[str] = None
+    education: Optional[str] = None
+
+class ResumeAnalysisBody(BaseModel):
+    overall_summary: str
+    ats_compatibility_score: AtsScore
+    section_feedback: SectionFeedback
+    recommendations: List[str]
+
+class ResumeAnalysis(BaseModel):
+    """Output of resume_prompt.txt."""
+    analysis: ResumeAnalysisBody
+
+class BatchTextsPayload(BaseModel):
+    """Defines the expected request body for a batch of text items."""
+    texts: List[str] = Field(..., min_length=1)
+
+class BatchJobOut(BaseModel):
+    """Progress of a batch job."""
+    job_id: str
+    kind: str
+    status: str
+    total: int
+    done: int
+    failed: int
+    pending: int
+    created_at: datetime
+    updated_at: datetime
@@ -26,18 +26,48 @@ class UserOut(BaseModel):
     username: str
     email: Optional[str]
     created_at: datetime
+    semantic_cache_enabled: bool = True
 
     class Config:
         # FIX: Changed 'orm_mode' to 'from_attributes'
         from_attributes = True
 
+class UserSettingsUpdate(BaseModel):
+    semantic_cache_enabled: Optional[bool] = None
+
+class UsageCounts(BaseModel):
+    calls: int
+    prompt_tokens: int
+    output_tokens: int
+    avg_latency_ms: float
+
+class UsageByKind(UsageCounts):
+    kind: str
+
+class UsageByDay(UsageCounts):
+    day: str  # YYYY-MM-DD (UTC)
+
+class UsageWindow(BaseModel):
+    seconds: int
+    budget: int  # 0: no limit
+    used_tokens: int
+    remaining_tokens: Optional[int] = None
+
+class UsageSummary(BaseModel):
+    since: datetime
+    window: UsageWindow
+    totals: UsageCounts
+    by_kind: List[UsageByKind]
+    by_day: List[UsageByDay]
+
 class ResultCreate(BaseModel):
     category: str
     score: float
     meta: Optional[str] = None
 
 class ResultOut(BaseModel):
-    id: int
+    # None for a result acknowledged before its commit (WRITE_BEHIND_ACK=queued).
+    id: Optional[int] = None
     category: str
     score: float
     meta: Optional[str]
@@ -49,10 +79,27 @@ class ResultOut(BaseModel):
 
 class ResultsList(BaseModel):
     results: List[ResultOut]
+    # Opaque keyset cursor for the next page; None when there are no more results.
+    next_cursor: Optional[str] = None
+
+class ResultBucket(BaseModel):
+    category: str
+    bucket: str
+    count: int
+    min: float
+    max: float
+    avg: float
+    rolling_avg: float
+
+class ResultStats(BaseModel):
+    bucket: str
+    window: int
+    stats: List[ResultBucket]
     
 class Message(BaseModel):
     role: str
     content: str
+    seq: Optional[int] = None
 
 class ConversationBase(BaseModel):
     category: str
@@ -63,6 +110,18 @@ class ConversationCreate(ConversationBase):
 
 class ConversationOut(ConversationBase):
     updated_at: datetime
+    last_seq: int = 0
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ConversationAppend(BaseModel):
+    messages: List[Message] = Field(..., min_length=1)
+    # seq of the newest message the client already has; 0 for a new conversation.
+    after_seq: int = Field(..., ge=0)
+    idempotency_key: Optional[str] = Field(None, max_length=100)
+
+class ConversationAppendOut(BaseModel):
+    category: str
+    last_seq: int
+    updated_at: datetime
\ No newline at end of file
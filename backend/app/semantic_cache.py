@@ -0,0 +1,233 @@
+# backend/app/semantic_cache.py
+import os
+import re
+import time
+import zlib
+import math
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from .metrics import SEMANTIC_CACHE_LOOKUPS, SEMANTIC_CACHE_SECONDS_SAVED
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Prompts whose responses may be served to a similar enough question. Chat is only ever
+# cached on its first turn. Short check-ins (mental_health) repeat a lot across students;
+# unlike the exact cache, only questions under SEMANTIC_CACHE_MAX_QUESTION_CHARS are
+# stored, and users who opt out are neither served nor stored.
+SEMANTIC_CACHE_PROMPTS = {
+    name.strip() for name in os.getenv("SEMANTIC_CACHE_PROMPTS", "interview,mental_health").split(",") if name.strip()
+}
+# Cosine similarity at or above which a cached response is served. Tuned with
+# loadtest/semantic_cache_bench.py: rewordings mostly score 0.75-1.0, while different
+# questions on the same topic stay under 0.6.
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.75"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", str(7 * 86400)))
+# Longer questions are usually personal (a pasted CV, a story) and are never cached.
+SEMANTIC_CACHE_MAX_QUESTION_CHARS = int(os.getenv("SEMANTIC_CACHE_MAX_QUESTION_CHARS", "300"))
+# Width of the hashed feature vectors; a power of two.
+SEMANTIC_CACHE_DIMENSIONS = 2048
+
+_WORD = re.compile(r"[a-z0-9+#]+")
+# Function words, and the greetings and question framing that do not change what is asked.
+STOPWORDS = frozenset(
+    "a an the i im me my we our you your to of and or in on at for from is are was be been am do does did "
+    "how what can could would should will with about it its this that there please just some any so if "
+    "hi hey hello thanks thank coach quick question answer tips best way use using".split()
+)
+# Word pairs count for less than words: they keep "why are you leaving" apart from
+# "why do you want to work here" without penalising a reordered question much.
+BIGRAM_WEIGHT = 0.5
+
+
+def _features(text: str) -> List[Tuple[str, float]]:
+    """(feature, weight) pairs: words (crudely stemmed, stopwords dropped) and adjacent word pairs."""
+    words = []
+    for word in _WORD.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return [(word, 1.0) for word in words] + [(f"{a} {b}", BIGRAM_WEIGHT) for a, b in zip(words, words[1:])]
+
+
+def embed(text: str):
+    """
+    A unit-length hashed bag-of-features vector (float32), or None if the text has no
+    content words. Signed feature hashing keeps the dimension fixed without a vocabulary,
+    so vectors computed by different workers or at different times are comparable.
+    """
+    import numpy as np
+
+    counts: Dict[int, float] = {}
+    for feature, weight in _features(text):
+        h = zlib.crc32(feature.encode("utf-8"))
+        index = h & (SEMANTIC_CACHE_DIMENSIONS - 1)
+        counts[index] = counts.get(index, 0.0) + (weight if h & 0x80000000 else -weight)
+    if not counts:
+        return None
+    vector = np.zeros(SEMANTIC_CACHE_DIMENSIONS, dtype=np.float32)
+    for index, count in counts.items():
+        # Sublinear term frequency: a repeated word should not dominate.
+        vector[index] = math.copysign(1 + math.log(abs(count)), count) if abs(count) > 1 else count
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else None
+
+
+class _Index:
+    """The cached entries of one namespace: a matrix of vectors searched by dot product."""
+
+    def __init__(self, max_entries: int):
+        import numpy as np
+
+        self.max_entries = max_entries
+        self.vectors = np.zeros((min(64, max_entries), SEMANTIC_CACHE_DIMENSIONS), dtype=np.float32)
+        self.size = 0
+        self.values: List[Any] = []
+        self.questions: List[str] = []
+        self.created_at: List[float] = []
+        self.last_used: List[float] = []
+        self.cost_seconds: List[float] = []
+
+    def search(self, vector):
+        """Returns (row, similarity) of the nearest entry, or (None, 0.0) if empty."""
+        if self.size == 0:
+            return None, 0.0
+        scores = self.vectors[:self.size] @ vector
+        row = int(scores.argmax())
+        return row, float(scores[row])
+
+    def remove(self, row: int):
+        """Removes an entry by moving the last one into its place."""
+        last = self.size - 1
+        if row != last:
+            self.vectors[row] = self.vectors[last]
+            for column in (self.values, self.questions, self.created_at, self.last_used, self.cost_seconds):
+                column[row] = column[last]
+        for column in (self.values, self.questions, self.created_at, self.last_used, self.cost_seconds):
+            column.pop()
+        self.size = last
+
+    def add(self, vector, question: str, value: Any, cost_seconds: float, now: float, ttl_seconds: float):
+        import numpy as np
+
+        if self.size == self.max_entries:
+            # Expired entries go first; otherwise the least recently served one.
+            created_at = np.asarray(self.created_at)
+            expired = np.flatnonzero(created_at < now - ttl_seconds)
+            self.remove(int(expired[0]) if len(expired) else int(np.argmin(self.last_used)))
+        if self.size == len(self.vectors):
+            grown = np.zeros((min(self.max_entries, 2 * len(self.vectors)), SEMANTIC_CACHE_DIMENSIONS), dtype=np.float32)
+            grown[:self.size] = self.vectors[:self.size]
+            self.vectors = grown
+        self.vectors[self.size] = vector
+        self.values.append(value)
+        self.questions.append(question)
+        self.created_at.append(now)
+        self.last_used.append(now)
+        self.cost_seconds.append(cost_seconds)
+        self.size += 1
+
+
+class SemanticCache:
+    """
+    Serves a stored response to a question that is worded differently but close enough
+    to one answered before. Entries are kept per namespace (prompt version, model and chat category),
+    expire after ttl_seconds and are evicted least recently served first. Per worker.
+    """
+
+    def __init__(self, threshold: float, max_entries: int, ttl_seconds: float, prompts=(), enabled: bool = True):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.prompts = set(prompts)
+        self.enabled = enabled
+        self._indexes: Dict[str, _Index] = {}
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, float]] = {}
+
+    def warm_up(self):
+        """Imports numpy, which the first lookup would otherwise load."""
+        embed("warm up")
+
+    def applies_to(self, prompt_name: str, question: Optional[str]) -> bool:
+        return (
+            self.enabled
+            and prompt_name in self.prompts
+            and bool(question)
+            and len(question) <= SEMANTIC_CACHE_MAX_QUESTION_CHARS
+        )
+
+    def _count(self, prompt_name: str, hit: bool, seconds_saved: float = 0.0):
+        counters = self._counters.setdefault(prompt_name, {"hits": 0, "misses": 0, "seconds_saved": 0.0})
+        counters["hits" if hit else "misses"] += 1
+        counters["seconds_saved"] += seconds_saved
+        SEMANTIC_CACHE_LOOKUPS.labels(prompt_name, "hit" if hit else "miss").inc()
+        if seconds_saved:
+            SEMANTIC_CACHE_SECONDS_SAVED.labels(prompt_name).inc(seconds_saved)
+
+    def get(self, prompt_name: str, namespace: str, question: str) -> Optional[Any]:
+        vector = embed(question)
+        if vector is None:
+            return None
+        now = time.time()
+        with self._lock:
+            index = self._indexes.get(namespace)
+            row, similarity = index.search(vector) if index is not None else (None, 0.0)
+            if row is not None and similarity >= self.threshold:
+                if now - index.created_at[row] <= self.ttl_seconds:
+                    index.last_used[row] = now
+                    self._count(prompt_name, True, index.cost_seconds[row])
+                    logger.info(f"Semantic cache hit for {prompt_name} (similarity {similarity:.2f}).")
+                    return index.values[row]
+                index.remove(row)
+        self._count(prompt_name, False)
+        return None
+
+    def set(self, namespace: str, question: str, value: Any, cost_seconds: float):
+        """Stores a response; cost_seconds is how long it took to generate, i.e. what a hit saves."""
+        vector = embed(question)
+        if vector is None:
+            return
+        now = time.time()
+        with self._lock:
+            index = self._indexes.get(namespace)
+            if index is None:
+                index = self._indexes[namespace] = _Index(self.max_entries)
+            # A concurrent miss on the same question may have stored it already.
+            row, similarity = index.search(vector)
+            if row is not None and similarity >= self.threshold:
+                index.remove(row)
+            index.add(vector, question, value, cost_seconds, now, self.ttl_seconds)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+    def stats(self) -> dict:
+        prompts = {}
+        for name, counters in self._counters.items():
+            lookups = counters["hits"] + counters["misses"]
+            prompts[name] = {
+                **counters,
+                "seconds_saved": round(counters["seconds_saved"], 2),
+                "hit_rate": round(counters["hits"] / lookups, 3) if lookups else 0.0,
+            }
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "entries": sum(index.size for index in self._indexes.values()),
+            "prompts": prompts,
+        }
+
+
+semantic_cache = SemanticCache(
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_TTL_SECONDS,
+    prompts=SEMANTIC_CACHE_PROMPTS,
+    enabled=SEMANTIC_CACHE_ENABLED,
+)
@@ -1,158 +1,356 @@
 # backend/app/services.py
 import os
+import math
+import time
 import logging
-from typing import IO, List, Dict,Generator
-from fastapi import UploadFile
-import docx
-from PyPDF2 import PdfReader
+from typing import Any, Callable, List, Dict, AsyncGenerator, Optional, Tuple, Type, Union
 import asyncio
-import google.generativeai as genai
 import json
+import orjson
+from .llm import get_llm_backend, estimate_tokens, ModelOutputError
+from .model_client import generate_json, generate_text, stream_chat_message, stream_json
+from .json_stream import JSONStreamParser, iter_fields, parse_model_json
+from .schemas import TodoList, MentalHealthAnalysis, ResumeAnalysis
+from pydantic import BaseModel
+from .scheduler import PRIORITY_CHAT, PRIORITY_INTERACTIVE
+from .cache import response_cache, make_key, normalize_text
+from .semantic_cache import semantic_cache
+from .uploads import ResumeUpload
+from .resume_text import RESUME_NORMALIZE, ats_signals, format_ats_hints
+from .prompts import prompt_registry
+from .extraction import prepare_resume_file, prepare_resume_text, preload as preload_extraction, ExtractionLimitError, PDF_MIME, DOCX_MIME
+from .chat_context import CHAT_CONTEXT_TOKEN_BUDGET, build_chat_context
+from .usage import USAGE_OUTPUT_TOKEN_ESTIMATE, QuotaExceededError, usage_ledger
+from .metrics import MODEL_JSON_OUTPUTS, span
 
 logger = logging.getLogger(__name__)
 
-_json_model = None
-_chat_model = None
-
-json_generation_config = { "temperature": 1, "top_p": 0.95, "top_k": 64, "max_output_tokens": 8192, "response_mime_type": "application/json",}
-chat_generation_config = { "temperature": 0.9, "top_p": 1, "top_k": 32, "max_output_tokens": 8192, "response_mime_type": "text/plain",}
-
-def ensure_models():
-    """Lazily configure the Gemini API and initialize model instances."""
-    global _json_model, _chat_model
-    if _json_model and _chat_model: return
-
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        logger.error("GEMINI_API_KEY not set.")
-        raise RuntimeError("GEMINI_API_KEY environment variable not found.")
-    
-    genai.configure(api_key=api_key)
-    # Switched to the standard 'gemini-pro' model
-    _json_model = genai.GenerativeModel("gemini-2.5-flash", generation_config=json_generation_config)
-    _chat_model = genai.GenerativeModel("gemini-2.5-flash", generation_config=chat_generation_config)
-    logger.info("Gemini models initialized.")
-
-def extract_text_from_pdf(file: IO[bytes]) -> str:
-    """Extracts text from a PDF file stream."""
+RESUME_EXTRACT_WORKERS = int(os.getenv("RESUME_EXTRACT_WORKERS", "2"))
+# Load the model SDK and start the extraction workers in the background once the worker
+# is serving, so the first resume or model request does not pay for it.
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+_extraction_pool = None
+# Size of the chunks a cached chat reply is streamed in.
+SEMANTIC_CACHE_CHUNK_CHARS = 64
+
+def _get_extraction_pool() -> "ProcessPoolExecutor":
+    global _extraction_pool
+    if _extraction_pool is None:
+        # Imported here: the process pool machinery is slow to import and only resumes need it.
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # 'spawn' keeps the workers free of the server's threads and event loop state.
+        _extraction_pool = ProcessPoolExecutor(
+            max_workers=RESUME_EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _extraction_pool
+
+def shutdown_extraction_pool():
+    global _extraction_pool
+    if _extraction_pool is not None:
+        _extraction_pool.shutdown(wait=False, cancel_futures=True)
+        _extraction_pool = None
+
+async def _run_extraction(prepare: Callable[[str, Any], str], content_type: str, source: Any) -> str:
+    """
+    Runs an extraction entry point in a worker process, so a large or hostile file
+    cannot stall the event loop.
+    """
+    if content_type not in (PDF_MIME, DOCX_MIME):
+        raise ValueError("Unsupported file type")
+    from concurrent.futures.process import BrokenProcessPool
+
+    loop = asyncio.get_running_loop()
     try:
-        pdf_reader = PdfReader(file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() or ""
-        return text
-    except Exception as e:
-        logger.error(f"Error reading PDF file: {e}", exc_info=True)
-        raise
+        # Timed from the server side: the span includes waiting for a free extraction worker.
+        with span("extract_pdf" if content_type == PDF_MIME else "extract_docx"):
+            return await loop.run_in_executor(_get_extraction_pool(), prepare, content_type, source)
+    except BrokenProcessPool:
+        # The worker was killed, most likely by the CPU-time limit. Start a fresh pool.
+        logger.error("Resume extraction worker died; recreating the pool.")
+        shutdown_extraction_pool()
+        raise ExtractionLimitError("The file could not be processed within the extraction limits.")
+
+async def extract_resume(content_type: str, data: bytes) -> str:
+    """Extracts the text of a resume held in memory, cleaned up for the prompt."""
+    return await _run_extraction(prepare_resume_text, content_type, data)
 
-def extract_text_from_docx(file: IO[bytes]) -> str:
-    """Extracts text from a DOCX file stream."""
+async def extract_upload(upload: ResumeUpload) -> str:
+    """
+    Extracts the text of an uploaded resume, cleaned up for the prompt. An upload spooled
+    to disk is passed to the worker by path and memory-mapped there, not copied to it.
+    """
+    logger.info(f"Processing {upload.size} byte file of type: {upload.content_type}")
+    if upload.path is not None:
+        return await _run_extraction(prepare_resume_file, upload.content_type, upload.path)
+    return await _run_extraction(prepare_resume_text, upload.content_type, upload.data)
+
+async def warm_up():
+    """
+    Preloads what the first model and resume requests would otherwise load on demand:
+    the model SDK, and the extraction workers with their parsers. Failures are only
+    logged; the same work is retried on first use.
+    """
+    started = time.perf_counter()
     try:
-        doc = docx.Document(file)
-        text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-        return text
-    except Exception as e:
-        logger.error(f"Error reading DOCX file: {e}", exc_info=True)
+        await asyncio.to_thread(get_llm_backend().warm_up)
+        if semantic_cache.enabled:
+            await asyncio.to_thread(semantic_cache.warm_up)
+        pool = _get_extraction_pool()
+        loop = asyncio.get_running_loop()
+        # One task per worker, submitted together, so every worker process is started.
+        await asyncio.gather(*(loop.run_in_executor(pool, preload_extraction) for _ in range(RESUME_EXTRACT_WORKERS)))
+    except asyncio.CancelledError:
         raise
+    except Exception as e:
+        logger.warning(f"Warm-up failed: {e}")
+        return
+    logger.info(f"Warm-up finished in {time.perf_counter() - started:.2f}s.")
 
-async def process_resume_file(file: UploadFile) -> str:
-    """Processes an uploaded resume file and extracts its text content."""
-    content_type = file.content_type
-    file_stream = file.file
-    file_stream.seek(0) 
-    logger.info(f"Processing file of type: {content_type}")
-
-    if content_type == "application/pdf":
-        return extract_text_from_pdf(file_stream)
-    elif content_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-        return extract_text_from_docx(file_stream)
-    else:
-        raise ValueError("Unsupported file type")
+# The schema each JSON prompt's output must match.
+RESPONSE_SCHEMAS: Dict[str, Type[BaseModel]] = {
+    "todo": TodoList,
+    "mental_health": MentalHealthAnalysis,
+    "resume": ResumeAnalysis,
+}
+
+def _resume_prompt_values(user_text: str) -> Dict[str, str]:
+    if not RESUME_NORMALIZE:
+        return {"ats_hints": "not available"}
+    return {"ats_hints": format_ats_hints(ats_signals(user_text))}
+
+# Values for a prompt's placeholders other than user_text, computed locally from user_text.
+PROMPT_VALUES: Dict[str, Callable[[str], Dict[str, str]]] = {
+    "resume": _resume_prompt_values,
+}
+
+def render_prompt(template, prompt_name: str, user_text: str) -> str:
+    extra = PROMPT_VALUES[prompt_name](user_text) if prompt_name in PROMPT_VALUES else {}
+    return template.render(user_text=user_text, **extra)
+
+def response_cache_key(prompt_name: str, endpoint: str, source: Union[str, bytes]) -> Optional[str]:
+    """
+    Returns the cache key for a JSON generation, or None if the endpoint opted out.
+    The key covers the prompt template version and the backend's model and generation config, so editing
+    any of them naturally invalidates old entries. Text sources are whitespace-normalized;
+    bytes (uploaded files) are hashed as-is.
+    """
+    if not response_cache.enabled_for(endpoint):
+        return None
+    template = prompt_registry.get(prompt_name)
+    if isinstance(source, str):
+        source = normalize_text(source)
+    return make_key(template.version, get_llm_backend().fingerprint(), source)
 
-def generate_ai_response(prompt_file_path: str, user_text: str) -> dict:
-    """Generates a structured JSON response from the AI using the json_model."""
-    logger.info(f"Generating AI response from prompt: {prompt_file_path}")
+def semantic_namespace(prompt_name: str, category: str = "") -> str:
+    """Semantic cache entries are only shared between requests with the same prompt version, model and category."""
+    return f"{prompt_name}:{category}:{prompt_registry.get(prompt_name).version}:{get_llm_backend().fingerprint()}"
+
+def _semantic_lookup(prompt_name: str, user_text: str, enabled: bool) -> Tuple[Optional[str], Any]:
+    """Returns (namespace, cached value); the namespace is None when the semantic cache does not apply."""
+    if not (enabled and semantic_cache.applies_to(prompt_name, user_text)):
+        return None, None
+    namespace = semantic_namespace(prompt_name)
+    with span("semantic_cache_lookup"):
+        return namespace, semantic_cache.get(prompt_name, namespace, user_text)
+
+async def generate_ai_response(prompt_name: str, user_text: str, endpoint: Optional[str] = None, cache_key: Optional[str] = None, priority: int = PRIORITY_INTERACTIVE, semantic: bool = True) -> dict:
+    """
+    Generates a structured JSON response from the configured model backend.
+    When an endpoint name is given the response is cached by user_text. Callers that
+    key the cache on something else (e.g. the uploaded file) look it up themselves and
+    pass the cache_key so the response is stored under it. Background work passes a lower
+    priority so it queues behind interactive requests. For prompts in SEMANTIC_CACHE_PROMPTS
+    a response to a similar enough text is served too, unless semantic is False.
+    """
+    template = prompt_registry.get(prompt_name)
+    logger.info(f"Generating AI response from prompt: {prompt_name}@{template.version}")
     try:
-        ensure_models()
-        with open(prompt_file_path, "r", encoding="utf-8") as f:
-            prompt_template = f.read()
-        
-        prompt = prompt_template.format(user_text=user_text)
-
-        # FIX: Use generate_content for single, non-chat requests. It's more direct.
-        response = _json_model.generate_content(prompt)
-
-        if hasattr(response, "text") and response.text:
-            return json.loads(response.text)
-        else:
-            logger.error("Model response had no text field.")
-            raise RuntimeError("No response text from model.")
-            
+        if endpoint and cache_key is None:
+            with span("cache_lookup"):
+                cache_key = response_cache_key(prompt_name, endpoint, user_text)
+                cached = await response_cache.aget(cache_key, endpoint)
+            if cached is not None:
+                logger.info(f"Serving cached AI response for {endpoint}.")
+                return cached
+        namespace, cached = _semantic_lookup(prompt_name, user_text, semantic)
+        if cached is not None:
+            return cached
+
+        started = time.perf_counter()
+        with span("prompt_render"):
+            prompt = render_prompt(template, prompt_name, user_text)
+        await usage_ledger.admit(estimate_tokens(prompt) + USAGE_OUTPUT_TOKEN_ESTIMATE)
+        response_text = await generate_json(prompt, prompt_name, priority)
+        response_data = await _parse_response(prompt_name, response_text, priority)
+        await response_cache.aset(cache_key, response_data)
+        if namespace is not None:
+            semantic_cache.set(namespace, user_text, response_data, time.perf_counter() - started)
+        return response_data
+    except QuotaExceededError:
+        raise
     except Exception as e:
         logger.error(f"generate_ai_response failed: {e}", exc_info=True)
         raise
+    finally:
+        usage_ledger.release()
 
-# backend/app/services.py
-# ... (other functions are correct) ...
+def _validate_response(prompt_name: str, response_text: str) -> Tuple[dict, bool]:
+    """Parses (repairing locally if needed) and validates a model response. Returns (data, repaired)."""
+    with span("json_parse"):
+        data, repaired = parse_model_json(response_text)
+        return RESPONSE_SCHEMAS[prompt_name].model_validate(data).model_dump(), repaired
 
-# The rest of your services.py file is correct. Only this function needs to be changed.
+async def _parse_response(prompt_name: str, response_text: str, priority: int) -> dict:
+    """
+    Turns model output into data matching the prompt's schema. Output that cannot be
+    repaired locally gets one targeted retry: the model is shown its response, the
+    problem and the schema, and asked to correct it, which is cheaper than a re-ask.
+    """
+    try:
+        response_data, repaired = _validate_response(prompt_name, response_text)
+        MODEL_JSON_OUTPUTS.labels(prompt_name, "repaired" if repaired else "ok").inc()
+        return response_data
+    except ValueError as e:
+        # pydantic's ValidationError is a ValueError too.
+        error = str(e)
+    logger.warning(f"Unusable {prompt_name} response, asking the model to correct it: {error[:200]}")
 
-# FIX: Removed 'async' from the function definition
-def generate_chat_response_stream(prompt_file_path: str, messages: List[Dict[str, str]]) -> Generator[str, None, None]:
-    """Generates a streaming chat response using the model's native chat history support."""
-    logger.info("Generating streaming chat response.")
+    prompt = prompt_registry.get("json_repair").render(
+        error=error,
+        schema=json.dumps(RESPONSE_SCHEMAS[prompt_name].model_json_schema()),
+        response=response_text,
+    )
+    response_text = await generate_json(prompt, prompt_name, priority)
     try:
-        ensure_models()
-        with open(prompt_file_path, "r", encoding="utf-8") as f:
-            system_instruction = f.read()
-
-        gemini_history = []
-        for msg in messages:
-            role = "user" if msg["role"] == "user" else "model"
-            gemini_history.append({"role": role, "parts": [msg["content"]]})
-        
-        current_message_content = gemini_history.pop()["parts"]
-        chat_session = _chat_model.start_chat(history=gemini_history)
-        final_prompt = f"{system_instruction}\n\n{current_message_content[0]}"
-        response_stream = chat_session.send_message(final_prompt, stream=True)
-        
-        # Use a standard 'for' loop
-        for chunk in response_stream:
-            if chunk.text:
-                yield chunk.text
+        response_data, _ = _validate_response(prompt_name, response_text)
+    except ValueError as e:
+        MODEL_JSON_OUTPUTS.labels(prompt_name, "failed").inc()
+        logger.error(f"Corrected {prompt_name} response is still unusable: {e}")
+        raise ModelOutputError("The AI returned an unexpected response. Please try again.") from e
+    MODEL_JSON_OUTPUTS.labels(prompt_name, "retried").inc()
+    return response_data
 
+async def replay_ai_response(response_data: dict) -> AsyncGenerator[Tuple[str, Any], None]:
+    """The events stream_ai_response would have produced for an already complete (cached) response."""
+    for path, value in iter_fields(response_data):
+        yield "field", {"path": list(path), "value": value}
+    yield "result", response_data
+
+async def stream_ai_response(prompt_name: str, user_text: str, endpoint: Optional[str] = None, cache_key: Optional[str] = None, priority: int = PRIORITY_INTERACTIVE, semantic: bool = True) -> AsyncGenerator[Tuple[str, Any], None]:
+    """
+    Streaming variant of generate_ai_response, yielding (event, data) pairs for sse_stream:
+    a "field" event ({"path", "value"}) for each array element or scalar field as soon as
+    the model has closed it, then a "result" event with the whole object once it has been
+    validated against the prompt's schema. Failures end the stream with an "error" event.
+    """
+    template = prompt_registry.get(prompt_name)
+    schema = RESPONSE_SCHEMAS[prompt_name]
+    logger.info(f"Streaming AI response from prompt: {prompt_name}@{template.version}")
+    try:
+        if endpoint and cache_key is None:
+            with span("cache_lookup"):
+                cache_key = response_cache_key(prompt_name, endpoint, user_text)
+                cached = await response_cache.aget(cache_key, endpoint)
+            if cached is not None:
+                logger.info(f"Serving cached AI response for {endpoint}.")
+                async for event in replay_ai_response(cached):
+                    yield event
+                return
+        namespace, cached = _semantic_lookup(prompt_name, user_text, semantic)
+        if cached is not None:
+            async for event in replay_ai_response(cached):
+                yield event
+            return
+
+        started = time.perf_counter()
+        with span("prompt_render"):
+            prompt = render_prompt(template, prompt_name, user_text)
+        await usage_ledger.admit(estimate_tokens(prompt) + USAGE_OUTPUT_TOKEN_ESTIMATE)
+        parser = JSONStreamParser()
+        async for chunk in stream_json(prompt, prompt_name, priority):
+            with span("json_parse"):
+                fields = parser.feed(chunk)
+            for path, value in fields:
+                yield "field", {"path": list(path), "value": value}
+        with span("json_parse"):
+            # A document the model stopped part way through is closed after its last complete value.
+            data = parser.result if parser.done else orjson.loads(parser.close())
+            response_data = schema.model_validate(data).model_dump()
+        MODEL_JSON_OUTPUTS.labels(prompt_name, "ok" if parser.done else "repaired").inc()
+        await response_cache.aset(cache_key, response_data)
+        if namespace is not None:
+            semantic_cache.set(namespace, user_text, response_data, time.perf_counter() - started)
+        yield "result", response_data
+    except QuotaExceededError as e:
+        yield "error", {"detail": str(e), "retry_after": math.ceil(e.retry_after)}
+    except ValueError as e:
+        # Unparseable output or a schema mismatch (pydantic's ValidationError is a ValueError).
+        MODEL_JSON_OUTPUTS.labels(prompt_name, "failed").inc()
+        logger.error(f"Streamed {prompt_name} response is unusable: {e}")
+        yield "error", {"detail": "The AI returned an unexpected response. Please try again."}
     except Exception as e:
-        logger.error(f"An error occurred during chat stream generation: {e}", exc_info=True)
-        yield "Sorry, an internal error occurred while processing the chat."
-    """Generates a streaming chat response using the model's native chat history support."""
+        logger.error(f"stream_ai_response failed: {e}", exc_info=True)
+        yield "error", {"detail": "Sorry, an internal error occurred while generating the response."}
+    finally:
+        usage_ledger.release()
+
+async def _summarize_chat(previous_summary: str, transcript: str) -> str:
+    prompt = prompt_registry.get("summary").render(previous_summary=previous_summary, transcript=transcript)
+    return await generate_text(prompt, "summary", PRIORITY_CHAT)
+
+def estimate_chat_tokens(messages: List[Dict[str, str]]) -> int:
+    """Pre-flight estimate of a chat turn: its history as far as the context budget sends it, plus the reply."""
+    history = estimate_tokens("".join(m.get("content", "") for m in messages))
+    return min(history, CHAT_CONTEXT_TOKEN_BUDGET) + USAGE_OUTPUT_TOKEN_ESTIMATE
+
+def _first_question(messages: List[Dict[str, str]]) -> Optional[str]:
+    """The student's message if it opens the conversation (greetings from the coach aside), else None."""
+    user_messages = [m for m in messages if m.get("role") == "user"]
+    if len(user_messages) != 1 or not messages or messages[-1] is not user_messages[0]:
+        return None
+    return normalize_text(user_messages[0].get("content", ""))
+
+async def generate_chat_response_stream(prompt_name: str, messages: List[Dict[str, str]], user_id: Optional[int] = None, category: str = "chat", semantic: bool = True) -> AsyncGenerator[Union[str, Tuple[str, Any]], None]:
+    """
+    Generates a streaming chat response using the model's native chat history support.
+    Only a token-budgeted window of recent turns is sent; older turns are replaced by a
+    rolling summary, and the coach prompt goes in the system instruction. An opening
+    question close enough to one answered before gets the stored reply instead, streamed
+    the same way, unless semantic is False. A failure ends the stream with an "error" event.
+    """
     logger.info("Generating streaming chat response.")
     try:
-        ensure_models()
-        with open(prompt_file_path, "r", encoding="utf-8") as f:
-            system_instruction = f.read()
-
-        gemini_history = []
-        for msg in messages:
-            role = "user" if msg["role"] == "user" else "model"
-            gemini_history.append({"role": role, "parts": [msg["content"]]})
-        
-        # The last message is the current prompt, so we pop it from the history
-        # (This logic is correct)
-        current_message_content = gemini_history.pop()["parts"]
-
-        chat_session = _chat_model.start_chat(history=gemini_history)
-        
-        final_prompt = f"{system_instruction}\n\n{current_message_content[0]}"
-
-        # This call returns a streaming iterator
-        response_stream = chat_session.send_message(final_prompt, stream=True)
-        
-        # FIX: Use a standard 'for' loop to iterate over the streaming response.
-        # The library handles the network calls under the hood.
-        for chunk in response_stream:
-            if chunk.text:
-                yield chunk.text
+        question = _first_question(messages)
+        namespace = None
+        if semantic and semantic_cache.applies_to(prompt_name, question):
+            namespace = semantic_namespace(prompt_name, category)
+            with span("semantic_cache_lookup"):
+                cached = semantic_cache.get(prompt_name, namespace, question)
+            if cached is not None:
+                for start in range(0, len(cached), SEMANTIC_CACHE_CHUNK_CHARS):
+                    yield cached[start:start + SEMANTIC_CACHE_CHUNK_CHARS]
+                return
+
+        started = time.perf_counter()
+        with span("chat_context"):
+            context = await build_chat_context(messages, _summarize_chat, user_id=user_id, category=category)
+        logger.info(f"Chat context: {context.stats}")
+
+        with span("prompt_render"):
+            system_instruction = prompt_registry.get(prompt_name).render(chat_history=context.chat_history_note)
+        chunks = []
+        async for chunk in stream_chat_message(system_instruction, context.history, context.current_message):
+            chunks.append(chunk)
+            yield chunk
+        # Only a reply that streamed to the end is stored.
+        if namespace is not None and chunks:
+            semantic_cache.set(namespace, question, "".join(chunks), time.perf_counter() - started)
 
     except Exception as e:
         logger.error(f"An error occurred during chat stream generation: {e}", exc_info=True)
-        yield "Sorry, an internal error occurred while processing the chat."
\ No newline at end of file
+        yield "error", {"detail": "Sorry, an internal error occurred while processing the chat."}
+    finally:
+        # The route admitted this turn before the stream opened.
+        usage_ledger.release()
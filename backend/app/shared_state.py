@@ -0,0 +1,270 @@
+# backend/app/shared_state.py
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Where state that every worker must agree on (the model rate limit, the response cache,
+# the per-user usage budgets)
+# is kept: "memory" keeps it per worker, "sqlite" in a file shared by the workers of one
+# node, "redis" in a Redis server shared by every node (needs the redis package).
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory").lower()
+STATE_SQLITE_PATH = os.getenv("STATE_SQLITE_PATH", "./shared_state.db")
+STATE_REDIS_URL = os.getenv("STATE_REDIS_URL", "redis://localhost:6379/0")
+STATE_KEY_PREFIX = os.getenv("STATE_KEY_PREFIX", "studai:")
+
+# Refills a token bucket and takes one token if there is one, atomically. Returns the
+# seconds until a token is available, or 0 if one was taken.
+_TAKE_TOKEN_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1])
+local updated = tonumber(state[2])
+if tokens == nil then
+  tokens = burst
+  updated = now
+end
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+return tostring(wait)
+"""
+
+
+class SharedState:
+    """
+    A small key-value and rate-limit store shared between workers. Methods block, so
+    async callers run them in a thread.
+    """
+
+    name = "base"
+
+    def check(self):
+        """Opens the store so a bad configuration fails at startup."""
+
+    def take_token(self, key: str, rate: float, burst: int) -> float:
+        """Takes a token from the named bucket. Returns 0 if one was taken, else the seconds until one is available."""
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: float, ttl_seconds: float) -> float:
+        """Adds amount to a numeric counter (created at 0, expiring ttl_seconds after creation) and returns the new value."""
+        raise NotImplementedError
+
+    def counter(self, key: str) -> float:
+        """The value of a counter, 0 if it does not exist."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SQLiteState(SharedState):
+    """Shared state in a SQLite file, for several workers on one node."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS token_buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_kv_expires_at ON kv (expires_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def check(self):
+        with self._lock:
+            self._connect()
+
+    def take_token(self, key: str, rate: float, burst: int) -> float:
+        with self._lock:
+            conn = self._connect()
+            # IMMEDIATE takes the write lock up front, so two workers cannot both read the same count.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = conn.execute("SELECT tokens, updated FROM token_buckets WHERE key = ?", (key,)).fetchone()
+                tokens = burst if row is None else min(burst, row[0] + max(0.0, now - row[1]) * rate)
+                wait = 0.0
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / rate
+                conn.execute(
+                    "INSERT OR REPLACE INTO token_buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value FROM kv WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)", (key, value, now + ttl_seconds))
+            conn.execute("DELETE FROM kv WHERE expires_at <= ?", (now,))
+
+    def incr(self, key: str, amount: float, ttl_seconds: float) -> float:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM counters WHERE expires_at <= ?", (now,))
+                conn.execute(
+                    "INSERT INTO counters (key, value, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET value = value + excluded.value",
+                    (key, amount, now + ttl_seconds),
+                )
+                value = conn.execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()[0]
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return value
+
+    def counter(self, key: str) -> float:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value FROM counters WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else 0.0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class RedisState(SharedState):
+    """Shared state in Redis, for workers spread over several nodes."""
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        self.url = url
+        self._client = None
+        self._take_token = None
+
+    def _connect(self):
+        if self._client is None:
+            import redis
+
+            self._client = redis.Redis.from_url(self.url)
+            self._take_token = self._client.register_script(_TAKE_TOKEN_LUA)
+        return self._client
+
+    def check(self):
+        self._connect().ping()
+
+    def take_token(self, key: str, rate: float, burst: int) -> float:
+        self._connect()
+        return float(self._take_token(keys=[key], args=[rate, burst, time.time()]))
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._connect().get(key)
+
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        self._connect().set(key, value, px=max(1, int(ttl_seconds * 1000)))
+
+    def incr(self, key: str, amount: float, ttl_seconds: float) -> float:
+        pipe = self._connect().pipeline()
+        pipe.incrbyfloat(key, amount)
+        # NX: the expiry is set when the counter is created and not pushed back by later increments.
+        pipe.expire(key, max(1, int(ttl_seconds)), nx=True)
+        return float(pipe.execute()[0])
+
+    def counter(self, key: str) -> float:
+        value = self._connect().get(key)
+        return float(value) if value is not None else 0.0
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+class PrefixedState(SharedState):
+    """Namespaces every key, so several deployments can share one Redis."""
+
+    def __init__(self, inner: SharedState, prefix: str):
+        self.inner = inner
+        self.prefix = prefix
+        self.name = inner.name
+
+    def check(self):
+        self.inner.check()
+
+    def take_token(self, key: str, rate: float, burst: int) -> float:
+        return self.inner.take_token(self.prefix + key, rate, burst)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.inner.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        self.inner.set(self.prefix + key, value, ttl_seconds)
+
+    def incr(self, key: str, amount: float, ttl_seconds: float) -> float:
+        return self.inner.incr(self.prefix + key, amount, ttl_seconds)
+
+    def counter(self, key: str) -> float:
+        return self.inner.counter(self.prefix + key)
+
+    def close(self):
+        self.inner.close()
+
+
+def _create_shared_state() -> Optional[SharedState]:
+    if STATE_BACKEND == "memory":
+        return None
+    if STATE_BACKEND == "sqlite":
+        return PrefixedState(SQLiteState(STATE_SQLITE_PATH), STATE_KEY_PREFIX)
+    if STATE_BACKEND == "redis":
+        return PrefixedState(RedisState(STATE_REDIS_URL), STATE_KEY_PREFIX)
+    raise RuntimeError(f"Unknown STATE_BACKEND: {STATE_BACKEND}")
+
+
+# None when state is kept per worker. Connections are opened on first use.
+shared_state: Optional[SharedState] = _create_shared_state()
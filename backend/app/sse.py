@@ -0,0 +1,92 @@
+# backend/app/sse.py
+import os
+import json
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Callable, Optional, Tuple, Union
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from .lifecycle import stream_drain
+
+logger = logging.getLogger(__name__)
+
+# Seconds of upstream silence before a keep-alive comment is sent to the client.
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+HEARTBEAT_FRAME = ": heartbeat\n\n"
+
+
+def format_event(data, event: Optional[str] = None) -> str:
+    """Formats one SSE frame. Data is JSON-encoded so newlines in model text stay inside the frame."""
+    frame = f"event: {event}\n" if event else ""
+    return f"{frame}data: {json.dumps(data)}\n\n"
+
+
+async def sse_stream(request: Request, chunks: AsyncIterator[Union[str, Tuple[str, Any]]]) -> AsyncIterator[str]:
+    """
+    Wraps a chunk iterator as an SSE stream. Text chunks become unnamed "data" frames;
+    (event, data) tuples become named events. If the iterator raises, the stream ends
+    with an "error" event and no "done", so the client cannot take a partial reply for
+    a whole one.
+    The next chunk is only pulled after the previous frame has been sent, so a slow
+    client slows the upstream down instead of buffering. Heartbeats are sent while the
+    upstream is quiet, and the upstream is closed as soon as the client goes away or
+    the server stops draining streams at shutdown.
+    """
+    iterator = chunks.__aiter__()
+    pending = None
+    stop = asyncio.ensure_future(stream_drain.stop_event().wait())
+    try:
+        with stream_drain.track():
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(iterator.__anext__())
+                done, _ = await asyncio.wait({pending, stop}, timeout=SSE_HEARTBEAT_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+                if await request.is_disconnected():
+                    logger.info("Client disconnected; stopping stream.")
+                    return
+                if stop in done:
+                    yield format_event({"detail": "The server is restarting. Please try again."}, event="error")
+                    return
+                if not done:
+                    yield HEARTBEAT_FRAME
+                    continue
+
+                task, pending = pending, None
+                try:
+                    chunk = task.result()
+                except StopAsyncIteration:
+                    break
+                except Exception as e:
+                    logger.error(f"Stream failed: {e}", exc_info=True)
+                    yield format_event({"detail": "Sorry, an internal error occurred while streaming the response."}, event="error")
+                    return
+                yield format_event(chunk[1], event=chunk[0]) if isinstance(chunk, tuple) else format_event(chunk)
+
+            yield format_event({}, event="done")
+    finally:
+        stop.cancel()
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse that calls on_close once it is over, however it ends. Unlike a
+    finally in the body generator, this also runs when the client leaves before the
+    first chunk is pulled and the generator never starts.
+    """
+
+    def __init__(self, content, on_close: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
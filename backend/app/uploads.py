@@ -0,0 +1,256 @@
+# backend/app/uploads.py
+# Streaming ingestion of resume uploads. The multipart body is parsed chunk by chunk as
+# it arrives, so a file over the size limit, or one that is not a PDF or DOCX, is
+# rejected as soon as its bytes show it rather than after the whole upload has been
+# spooled. The content hash that keys the response cache is computed in the same pass.
+# Files too big to keep in memory go to a temporary file, which the extraction worker
+# maps instead of being sent a copy.
+import io
+import os
+import hashlib
+import logging
+import tempfile
+import zipfile
+from typing import IO, Callable, List, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from python_multipart.multipart import MultipartParser, parse_options_header
+from .extraction import PDF_MIME, DOCX_MIME
+
+logger = logging.getLogger(__name__)
+
+RESUME_MAX_UPLOAD_BYTES = int(os.getenv("RESUME_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+# Uploads up to this size are kept in memory; bigger ones are written to a temporary file.
+RESUME_UPLOAD_SPOOL_BYTES = int(os.getenv("RESUME_UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+# Where those temporary files go (default: the system temporary directory).
+RESUME_UPLOAD_TMP_DIR = os.getenv("RESUME_UPLOAD_TMP_DIR") or None
+# Room for the multipart boundaries and part headers around the file itself.
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+# PDF readers accept a header preceded by up to this much junk.
+PDF_HEADER_SEARCH_BYTES = 1024
+SNIFF_BYTES = PDF_HEADER_SEARCH_BYTES + len(b"%PDF-")
+ZIP_MAGIC = b"PK\x03\x04"
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """The resume type the first bytes of a file show, or None. Any ZIP passes as a DOCX here; finish() looks inside."""
+    if head.startswith(ZIP_MAGIC):
+        return DOCX_MIME
+    if b"%PDF-" in head[:SNIFF_BYTES]:
+        return PDF_MIME
+    return None
+
+
+def _bad_upload(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def _too_large(limit: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"The file is too large; the limit is {limit // (1024 * 1024)} MB.",
+    )
+
+
+class ResumeUpload:
+    """
+    An uploaded resume as it is received: counted against the limit, type-sniffed and
+    hashed chunk by chunk, and held in memory or, past RESUME_UPLOAD_SPOOL_BYTES, in a
+    temporary file. close() removes the file.
+    """
+
+    def __init__(self, max_bytes: int = RESUME_MAX_UPLOAD_BYTES, spool_bytes: int = RESUME_UPLOAD_SPOOL_BYTES):
+        self.max_bytes = max_bytes
+        self.spool_bytes = spool_bytes
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None  # sniffed, never taken from the client
+        self.size = 0
+        self.sha256: Optional[bytes] = None  # digest, set by finish()
+        self.path: Optional[str] = None  # the temporary file, if spooled to disk
+        self._hash = hashlib.sha256()
+        self._head = b""
+        self._buffer = bytearray()
+        self._file: Optional[IO[bytes]] = None
+
+    @property
+    def data(self) -> bytes:
+        """The file's bytes, for an upload kept in memory."""
+        return bytes(self._buffer)
+
+    def write(self, chunk: memoryview):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise _too_large(self.max_bytes)
+        self._hash.update(chunk)
+        if self.content_type is None:
+            self._head += bytes(chunk[:SNIFF_BYTES - len(self._head)])
+            if len(self._head) >= SNIFF_BYTES:
+                self._sniff()
+        if self._file is None and len(self._buffer) + len(chunk) > self.spool_bytes:
+            self._file = tempfile.NamedTemporaryFile(prefix="resume-", dir=RESUME_UPLOAD_TMP_DIR, delete=False)
+            self.path = self._file.name
+            self._file.write(self._buffer)
+            self._buffer = bytearray()
+        # Writes of one network chunk to the page cache; not worth a thread hop each.
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._buffer += chunk
+
+    def _sniff(self):
+        self.content_type = sniff_content_type(self._head)
+        if self.content_type is None:
+            raise _bad_upload("Invalid file type. Please upload a PDF or DOCX file.")
+
+    def finish(self):
+        """Completes the upload once the body has been read; checks what could only be checked at the end."""
+        if self.filename is None:
+            raise _bad_upload("No file was uploaded.")
+        if self.size == 0:
+            raise _bad_upload("The uploaded file is empty.")
+        if self.content_type is None:
+            self._sniff()
+        if self._file is not None:
+            self._file.close()
+        self.sha256 = self._hash.digest()
+        if self.content_type == DOCX_MIME:
+            self._verify_docx()
+
+    def _verify_docx(self):
+        # Reads only the ZIP's central directory, at the end of the file.
+        try:
+            with zipfile.ZipFile(self.path if self.path is not None else io.BytesIO(self._buffer)) as archive:
+                names = set(archive.namelist())
+        except zipfile.BadZipFile:
+            names = set()
+        if "word/document.xml" not in names:
+            raise _bad_upload("Invalid file type. Please upload a PDF or DOCX file.")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self._file = None
+        self._buffer = bytearray()
+
+
+async def _read_file_parts(request: Request, field: str, open_part: Callable[[str, Optional[bytes]], Optional[Callable[[memoryview], None]]]):
+    """
+    Streams a multipart body through the parser. For each file part in the form field
+    `field`, open_part(filename, content_type) returns a writer for its bytes (called
+    chunk by chunk as they arrive), or None to skip the part. Other fields are skipped.
+    """
+    header = {"field": b"", "value": b""}
+    part = {"headers": {}, "writer": None}
+
+    def on_part_begin():
+        part["headers"] = {}
+        part["writer"] = None
+
+    def on_header_field(data: bytes, start: int, end: int):
+        header["field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        header["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][header["field"].lower()] = header["value"]
+        header["field"], header["value"] = b"", b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(part["headers"].get(b"content-disposition"))
+        if options.get(b"name") == field.encode() and b"filename" in options:
+            filename = options[b"filename"].decode("utf-8", "replace")
+            part["writer"] = open_part(filename, part["headers"].get(b"content-type"))
+
+    def on_part_data(data: bytes, start: int, end: int):
+        if part["writer"] is not None:
+            part["writer"](memoryview(data)[start:end])
+
+    _, params = parse_options_header(request.headers.get("content-type"))
+    parser = MultipartParser(params.get(b"boundary"), {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+    })
+    async for chunk in request.stream():
+        parser.write(chunk)
+    parser.finalize()
+
+
+def _check_multipart(request: Request, max_bytes: int):
+    content_type, params = parse_options_header(request.headers.get("content-type"))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise _bad_upload("Expected a multipart/form-data upload.")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes + MULTIPART_OVERHEAD_BYTES:
+        raise _too_large(max_bytes)
+
+
+async def read_resume_upload(request: Request, field: str = "file", max_bytes: int = RESUME_MAX_UPLOAD_BYTES) -> ResumeUpload:
+    """
+    Reads the file in the multipart form field `field` off the request as it arrives.
+    Other fields are skipped. Raises HTTP 413 as soon as the upload is known to be over
+    max_bytes (from Content-Length, before reading anything, or while counting), and
+    HTTP 400 for a missing, empty or non-PDF/DOCX file. The caller must close() it.
+    """
+    _check_multipart(request, max_bytes)
+    upload = ResumeUpload(max_bytes)
+
+    def open_part(filename: str, content_type: Optional[bytes]):
+        # Only the first file of that name counts.
+        if upload.filename is not None:
+            return None
+        upload.filename = filename
+        return upload.write
+
+    try:
+        await _read_file_parts(request, field, open_part)
+        upload.finish()
+    except HTTPException:
+        upload.close()
+        raise
+    except Exception as e:
+        upload.close()
+        logger.warning(f"Malformed resume upload: {e}")
+        raise _bad_upload("Malformed upload.")
+    return upload
+
+
+async def read_batch_upload(request: Request, field: str, max_total_bytes: int) -> List[Tuple[str, Optional[str], bytearray]]:
+    """
+    Reads every file in the multipart form field `field` into memory, as (filename,
+    client content type, bytes). The files together may not exceed max_total_bytes:
+    HTTP 413 from Content-Length before anything is read, or as soon as the count passes it.
+    """
+    _check_multipart(request, max_total_bytes)
+    files: List[Tuple[str, Optional[str], bytearray]] = []
+    received = 0
+
+    def open_part(filename: str, content_type: Optional[bytes]):
+        data = bytearray()
+        files.append((filename, content_type.decode("latin-1") if content_type else None, data))
+
+        def write(chunk: memoryview):
+            nonlocal received
+            received += len(chunk)
+            if received > max_total_bytes:
+                raise _too_large(max_total_bytes)
+            data.extend(chunk)
+        return write
+
+    try:
+        await _read_file_parts(request, field, open_part)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.warning(f"Malformed batch upload: {e}")
+        raise _bad_upload("Malformed upload.")
+    if not files:
+        raise _bad_upload("No file was uploaded.")
+    return files
@@ -0,0 +1,404 @@
+# backend/app/usage.py
+# Per-user accounting of model usage, and admission control against per-user token
+# budgets. Every model call adds its (estimated) prompt and output tokens and its
+# latency to in-memory counters, which are added to the usage_records table every
+# USAGE_FLUSH_SECONDS rather than on every call. Budgets are checked before a call,
+# over a sliding window kept in the shared state: the call's estimated tokens are
+# reserved in the window as it is admitted, and settled against what it really used.
+import os
+import time
+import asyncio
+import logging
+import threading
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from fastapi import Depends, Request
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from . import models
+from .auth import get_optional_user
+from .db import SessionLocal
+from .metrics import MODEL_TOKENS, USAGE_ADMISSIONS
+from .shared_state import SharedState, shared_state
+
+logger = logging.getLogger(__name__)
+
+# Length of the sliding window the budgets apply to.
+USAGE_WINDOW_SECONDS = int(os.getenv("USAGE_WINDOW_SECONDS", "3600"))
+# Model tokens (prompt and output) a signed-in user may use per window; 0 disables the budget.
+USAGE_TOKEN_BUDGET = int(os.getenv("USAGE_TOKEN_BUDGET", "200000"))
+# The same for anonymous requests, counted per client address.
+USAGE_ANONYMOUS_TOKEN_BUDGET = int(os.getenv("USAGE_ANONYMOUS_TOKEN_BUDGET", "50000"))
+# Output tokens assumed for a call before it is made (the prompt is measured).
+USAGE_OUTPUT_TOKEN_ESTIMATE = int(os.getenv("USAGE_OUTPUT_TOKEN_ESTIMATE", "1000"))
+# A request over budget waits up to this long for the window to free up before it is
+# rejected with a 429. 0 rejects at once.
+USAGE_MAX_WAIT_SECONDS = float(os.getenv("USAGE_MAX_WAIT_SECONDS", "0"))
+# How often the in-memory counters are written to the database.
+USAGE_FLUSH_SECONDS = float(os.getenv("USAGE_FLUSH_SECONDS", "30"))
+
+
+@dataclass(frozen=True)
+class Account:
+    """Whom a request's model calls are charged to."""
+    key: str  # the budget's key: "user:<id>" or "ip:<address>"
+    user_id: Optional[int]
+    budget: int  # tokens per window, 0 for no limit
+    enforce: bool = True  # False: calls are recorded but never held back (batch jobs)
+
+
+# The account of the request (or batch job) being served; model_client charges calls to it.
+current_account: ContextVar[Optional[Account]] = ContextVar("usage_account", default=None)
+
+
+class Reservation:
+    """Tokens set aside in a budget window when a request is admitted, drawn down by its model calls."""
+
+    def __init__(self, key: str, bucket: str, tokens: float):
+        self.key = key
+        self.bucket = bucket  # the window bucket charged, where what is left is refunded
+        self.remaining = tokens
+
+
+# The reservation of the request being served, set by UsageLedger.admit.
+current_reservation: ContextVar[Optional[Reservation]] = ContextVar("usage_reservation", default=None)
+
+
+class QuotaExceededError(Exception):
+    """A request would take its user past their token budget."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Usage limit reached. Please try again later.")
+        self.retry_after = retry_after
+
+
+def account_for(user: Optional[models.User], request: Optional[Request] = None) -> Account:
+    if user is not None:
+        return Account(f"user:{user.id}", user.id, USAGE_TOKEN_BUDGET)
+    address = request.client.host if request is not None and request.client else "unknown"
+    return Account(f"ip:{address}", None, USAGE_ANONYMOUS_TOKEN_BUDGET)
+
+
+async def usage_account(request: Request, current_user: Optional[models.User] = Depends(get_optional_user)) -> Account:
+    """
+    Route dependency: charges the request's model calls to the signed-in user, or to the
+    client address. Async so the account it sets is seen by the route and its stream.
+    """
+    account = account_for(current_user, request)
+    current_account.set(account)
+    return account
+
+
+class _LocalCounters:
+    """Expiring counters kept in this worker, used when there is no shared state."""
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, key: str, amount: float, ttl_seconds: float) -> float:
+        now = time.time()
+        with self._lock:
+            value, expires_at = self._values.get(key, (0.0, now + ttl_seconds))
+            if expires_at <= now:
+                value, expires_at = 0.0, now + ttl_seconds
+            self._values[key] = (value + amount, expires_at)
+            if len(self._values) > 10_000:
+                self._values = {k: v for k, v in self._values.items() if v[1] > now}
+            return value + amount
+
+    def counter(self, key: str) -> float:
+        value, expires_at = self._values.get(key, (0.0, 0.0))
+        return value if expires_at > time.time() else 0.0
+
+
+class SlidingWindow:
+    """
+    Tokens used per key over the last window_seconds, approximated from two fixed
+    buckets: all of the current one plus the part of the previous one still inside the
+    window. Two counters per key, whatever the traffic.
+    """
+
+    def __init__(self, window_seconds: int, store):
+        self.window_seconds = window_seconds
+        self.store = store
+
+    def _buckets(self, key: str, now: float) -> Tuple[str, str, float]:
+        bucket, offset = divmod(now, self.window_seconds)
+        return f"usage:{key}:{int(bucket)}", f"usage:{key}:{int(bucket) - 1}", offset / self.window_seconds
+
+    @property
+    def _ttl(self) -> float:
+        return 2 * self.window_seconds + 60
+
+    def charge(self, key: str, tokens: float, bucket: Optional[str] = None):
+        """Adds tokens (negative to refund) to the current bucket, or to the given one."""
+        if bucket is None:
+            bucket, _, _ = self._buckets(key, time.time())
+        self.store.incr(bucket, tokens, self._ttl)
+
+    def used(self, key: str) -> float:
+        current, previous, elapsed = self._buckets(key, time.time())
+        return self.store.counter(current) + self.store.counter(previous) * (1 - elapsed)
+
+    def reserve(self, key: str, tokens: float, budget: int) -> Tuple[Optional[float], str]:
+        """
+        Charges tokens if they fit in the budget. The charge comes first and is taken
+        back if it does not fit, so concurrent requests (in any worker) cannot all be
+        admitted on the same room. Returns (wait, bucket): wait is 0 if the tokens were
+        charged to bucket, else the seconds until they would fit if nothing else is
+        charged meanwhile, or None if they never will.
+        """
+        current_key, previous_key, elapsed = self._buckets(key, time.time())
+        allowance = budget - tokens
+        if allowance < 0:
+            return None, current_key
+        current = self.store.incr(current_key, tokens, self._ttl)
+        previous = self.store.counter(previous_key)
+        if current + previous * (1 - elapsed) <= budget:
+            return 0.0, current_key
+        self.store.incr(current_key, -tokens, self._ttl)
+        current -= tokens
+        if current <= allowance:
+            # The previous bucket's share shrinks as the window slides past it.
+            return (1 - (allowance - current) / previous - elapsed) * self.window_seconds, current_key
+        # Only once the current bucket has become the previous one.
+        return (1 - elapsed + 1 - allowance / current) * self.window_seconds, current_key
+
+
+class UsageLedger:
+    """Records model usage per user and admits calls against the users' budgets."""
+
+    def __init__(self, window_seconds: int, flush_seconds: float, store: Optional[SharedState]):
+        self.shared = store is not None
+        self.window = SlidingWindow(window_seconds, store if store is not None else _LocalCounters())
+        self.flush_seconds = flush_seconds
+        # (user_id, hour, kind) -> [calls, prompt_tokens, output_tokens, latency_ms] not yet written.
+        self._pending: Dict[Tuple[int, datetime, str], List[int]] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.totals = {"calls": 0, "prompt_tokens": 0, "output_tokens": 0, "admitted": 0, "queued": 0, "rejected": 0}
+
+    async def _store_call(self, fn, *args):
+        # Shared state is a file or a server: keep its I/O off the event loop.
+        if self.shared:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def admit(self, tokens: int):
+        """
+        Reserves an estimated tokens in the current account's budget, waiting up to
+        USAGE_MAX_WAIT_SECONDS for room, then raises QuotaExceededError. The model calls
+        that follow draw on the reservation; release() gives back what they left.
+        """
+        account = current_account.get()
+        if account is None or not account.enforce or account.budget <= 0:
+            return
+        deadline = time.monotonic() + USAGE_MAX_WAIT_SECONDS
+        queued = False
+        while True:
+            wait, bucket = await self._store_call(self.window.reserve, account.key, tokens, account.budget)
+            if wait == 0:
+                self.release()
+                current_reservation.set(Reservation(account.key, bucket, tokens))
+                outcome = "queued" if queued else "admitted"
+                self.totals[outcome] += 1
+                USAGE_ADMISSIONS.labels(outcome).inc()
+                return
+            if wait is None or time.monotonic() + wait > deadline:
+                self.totals["rejected"] += 1
+                USAGE_ADMISSIONS.labels("rejected").inc()
+                logger.info(f"Usage budget of {account.key} exhausted; rejecting a request of ~{tokens} tokens.")
+                raise QuotaExceededError(wait if wait is not None else self.window.window_seconds)
+            queued = True
+            await asyncio.sleep(wait)
+
+    def record(self, kind: str, prompt_tokens: int, output_tokens: int, seconds: float):
+        """
+        Adds a finished model call to the current account's counters and budget window.
+        Only the tokens beyond what is left of the request's reservation are charged.
+        """
+        MODEL_TOKENS.labels(kind, "prompt").inc(prompt_tokens)
+        MODEL_TOKENS.labels(kind, "output").inc(output_tokens)
+        self.totals["calls"] += 1
+        self.totals["prompt_tokens"] += prompt_tokens
+        self.totals["output_tokens"] += output_tokens
+        account = current_account.get()
+        if account is None:
+            return
+        tokens = prompt_tokens + output_tokens
+        reservation = current_reservation.get()
+        if reservation is not None and reservation.key == account.key:
+            covered = min(tokens, reservation.remaining)
+            reservation.remaining -= covered
+            tokens -= covered
+        if tokens > 0:
+            self._charge_soon(account.key, tokens)
+        if account.user_id is None:
+            return
+        hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        with self._lock:
+            counters = self._pending.setdefault((account.user_id, hour, kind), [0, 0, 0, 0])
+            counters[0] += 1
+            counters[1] += prompt_tokens
+            counters[2] += output_tokens
+            counters[3] += int(seconds * 1000)
+
+    def release(self, reservation: Optional[Reservation] = None):
+        """
+        Refunds what the current request's model calls left of its reservation (or of
+        the one given). Call once they are done; calling it again does nothing.
+        """
+        reservation = reservation or current_reservation.get()
+        if reservation is None or reservation.remaining <= 0:
+            return
+        tokens, reservation.remaining = reservation.remaining, 0
+        self._charge_soon(reservation.key, -tokens, reservation.bucket)
+
+    def _charge_soon(self, key: str, tokens: float, bucket: Optional[str] = None):
+        try:
+            loop = asyncio.get_running_loop() if self.shared else None
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            # Fire and forget: a call that has finished is not held up by its bookkeeping.
+            loop.run_in_executor(None, self._charge, key, tokens, bucket)
+        else:
+            self._charge(key, tokens, bucket)
+
+    def _charge(self, key: str, tokens: float, bucket: Optional[str] = None):
+        try:
+            self.window.charge(key, tokens, bucket)
+        except Exception as e:
+            logger.warning(f"Could not charge {tokens} tokens to {key}: {e}")
+
+    def pending_for(self, user_id: int) -> Dict[Tuple[datetime, str], List[int]]:
+        """Counters of a user not written to the database yet (by this worker)."""
+        with self._lock:
+            return {(hour, kind): list(c) for (uid, hour, kind), c in self._pending.items() if uid == user_id}
+
+    def used(self, account: Account) -> float:
+        return self.window.used(account.key)
+
+    def flush(self):
+        """Adds the pending counters to usage_records. Blocking; counters that fail to write are kept for the next flush."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        table = models.UsageRecord
+        db = SessionLocal()
+        try:
+            for (user_id, hour, kind), (calls, prompt_tokens, output_tokens, latency_ms) in pending.items():
+                where = (table.user_id == user_id, table.period_start == hour, table.kind == kind)
+                increment = update(table).where(*where).values(
+                    calls=table.calls + calls,
+                    prompt_tokens=table.prompt_tokens + prompt_tokens,
+                    output_tokens=table.output_tokens + output_tokens,
+                    latency_ms=table.latency_ms + latency_ms,
+                )
+                if db.execute(increment).rowcount == 0:
+                    db.add(table(
+                        user_id=user_id, period_start=hour, kind=kind, calls=calls,
+                        prompt_tokens=prompt_tokens, output_tokens=output_tokens, latency_ms=latency_ms,
+                    ))
+                    try:
+                        db.commit()
+                        continue
+                    except IntegrityError:
+                        # Another worker created the row first (or the user is gone).
+                        db.rollback()
+                        db.execute(increment)
+                db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Writing usage counters failed; keeping them for the next flush: {e}")
+            with self._lock:
+                for key, counters in pending.items():
+                    merged = self._pending.setdefault(key, [0, 0, 0, 0])
+                    for i, value in enumerate(counters):
+                        merged[i] += value
+        finally:
+            db.close()
+
+    def start(self):
+        """Starts writing the counters to the database every flush_seconds."""
+        async def loop():
+            while True:
+                await asyncio.sleep(self.flush_seconds)
+                try:
+                    await asyncio.to_thread(self.flush)
+                except Exception as e:
+                    logger.error(f"Usage flush failed: {e}", exc_info=True)
+        self._task = asyncio.create_task(loop())
+
+    async def stop(self):
+        """Stops the periodic flush and writes what is left."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+    def stats(self) -> dict:
+        return {
+            "window_seconds": self.window.window_seconds,
+            "token_budget": USAGE_TOKEN_BUDGET,
+            "anonymous_token_budget": USAGE_ANONYMOUS_TOKEN_BUDGET,
+            "pending_records": len(self._pending),
+            **self.totals,
+        }
+
+
+def usage_summary(db, user: models.User, days: int) -> dict:
+    """A user's model usage over the last days days, by kind of call and by day, and their current window."""
+    since = (datetime.utcnow() - timedelta(days=days)).replace(minute=0, second=0, microsecond=0)
+    table = models.UsageRecord
+    rows = db.execute(
+        select(table.period_start, table.kind, table.calls, table.prompt_tokens, table.output_tokens, table.latency_ms)
+        .where(table.user_id == user.id, table.period_start >= since)
+    ).all()
+    counters: Dict[Tuple[datetime, str], List[int]] = {}
+    for hour, kind, *values in rows:
+        counters[(hour, kind)] = list(values)
+    for key, values in usage_ledger.pending_for(user.id).items():
+        if key[0] >= since:
+            merged = counters.setdefault(key, [0, 0, 0, 0])
+            for i, value in enumerate(values):
+                merged[i] += value
+
+    def entry(values: List[int]) -> dict:
+        calls, prompt_tokens, output_tokens, latency_ms = values
+        return {
+            "calls": calls,
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "avg_latency_ms": round(latency_ms / calls, 1) if calls else 0.0,
+        }
+
+    by_kind: Dict[str, List[int]] = {}
+    by_day: Dict[str, List[int]] = {}
+    overall = [0, 0, 0, 0]
+    for (hour, kind), values in counters.items():
+        for target in (by_kind.setdefault(kind, [0, 0, 0, 0]), by_day.setdefault(hour.date().isoformat(), [0, 0, 0, 0]), overall):
+            for i, value in enumerate(values):
+                target[i] += value
+
+    account = account_for(user)
+    used = usage_ledger.used(account)
+    return {
+        "since": since,
+        "window": {
+            "seconds": USAGE_WINDOW_SECONDS,
+            "budget": account.budget,
+            "used_tokens": int(used),
+            "remaining_tokens": max(0, account.budget - int(used)) if account.budget else None,
+        },
+        "totals": entry(overall),
+        "by_kind": [{"kind": kind, **entry(values)} for kind, values in sorted(by_kind.items())],
+        "by_day": [{"day": day, **entry(values)} for day, values in sorted(by_day.items())],
+    }
+
+
+usage_ledger = UsageLedger(USAGE_WINDOW_SECONDS, USAGE_FLUSH_SECONDS, shared_state)
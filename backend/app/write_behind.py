@@ -0,0 +1,325 @@
+# backend/app/write_behind.py
+# Optional write-behind persistence for practice-test results and whole-conversation
+# saves. Instead of each request opening a session and committing on its own, writes
+# are queued and a single flusher commits them together, one transaction per batch of
+# up to WRITE_BEHIND_MAX_BATCH writes or every WRITE_BEHIND_MAX_DELAY_MS, so a class
+# submitting scores at once costs a few commits rather than hundreds. Saves of the same
+# conversation still waiting in the queue are merged: only the newest is written.
+import os
+import time
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import delete, select
+from . import models
+from .db import SessionLocal
+from .etags import bump_versions
+from .metrics import WRITE_BEHIND_BATCH_SIZE, register_gauge
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() in ("1", "true", "yes")
+# "durable": a request is answered once its batch has committed. "queued": as soon as the
+# write is queued, with a 202; writes still queued when the process dies are lost.
+WRITE_BEHIND_ACK = os.getenv("WRITE_BEHIND_ACK", "durable").lower()
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "200"))
+# How long the first write of a batch may wait for others to join it.
+WRITE_BEHIND_MAX_DELAY_MS = float(os.getenv("WRITE_BEHIND_MAX_DELAY_MS", "20"))
+# Writes that may wait in the queue; past this, requests commit on their own as before.
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+
+if WRITE_BEHIND_ACK not in ("durable", "queued"):
+    raise RuntimeError(f"WRITE_BEHIND_ACK must be 'durable' or 'queued', not {WRITE_BEHIND_ACK!r}.")
+
+
+class PendingWrite:
+    """A result insert or a conversation replacement, from the request until its commit."""
+
+    def __init__(self, kind: str, user_id: int, category: str, data: dict):
+        self.kind = kind  # "result" or "conversation"
+        self.user_id = user_id
+        self.category = category
+        self.data = data  # result: score, meta; conversation: messages as role/content dicts
+        self.created_at = datetime.utcnow()
+        self.queued_at = time.monotonic()
+        self.result_id: Optional[int] = None  # set once a result is committed
+        self.taken = False  # picked up by the flusher; a later save of the conversation queues anew
+        self.waiters: List[asyncio.Future] = []
+        self.committed = threading.Event()  # set once written (or failed), for threads that must wait
+
+    def output(self) -> dict:
+        """The response body for this write (ResultOut or ConversationOut)."""
+        if self.kind == "result":
+            return {
+                "id": self.result_id, "category": self.category, "score": self.data["score"],
+                "meta": self.data["meta"], "created_at": self.created_at,
+            }
+        messages = self.data["messages"]
+        return {
+            "category": self.category,
+            "messages": [msg | {"seq": seq} for seq, msg in enumerate(messages, start=1)],
+            "updated_at": self.created_at,
+            "last_seq": len(messages),
+        }
+
+
+def result_write(user_id: int, category: str, score: float, meta: Optional[str]) -> PendingWrite:
+    return PendingWrite("result", user_id, category, {"score": score, "meta": meta})
+
+
+def conversation_write(user_id: int, category: str, messages: List[dict]) -> PendingWrite:
+    return PendingWrite("conversation", user_id, category, {"messages": messages})
+
+
+def _replace_conversation(db, write: PendingWrite):
+    conversation = db.execute(select(models.Conversation).where(
+        models.Conversation.user_id == write.user_id, models.Conversation.category == write.category,
+    )).scalars().first()
+    if conversation is None:
+        # A concurrent create fails the flush; the batch is then retried write by write.
+        conversation = models.Conversation(user_id=write.user_id, category=write.category, last_seq=0)
+        db.add(conversation)
+        db.flush()
+    db.execute(delete(models.ConversationMessage).where(models.ConversationMessage.conversation_id == conversation.id))
+    messages = write.data["messages"]
+    db.add_all(
+        models.ConversationMessage(conversation_id=conversation.id, seq=seq, role=msg["role"], content=msg["content"])
+        for seq, msg in enumerate(messages, start=1)
+    )
+    conversation.last_seq = len(messages)
+    conversation.updated_at = write.created_at
+
+
+def write_batch(writes: List[PendingWrite]) -> list:
+    """
+    Writes a batch in one transaction, bumping each affected user's versions once.
+    Blocking. If the batch fails, each write is retried on its own so one bad write does
+    not fail the rest. Returns each write's output dict, or the exception it failed with.
+    """
+    db = SessionLocal()
+    try:
+        results = [
+            models.Result(
+                user_id=w.user_id, category=w.category, score=w.data["score"], meta=w.data["meta"], created_at=w.created_at,
+            )
+            for w in writes if w.kind == "result"
+        ]
+        db.add_all(results)
+        for write in writes:
+            if write.kind == "conversation":
+                _replace_conversation(db, write)
+        result_users = {w.user_id for w in writes if w.kind == "result"}
+        conversation_users = {w.user_id for w in writes if w.kind == "conversation"}
+        for user_id in result_users | conversation_users:
+            bump_versions(db, user_id, results=user_id in result_users, conversations=user_id in conversation_users)
+        db.flush()
+        ids = iter([result.id for result in results])
+        db.commit()
+        for write in writes:
+            if write.kind == "result":
+                write.result_id = next(ids)
+        return [write.output() for write in writes]
+    except Exception as e:
+        db.rollback()
+        if len(writes) == 1:
+            return [e]
+        logger.warning(f"A batch of {len(writes)} writes failed ({e}); writing them one by one.")
+    finally:
+        db.close()
+    return [write_batch([write])[0] for write in writes]
+
+
+class WriteBehindQueue:
+    """Queues writes per worker and commits them in batches from one flusher task."""
+
+    def __init__(self, enabled: bool, ack: str, max_batch: int, max_delay_seconds: float, max_pending: int):
+        self.enabled = enabled
+        self.ack = ack
+        self.max_batch = max_batch
+        self.max_delay_seconds = max_delay_seconds
+        self.max_pending = max_pending
+        self._queue: List[PendingWrite] = []
+        # Writes queued or being written, for read-your-writes. Read from request threads.
+        self._by_user: Dict[int, List[PendingWrite]] = {}
+        self._conversations: Dict[Tuple[int, str], PendingWrite] = {}
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.writing = 0
+        self.totals = {"queued": 0, "merged": 0, "overflow": 0, "batches": 0, "written": 0, "failed": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._stopping
+
+    def _submit(self, write: PendingWrite) -> Optional[asyncio.Future]:
+        """Queues a write; returns a future for its output, or None if it must be written directly."""
+        if not self.running:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        with self._lock:
+            if write.kind == "conversation":
+                queued = self._conversations.get((write.user_id, write.category))
+                if queued is not None and not queued.taken:
+                    # Not picked up yet: this save replaces it.
+                    queued.data, queued.created_at = write.data, write.created_at
+                    queued.waiters.append(future)
+                    self._submitted += 1
+                    self.totals["merged"] += 1
+                    return future
+            if len(self._queue) >= self.max_pending:
+                self.totals["overflow"] += 1
+                return None
+            write.waiters.append(future)
+            self._queue.append(write)
+            self._by_user.setdefault(write.user_id, []).append(write)
+            if write.kind == "conversation":
+                self._conversations[(write.user_id, write.category)] = write
+            self._submitted += 1
+            self.totals["queued"] += 1
+        self._wakeup.set()
+        if len(self._queue) >= self.max_batch:
+            self._full.set()
+        return future
+
+    async def save(self, write: PendingWrite) -> Tuple[dict, bool]:
+        """
+        Persists a write: queued for the next batch when write-behind is running, else
+        committed on its own. Returns the response body and whether the write is only
+        queued (WRITE_BEHIND_ACK=queued), so the caller can answer 202.
+        """
+        future = self._submit(write)
+        if future is None:
+            output = (await asyncio.to_thread(write_batch, [write]))[0]
+            write.committed.set()
+        elif self.ack == "queued":
+            return write.output(), True
+        else:
+            output = await future
+        if isinstance(output, Exception):
+            raise output
+        return output, False
+
+    def pending_results(self, user_id: int) -> List[dict]:
+        """A user's results that are queued or being written; id is None until committed."""
+        with self._lock:
+            return [w.output() for w in self._by_user.get(user_id, ()) if w.kind == "result"]
+
+    def pending_conversation(self, user_id: int, category: str) -> Optional[dict]:
+        """The newest save of a conversation that has not been committed yet, if any."""
+        with self._lock:
+            write = self._conversations.get((user_id, category))
+            return write.output() if write is not None else None
+
+    def wait_for_conversation(self, user_id: int, category: str, timeout: float = 30):
+        """Blocks until a pending save of the conversation is committed. For request threads."""
+        with self._lock:
+            write = self._conversations.get((user_id, category))
+        if write is not None:
+            write.committed.wait(timeout)
+
+    def pending_marker(self, user_id: int):
+        """Changes whenever the user queues a write and is None once none is pending; part of their ETags."""
+        with self._lock:
+            writes = self._by_user.get(user_id)
+            return (len(writes), self._submitted) if writes else None
+
+    def _take(self) -> List[PendingWrite]:
+        with self._lock:
+            batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            for write in batch:
+                write.taken = True
+        return batch
+
+    def _finish(self, batch: List[PendingWrite], outputs: list):
+        with self._lock:
+            for write in batch:
+                writes = self._by_user.get(write.user_id)
+                if writes is not None:
+                    writes.remove(write)
+                    if not writes:
+                        del self._by_user[write.user_id]
+                key = (write.user_id, write.category)
+                if write.kind == "conversation" and self._conversations.get(key) is write:
+                    del self._conversations[key]
+        for write, output in zip(batch, outputs):
+            if isinstance(output, Exception):
+                self.totals["failed"] += 1
+                logger.error(f"Write-behind {write.kind} for user {write.user_id} failed: {output}")
+            else:
+                self.totals["written"] += 1
+            write.committed.set()
+            for future in write.waiters:
+                if not future.done():
+                    future.set_result(output)
+
+    async def _run(self):
+        while True:
+            if not self._queue:
+                if self._stopping:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            delay = self._queue[0].queued_at + self.max_delay_seconds - time.monotonic()
+            if len(self._queue) < self.max_batch and delay > 0 and not self._stopping:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            batch = self._take()
+            self.writing = len(batch)
+            started = time.perf_counter()
+            try:
+                outputs = await asyncio.to_thread(write_batch, batch)
+            except Exception as e:
+                outputs = [e] * len(batch)
+            self.writing = 0
+            self.totals["batches"] += 1
+            WRITE_BEHIND_BATCH_SIZE.observe(len(batch))
+            logger.debug(f"Wrote a batch of {len(batch)} in {(time.perf_counter() - started) * 1000:.1f} ms.")
+            self._finish(batch, outputs)
+
+    def start(self):
+        """Starts the flusher, if write-behind is enabled."""
+        if not self.enabled:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Write-behind on: batches of up to {self.max_batch} every {self.max_delay_seconds * 1000:.0f} ms, "
+            f"acknowledged when {'committed' if self.ack == 'durable' else 'queued'}."
+        )
+
+    async def stop(self):
+        """Stops taking writes and commits everything still queued."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        self._full.set()
+        if self._queue:
+            logger.info(f"Writing {len(self._queue)} queued writes before shutdown.")
+        await self._task
+        self._task = None
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "ack": self.ack, "queued_now": len(self._queue), **self.totals}
+
+
+write_behind = WriteBehindQueue(
+    WRITE_BEHIND_ENABLED, WRITE_BEHIND_ACK, WRITE_BEHIND_MAX_BATCH, WRITE_BEHIND_MAX_DELAY_MS / 1000, WRITE_BEHIND_MAX_PENDING,
+)
+
+register_gauge("write_behind_writes", "Writes waiting in the write-behind queue or being committed.", "state", {
+    "queued": lambda: len(write_behind._queue),
+    "writing": lambda: write_behind.writing,
+})
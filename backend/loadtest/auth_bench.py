@@ -0,0 +1,135 @@
+# backend/loadtest/auth_bench.py
+"""
+Authenticated-request throughput with and without the token and user caches of
+app/auth.py, with the user-version check that a shared STATE_BACKEND adds:
+
+    cd backend
+    python loadtest/auth_bench.py --users 1000 --seconds 5 --concurrency 8
+
+Two measurements:
+  * dependency: get_current_user() called in a loop in this process, with a random
+    user's token each time. "uncached" clears both caches before every call, which is
+    what every request paid before: a JWT decode, a session checkout and a SELECT.
+  * http: GET /api/users/me from --concurrency clients against a one-worker server.
+    "uncached" runs the server with both caches given a TTL of 0.
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+from common import SERVER_ENV, create_users, fresh_database, percentile, start_server, stop_server
+
+MODES = {
+    "uncached": {"STATE_BACKEND": "memory"},
+    "cached": {"STATE_BACKEND": "memory"},
+    "cached+shared": {"STATE_BACKEND": "sqlite"},
+}
+
+
+def serve(port: int, uncached: bool):
+    import uvicorn
+    from main import app
+
+    if uncached:
+        from app import auth
+        from app.cache import TTLCache
+
+        auth._token_cache = TTLCache(1, 0)
+        auth._user_cache = TTLCache(1, 0)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def _dependency(mode: str, tokens: list, seconds: float) -> tuple:
+    """Runs in its own process (settings are read at import)."""
+    from app import auth
+
+    rng = random.Random(1)
+    for token in tokens:
+        auth.get_current_user(token)
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        token = rng.choice(tokens)
+        if mode == "uncached":
+            auth._token_cache.clear()
+            auth._user_cache.clear()
+        started = time.perf_counter()
+        auth.get_current_user(token)
+        latencies.append(time.perf_counter() - started)
+    return len(latencies) / seconds, percentile(latencies, 50), percentile(latencies, 99)
+
+
+async def _http(port: int, tokens: list, seconds: float, concurrency: int) -> tuple:
+    import httpx
+
+    rng = random.Random(1)
+    latencies, failures = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits) as client:
+        async def user():
+            nonlocal failures
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get("/api/users/me", headers={"Authorization": f"Bearer {rng.choice(tokens)}"})
+                latencies.append(time.perf_counter() - started)
+                failures += response.status_code != 200
+
+        deadline = time.perf_counter() + 1
+        await asyncio.gather(*(user() for _ in range(concurrency)))  # warm-up
+        latencies.clear()
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+    return len(latencies) / seconds, percentile(latencies, 50), percentile(latencies, 99), failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--sections", nargs="+", choices=["dependency", "http"], default=["dependency", "http"])
+    parser.add_argument("--serve", choices=list(MODES), help=argparse.SUPPRESS)
+    parser.add_argument("--dependency", choices=list(MODES), help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.port, args.serve == "uncached")
+        return
+    if args.dependency:
+        tokens = [line.split()[1] for line in sys.stdin.read().splitlines()]
+        print(*_dependency(args.dependency, tokens, args.seconds))
+        return
+
+    import subprocess
+
+    print(f"{args.users} users, {args.seconds:.0f} s per run")
+    print(f"{'run':<26} {'req/s':>8} {'p50':>9} {'p99':>9} {'errors':>7}")
+    for section in args.sections:
+        for mode in args.modes:
+            database = fresh_database()
+            env = dict(MODES[mode], DATABASE_URL=database, STATE_SQLITE_PATH=database[len("sqlite:///"):] + ".state")
+            users = create_users(env, args.users)
+            if section == "dependency":
+                output = subprocess.run(
+                    [sys.executable, __file__, "--dependency", mode, "--seconds", str(args.seconds)],
+                    input="\n".join(f"{i} {t}" for i, t in users), env=dict(os.environ, **SERVER_ENV, **env),
+                    check=True, capture_output=True, text=True,
+                ).stdout.split()
+                rate, p50, p99 = (float(value) for value in output)
+                failures = 0
+            else:
+                process, port = start_server(env, [sys.executable, __file__, "--serve", mode])
+                try:
+                    rate, p50, p99, failures = asyncio.run(_http(port, [t for _, t in users], args.seconds, args.concurrency))
+                finally:
+                    stop_server(process)
+            print(f"{section + ' ' + mode:<26} {rate:>8.0f} {p50 * 1e3:>7.3f}ms {p99 * 1e3:>7.3f}ms {failures:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# backend/loadtest/batch_bench.py
+"""
+Analysing a placement cell's pile of resumes: one zip through the batch pipeline
+(POST /api/batch/resumes, results followed as NDJSON) at several BATCH_MAX_PARALLEL
+levels, against what it took before, uploading them one by one to
+/api/analyze-resume.
+
+    cd backend
+    python loadtest/batch_bench.py --files 60 --parallel 1 4 8
+
+Every file is a distinct one- or two-page PDF resume, so nothing is served from the
+response cache. The stub model answers after --latency-ms plus the time to stream
+its reply. Each run starts a one-worker server on a fresh database. Reported:
+documents per minute, how long after the upload each document's result was in hand,
+and how many failed.
+"""
+
+import io
+import time
+import random
+import asyncio
+import zipfile
+import argparse
+
+from common import fresh_database, percentile, start_server, stop_server
+from extraction_bench import PDF_MIME, make_pdf
+from resume_bench import make_resume
+
+
+def make_files(count: int) -> list:
+    """(name, data) for count PDF resumes."""
+    rng = random.Random(1)
+    files = []
+    for i in range(count):
+        lines = [line for line in make_resume(rng)[0].replace("\f", "\n").split("\n") if line.strip()]
+        lines.append(f"Reference number {i}")
+        pages = [lines[:48], lines[48:]] if i % 2 and len(lines) > 48 else [lines]
+        files.append((f"resume-{i:03d}.pdf", make_pdf(pages)))
+    return files
+
+
+async def _sequential(port: int, files: list) -> dict:
+    import httpx
+
+    latencies, failed = [], 0
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=600) as client:
+        started = time.perf_counter()
+        for name, data in files:
+            response = await client.post("/api/analyze-resume", files={"file": (name, data, PDF_MIME)})
+            failed += response.status_code != 200
+            latencies.append(time.perf_counter() - started)
+        elapsed = time.perf_counter() - started
+    return {"elapsed": elapsed, "latencies": latencies, "failed": failed}
+
+
+async def _batch(port: int, files: list) -> dict:
+    import json
+    import httpx
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as z:
+        for name, data in files:
+            z.writestr(name, data)
+    latencies, failed = [], 0
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=600) as client:
+        started = time.perf_counter()
+        response = await client.post("/api/batch/resumes", files={"files": ("resumes.zip", archive.getvalue(), "application/zip")})
+        response.raise_for_status()
+        job_id = response.json()["job_id"]
+        async with client.stream("GET", f"/api/batch/{job_id}/results") as results:
+            async for line in results.aiter_lines():
+                if line:
+                    failed += json.loads(line)["status"] != "done"
+                    latencies.append(time.perf_counter() - started)
+        elapsed = time.perf_counter() - started
+    return {"elapsed": elapsed, "latencies": latencies, "failed": failed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=60)
+    parser.add_argument("--parallel", type=int, nargs="+", default=[1, 4, 8], help="BATCH_MAX_PARALLEL levels")
+    parser.add_argument("--latency-ms", type=float, default=1000)
+    parser.add_argument("--sequential", action=argparse.BooleanOptionalAction, default=True, help="also run one by one")
+    args = parser.parse_args()
+
+    files = make_files(args.files)
+    print(f"{len(files)} PDF resumes, stub latency {args.latency_ms:.0f} ms")
+    print(f"{'run':<14} {'docs/min':>9} {'total':>8} {'first':>8} {'p50':>8} {'p99':>8} {'failed':>7}")
+    runs = ([("one by one", None)] if args.sequential else []) + [(f"batch x{p}", p) for p in args.parallel]
+    for label, parallel in runs:
+        env = {"DATABASE_URL": fresh_database(), "LLM_STUB_LATENCY_MS": str(args.latency_ms)}
+        if parallel:
+            env["BATCH_MAX_PARALLEL"] = str(parallel)
+        process, port = start_server(env)
+        try:
+            r = asyncio.run(_batch(port, files) if parallel else _sequential(port, files))
+        finally:
+            stop_server(process)
+        latencies = r["latencies"]
+        print(
+            f"{label:<14} {len(latencies) / r['elapsed'] * 60:>9.1f} {r['elapsed']:>7.1f}s {min(latencies, default=0):>7.1f}s"
+            f" {percentile(latencies, 50):>7.1f}s {percentile(latencies, 99):>7.1f}s {r['failed']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
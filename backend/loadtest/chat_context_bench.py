@@ -0,0 +1,120 @@
+# backend/loadtest/chat_context_bench.py
+"""
+Prompt size and time to first token over a long interview-coach session: the token
+budget and rolling summary of app/chat_context.py against what the chat did before,
+the whole history sent on every turn.
+
+    cd backend
+    python loadtest/chat_context_bench.py --turns 100 --prefill-tokens-per-second 2000
+
+Runs in this process against the stub model, whose time to first token is its
+latency plus the prompt's estimated tokens over --prefill-tokens-per-second (the
+stand-in for prefill). The student's messages are --question-chars long and the
+coach's replies are the stub's; each reply is appended to the history as a client
+would. Reported every --every turns: tokens sent in the chat prompt, tokens sent to
+summarize (new mode), and the time to first token of that turn; then the totals and
+the slowest first tokens.
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+from common import SERVER_ENV, fresh_database, percentile
+
+WORDS = "how would you scale the design of a cache queue index under load with retries and a budget".split()
+
+
+def _question(rng: random.Random, chars: int) -> str:
+    words = []
+    while sum(len(w) + 1 for w in words) < chars:
+        words.append(rng.choice(WORDS))
+    return " ".join(words)[:chars - 1] + "?"
+
+
+async def _session(mode: str, turns: int, question_chars: int) -> list:
+    from app import services
+    from app.chat_context import NO_SUMMARY_NOTE
+    from app.llm import estimate_tokens, get_llm_backend
+    from app.prompts import prompt_registry
+
+    prompt_registry.load()  # as the app's startup does
+    backend = get_llm_backend()
+    sent = {"chat": 0, "summary": 0}
+    stream_chat, generate_text = backend.stream_chat, backend.generate_text
+
+    def counted_stream_chat(system_instruction, history, message):
+        sent["chat"] += estimate_tokens("\n".join([system_instruction, *(turn["content"] for turn in history), message]))
+        return stream_chat(system_instruction, history, message)
+
+    async def counted_generate_text(prompt, kind=None):
+        sent["summary"] += estimate_tokens(prompt)
+        return await generate_text(prompt, kind)
+
+    backend.stream_chat, backend.generate_text = counted_stream_chat, counted_generate_text
+
+    async def before(messages):
+        # Old route: the coach prompt, then the full history, every turn.
+        system_instruction = prompt_registry.get("interview").render(chat_history=NO_SUMMARY_NOTE)
+        async for chunk in services.stream_chat_message(system_instruction, messages[:-1], messages[-1]["content"]):
+            yield chunk
+
+    rng = random.Random(1)
+    messages, rows = [], []
+    for turn in range(1, turns + 1):
+        messages.append({"role": "user", "content": _question(rng, question_chars)})
+        sent.update(chat=0, summary=0)
+        stream = before(messages) if mode == "before" else services.generate_chat_response_stream("interview", messages, semantic=False)
+        started = time.perf_counter()
+        first, reply = None, []
+        async for chunk in stream:
+            if not isinstance(chunk, str):
+                raise RuntimeError(f"chat failed: {chunk}")
+            first = first or time.perf_counter() - started
+            reply.append(chunk)
+        messages.append({"role": "assistant", "content": "".join(reply)})
+        rows.append((turn, sent["chat"], sent["summary"], first))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--every", type=int, default=10, help="print every this many turns")
+    parser.add_argument("--question-chars", type=int, default=600)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=2000)
+    parser.add_argument("--modes", nargs="+", choices=["budget", "before"], default=["budget", "before"])
+    args = parser.parse_args()
+
+    os.environ.update(SERVER_ENV, DATABASE_URL=fresh_database(), LLM_STUB_LATENCY_MS=str(args.latency_ms),
+                      LLM_STUB_TOKENS_PER_SECOND="1000", LLM_STUB_PREFILL_TOKENS_PER_SECOND=str(args.prefill_tokens_per_second))
+    from app.chat_context import CHAT_CONTEXT_TOKEN_BUDGET
+
+    print(f"{args.turns} turns, context budget {CHAT_CONTEXT_TOKEN_BUDGET} tokens,"
+          f" stub latency {args.latency_ms:.0f} ms + prefill at {args.prefill_tokens_per_second:.0f} tokens/s")
+    results = {mode: asyncio.run(_session(mode, args.turns, args.question_chars)) for mode in args.modes}
+    header = "".join(f" {mode + ' sent':>12} {'summary':>8} {'ttft':>8}" for mode in args.modes)
+    print(f"{'turn':>4}{header}")
+    for index in range(args.every - 1, args.turns, args.every):
+        line = "".join(
+            f" {rows[index][1]:>12} {rows[index][2]:>8} {rows[index][3] * 1000:>6.0f}ms" for rows in results.values()
+        )
+        print(f"{index + 1:>4}{line}")
+    totals = "".join(
+        f" {sum(r[1] for r in rows):>12} {sum(r[2] for r in rows):>8} {sum(r[3] for r in rows):>7.1f}s" for rows in results.values()
+    )
+    print(f"{'all':>4}{totals}")
+    # Turns that fold older messages into the summary wait for it before streaming.
+    slowest = "".join(
+        f" {'ttft p99/max':>21} {percentile([r[3] for r in rows], 99) * 1000:>6.0f}/{max(r[3] for r in rows) * 1000:.0f}ms"
+        for rows in results.values()
+    )
+    print(f"{'':>4}{slowest}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
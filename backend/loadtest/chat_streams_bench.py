@@ -0,0 +1,142 @@
+# backend/loadtest/chat_streams_bench.py
+"""
+Concurrent interview-coach streams on one worker: the async SSE path of /api/chat
+(app/sse.py) against what the route did before, a synchronous generator handed to
+StreamingResponse, which Starlette iterates on its threadpool (40 threads) while the
+blocking SDK stream sleeps between chunks. Both are paced by the same local stand-in
+model: the stub backend, or for the old route blocking sleeps of the same length.
+
+    cd backend
+    python loadtest/chat_streams_bench.py --streams 100 300 500 --tokens-per-second 10
+
+For each level, --streams chats are opened at once against a fresh server. Reported
+per level: streams that ended with "done" (or, for the old route, with their full
+reply), time to first token, how long the streams took, the server's peak thread count
+and /api/users/me latency while the streams were open.
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+
+from common import create_users, fresh_database, percentile, start_server, stop_server, threads_of
+
+
+def serve_blocking(port: int):
+    """The app, plus the old chat route: a sync generator that blocks between chunks."""
+    import os
+    import json
+    import uvicorn
+    from fastapi.responses import StreamingResponse
+    from app.llm import StubBackend, estimate_tokens
+    from app.schemas import ChatPayload
+    from main import app
+
+    stub = StubBackend()
+    latency = float(os.environ["LLM_STUB_LATENCY_MS"]) / 1000
+
+    def reply(messages):
+        text = stub._reply(f"{len(messages) - 1}\0{messages[-1]['content']}", 60)
+        time.sleep(latency)
+        for start in range(0, len(text), 24):
+            chunk = text[start:start + 24]
+            time.sleep(estimate_tokens(chunk) / stub.tokens_per_second)
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    @app.post("/before/chat")
+    async def chat(payload: ChatPayload):
+        return StreamingResponse(reply(payload.messages), media_type="text/event-stream")
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+async def _measure(port: int, pid: int, route: str, token: str, streams: int) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=streams + 10, max_keepalive_connections=streams + 10)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=600, limits=limits) as client:
+        async def chat(i: int) -> tuple:
+            messages = [{"role": "user", "content": f"Question {i}: how would you design a rate limiter for service {i}?"}]
+            started = time.perf_counter()
+            first = None
+            finished = False
+            async with client.stream("POST", route, json={"messages": messages}) as response:
+                async for line in response.aiter_lines():
+                    if line.startswith("data: ") and first is None:
+                        first = time.perf_counter() - started
+                    if line == "event: done":
+                        finished = True
+            return finished, first or 0.0, time.perf_counter() - started
+
+        peak_threads = threads_of(pid)
+        probes = []
+
+        async def watch(done: asyncio.Event):
+            nonlocal peak_threads
+            headers = {"Authorization": f"Bearer {token}"}
+            while not done.is_set():
+                peak_threads = max(peak_threads, threads_of(pid))
+                started = time.perf_counter()
+                await client.get("/api/users/me", headers=headers)
+                probes.append(time.perf_counter() - started)
+                await asyncio.sleep(0.1)
+
+        done = asyncio.Event()
+        watcher = asyncio.create_task(watch(done))
+        started = time.perf_counter()
+        results = await asyncio.gather(*(chat(i) for i in range(streams)), return_exceptions=True)
+        elapsed = time.perf_counter() - started
+        done.set()
+        await watcher
+    ok = [r for r in results if not isinstance(r, BaseException) and r[0]]
+    return {
+        "ok": len(ok),
+        "ttft": [r[1] for r in ok],
+        "duration": [r[2] for r in ok],
+        "elapsed": elapsed,
+        "threads": peak_threads,
+        "probes": probes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, nargs="+", default=[100, 300, 500])
+    parser.add_argument("--tokens-per-second", type=float, default=10, help="stub token rate; about 9 s per reply at 10")
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--modes", nargs="+", choices=["async", "blocking"], default=["async", "blocking"])
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve_blocking(args.port)
+        return
+
+    print(f"model latency {args.latency_ms:.0f} ms, {args.tokens_per_second:.0f} tokens/s, one worker")
+    print(f"{'mode':<9} {'streams':>7} {'done':>6} {'ttft p50':>9} {'ttft p99':>9} {'dur p50':>8} {'dur max':>8} {'threads':>7} {'me p99':>8}")
+    for mode in args.modes:
+        for streams in args.streams:
+            env = {
+                "DATABASE_URL": fresh_database(),
+                "LLM_STUB_LATENCY_MS": str(args.latency_ms),
+                "LLM_STUB_TOKENS_PER_SECOND": str(args.tokens_per_second),
+                "CHAT_MAX_CONCURRENCY": str(max(streams, 256)),
+            }
+            (_, token), = create_users(env, 1)
+            blocking = mode == "blocking"
+            process, port = start_server(env, [sys.executable, __file__, "--serve"] if blocking else None)
+            try:
+                r = asyncio.run(_measure(port, process.pid, "/before/chat" if blocking else "/api/chat", token, streams))
+            finally:
+                stop_server(process)
+            print(
+                f"{mode:<9} {streams:>7} {r['ok']:>6} {percentile(r['ttft'], 50):>8.2f}s {percentile(r['ttft'], 99):>8.2f}s"
+                f" {percentile(r['duration'], 50):>7.1f}s {max(r['duration'], default=0):>7.1f}s {r['threads']:>7}"
+                f" {percentile(r['probes'], 99) * 1000:>6.0f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# backend/loadtest/common.py
+"""
+Helpers shared by the benchmark scripts in this directory: starting a server in a
+subprocess, creating users without going through bcrypt, and summarizing latencies.
+"""
+
+import os
+import sys
+import time
+import socket
+import tempfile
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+JWT_SECRET = "loadtest"
+# Settings every benchmark server starts with: the stub model, no warm-up, and nothing
+# served from the caches unless a benchmark turns them on.
+SERVER_ENV = {
+    "JWT_SECRET": JWT_SECRET,
+    "LLM_BACKEND": "stub",
+    "LLM_STUB_LATENCY_DIST": "fixed",
+    "WARMUP_ON_STARTUP": "false",
+    "SEMANTIC_CACHE_ENABLED": "false",
+    "USAGE_TOKEN_BUDGET": str(10 ** 9),
+    "USAGE_ANONYMOUS_TOKEN_BUDGET": str(10 ** 9),
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def fresh_database() -> str:
+    return f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='loadtest-'), 'bench.db')}"
+
+
+def start_server(env: dict, command: list = None) -> tuple:
+    """
+    Starts a server with SERVER_ENV and env on a free port and waits until it accepts
+    connections. command defaults to uvicorn serving main:app; a script serving its own
+    app passes its command line, to which "--port N" is appended. The server's output
+    goes to a log file, so it does not mix with the benchmark's.
+    """
+    port = free_port()
+    if command is None:
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--log-level", "warning"]
+    log_path = os.path.join(tempfile.mkdtemp(prefix="loadtest-"), "server.log")
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(
+            command + ["--port", str(port)], cwd=BACKEND_DIR, env=dict(os.environ, **SERVER_ENV, **env),
+            stdout=log, stderr=subprocess.STDOUT,
+        )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"the server exited during startup; see {log_path}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"the server did not start; see {log_path}")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def create_users(env: dict, count: int, password_hash: str = "x") -> list:
+    """Creates the schema and count users in a fresh process; returns (user_id, token) pairs."""
+    output = subprocess.run(
+        [sys.executable, "-c",
+         "import sys\n"
+         "from app.db import SessionLocal, init_db\n"
+         "from app import models\n"
+         "from app.auth import create_access_token\n"
+         "init_db()\n"
+         "db = SessionLocal()\n"
+         f"users = [models.User(username=f'student{{i}}', hashed_password=sys.argv[1]) for i in range({count})]\n"
+         "db.add_all(users)\n"
+         "db.commit()\n"
+         "for user in users:\n"
+         "    print(user.id, create_access_token({'sub': user.username, 'user_id': user.id}))\n",
+         password_hash],
+        cwd=BACKEND_DIR, env=dict(os.environ, **SERVER_ENV, **env), check=True, capture_output=True, text=True,
+    )
+    return [(int(user_id), token) for user_id, token in (line.split() for line in output.stdout.splitlines())]
+
+
+def percentile(values: list, q: float) -> float:
+    """The q-th percentile (0-100) of values, nearest rank; 0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def threads_of(pid: int) -> int:
+    """The number of threads of a process (Linux)."""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("Threads:"):
+                return int(line.split()[1])
+    return 0
@@ -0,0 +1,99 @@
+# backend/loadtest/conversation_bench.py
+"""
+Saving a long interview-coach session turn by turn: the append endpoint
+(POST /api/users/conversation/{category}/messages, only the new turn) against saving
+the whole conversation after every turn (POST /api/users/conversation), which is
+what the frontend did and what older clients still do.
+
+    cd backend
+    python loadtest/conversation_bench.py --turns 500
+
+Each mode runs against its own one-worker server and fresh database, write-behind
+off. A turn is a question and a reply (--question-chars and --reply-chars). Reported:
+the bytes sent and received, the latency of the first and last 50 saves, and the
+bytes the server process wrote to disk (write_bytes of /proc/<pid>/io, so Linux only).
+"""
+
+import time
+import random
+import argparse
+
+from common import create_users, fresh_database, percentile, start_server, stop_server
+
+WORDS = "the a queue cache index latency trade-off design scale shard replica lock retry budget".split()
+
+
+def _text(rng: random.Random, chars: int) -> str:
+    words = []
+    while sum(len(w) + 1 for w in words) < chars:
+        words.append(rng.choice(WORDS))
+    return " ".join(words)[:chars]
+
+
+def _write_bytes(pid: int) -> int:
+    with open(f"/proc/{pid}/io") as io:
+        return next(int(line.split()[1]) for line in io if line.startswith("write_bytes"))
+
+
+def _session(port: int, token: str, mode: str, turns: int, question_chars: int, reply_chars: int) -> dict:
+    import httpx
+
+    rng = random.Random(1)
+    messages, latencies, sent, received = [], [], 0, 0
+    with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=120, headers={"Authorization": f"Bearer {token}"}) as client:
+        for turn in range(turns):
+            new = [
+                {"role": "user", "content": _text(rng, question_chars)},
+                {"role": "assistant", "content": _text(rng, reply_chars)},
+            ]
+            if mode == "append":
+                request = client.build_request(
+                    "POST", "/api/users/conversation/interview/messages",
+                    json={"messages": new, "after_seq": len(messages), "idempotency_key": f"turn-{turn}"},
+                )
+            else:
+                request = client.build_request(
+                    "POST", "/api/users/conversation", json={"category": "interview", "messages": messages + new},
+                )
+            started = time.perf_counter()
+            response = client.send(request)
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+            messages += new
+            sent += len(request.content)
+            received += len(response.content)
+        stored = client.get("/api/users/conversation/interview").json()["messages"]
+    assert len(stored) == len(messages), (len(stored), len(messages))
+    return {"latencies": latencies, "sent": sent, "received": received}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--question-chars", type=int, default=300)
+    parser.add_argument("--reply-chars", type=int, default=1200)
+    parser.add_argument("--modes", nargs="+", choices=["append", "rewrite"], default=["append", "rewrite"])
+    args = parser.parse_args()
+
+    print(f"{args.turns} turns of {args.question_chars} + {args.reply_chars} characters, one save per turn")
+    print(f"{'mode':<8} {'sent':>9} {'received':>9} {'first 50 p50':>13} {'last 50 p50':>12} {'p99':>9} {'total':>8} {'disk writes':>12}")
+    for mode in args.modes:
+        env = {"DATABASE_URL": fresh_database(), "WRITE_BEHIND_ENABLED": "false"}
+        (_, token), = create_users(env, 1)
+        process, port = start_server(env)
+        try:
+            written = _write_bytes(process.pid)
+            r = _session(port, token, mode, args.turns, args.question_chars, args.reply_chars)
+            written = _write_bytes(process.pid) - written
+        finally:
+            stop_server(process)
+        latencies = r["latencies"]
+        print(
+            f"{mode:<8} {r['sent'] / 1e6:>7.2f}MB {r['received'] / 1e6:>7.2f}MB"
+            f" {percentile(latencies[:50], 50) * 1000:>11.1f}ms {percentile(latencies[-50:], 50) * 1000:>10.1f}ms"
+            f" {percentile(latencies, 99) * 1000:>7.1f}ms {sum(latencies):>7.1f}s {written / 1e6:>10.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# backend/loadtest/dashboard_session.py
+"""
+Bytes transferred and latency of a typical dashboard session, with and without
+compression and conditional GETs. Run it against a running server:
+
+    uvicorn main:app --workers 1
+    python loadtest/dashboard_session.py --host http://127.0.0.1:8000 --results 1000 --messages 400
+
+A fresh user is given `--results` results and a `--messages`-message conversation. The
+session then mounts the dashboard views `--mounts` times, each mount reading
+/users/me, /users/results, /users/results/stats and /users/conversation/chat, and saves one
+new result halfway through. It is run three ways: uncompressed with no validators,
+gzip only, and gzip plus If-None-Match (what a browser's HTTP cache sends).
+"""
+
+import uuid
+import random
+import argparse
+import statistics
+import time
+import httpx
+
+READS = ["/api/users/me", "/api/users/results", "/api/users/results/stats?bucket=day", "/api/users/conversation/chat"]
+
+
+def seed_user(client: httpx.Client, results: int, messages: int) -> dict:
+    username = f"dash_{uuid.uuid4().hex[:10]}"
+    client.post("/api/auth/register", json={"username": username, "password": "loadtest-pw"}).raise_for_status()
+    token = client.post("/api/auth/login", json={"username": username, "password": "loadtest-pw"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    rng = random.Random(1)
+    for i in range(results):
+        client.post("/api/users/results", headers=headers, json={
+            "category": rng.choice(["dsa", "resume", "mental"]), "score": rng.uniform(0, 100), "meta": f"practice run {i}",
+        }).raise_for_status()
+    client.post("/api/users/conversation", headers=headers, json={
+        "category": "chat",
+        "messages": [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"Turn {i}: " + "tell me more about system design " * 8}
+            for i in range(messages)
+        ],
+    }).raise_for_status()
+    return headers
+
+
+def run_session(client: httpx.Client, auth: dict, mounts: int, compress: bool, revalidate: bool) -> dict:
+    etags = {}
+    wire_bytes = 0
+    not_modified = 0
+    timings = []
+    for mount in range(mounts):
+        if mount == mounts // 2:
+            client.post("/api/users/results", headers=auth, json={"category": "dsa", "score": 50.0}).raise_for_status()
+        for path in READS:
+            headers = dict(auth, **{"Accept-Encoding": "gzip" if compress else "identity"})
+            if revalidate and path in etags:
+                headers["If-None-Match"] = etags[path]
+            started = time.perf_counter()
+            response = client.get(path, headers=headers)
+            response.read()
+            timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code == 304:
+                not_modified += 1
+            else:
+                response.raise_for_status()
+                etags[path] = response.headers.get("ETag")
+            wire_bytes += response.num_bytes_downloaded
+    timings.sort()
+    return {
+        "requests": len(timings),
+        "not_modified": not_modified,
+        "kib": wire_bytes / 1024,
+        "p50_ms": statistics.median(timings),
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="http://127.0.0.1:8000")
+    parser.add_argument("--results", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=400)
+    parser.add_argument("--mounts", type=int, default=10)
+    args = parser.parse_args()
+
+    with httpx.Client(base_url=args.host, timeout=60) as client:
+        auth = seed_user(client, args.results, args.messages)
+        print(f"{'mode':<14} {'requests':>8} {'304s':>5} {'body KiB':>9} {'p50 ms':>7} {'p95 ms':>7}")
+        for mode, compress, revalidate in (("plain", False, False), ("gzip", True, False), ("gzip + etag", True, True)):
+            stats = run_session(client, auth, args.mounts, compress, revalidate)
+            print(
+                f"{mode:<14} {stats['requests']:>8} {stats['not_modified']:>5} {stats['kib']:>9.1f} "
+                f"{stats['p50_ms']:>7.1f} {stats['p95_ms']:>7.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
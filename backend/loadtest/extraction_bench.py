@@ -0,0 +1,176 @@
+# backend/loadtest/extraction_bench.py
+"""
+Resume extraction throughput and event-loop stalls over a generated corpus of PDFs and
+DOCX files of 1 to 50 pages: the process-pool pipeline of app/extraction.py (page by
+page, stopping at RESUME_TOKEN_BUDGET) against what process_resume_file did before,
+parsing the whole file on the event loop and building the text with `+=`.
+
+    cd backend
+    python loadtest/extraction_bench.py --files 40 --concurrency 4
+
+While the files are extracted, --concurrency at a time, a ticker on the event loop
+asks to wake every 5 ms; how late it wakes is the stall every other request on the
+worker would see. The pool has RESUME_EXTRACT_WORKERS processes (default 2) and is
+started before timing, as the warm-up does in the app.
+"""
+
+import io
+import time
+import random
+import asyncio
+import argparse
+
+from common import percentile
+from resume_bench import make_resume
+
+PDF_MIME = "application/pdf"
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+PAGE_COUNTS = [1, 2, 3, 5, 10, 20, 35, 50]
+LINES_PER_PAGE = 48
+
+
+def _escape(line: str) -> str:
+    return line.encode("latin-1", "replace").decode("latin-1").replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: list) -> bytes:
+    """A PDF with one Helvetica text block per page; pages is a list of lists of lines."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        text = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({_escape(line)}) '" for line in lines) + " ET"
+        stream = text.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % len(objects)
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def make_docx(lines: list) -> bytes:
+    import docx
+
+    document = docx.Document()
+    for line in lines:
+        document.add_paragraph(line)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def make_corpus(files: int) -> list:
+    """(content_type, pages, data) for files files, alternating PDF and DOCX, cycling through PAGE_COUNTS."""
+    rng = random.Random(1)
+    corpus = []
+    for i in range(files):
+        page_count = PAGE_COUNTS[(i // 2) % len(PAGE_COUNTS)]
+        lines = []
+        while len(lines) < page_count * LINES_PER_PAGE:
+            lines += [line for line in make_resume(rng)[0].replace("\f", "\n").split("\n") if line.strip()]
+        lines = lines[:page_count * LINES_PER_PAGE]
+        if i % 2 == 0:
+            pages = [lines[p:p + LINES_PER_PAGE] for p in range(0, len(lines), LINES_PER_PAGE)]
+            corpus.append((PDF_MIME, page_count, make_pdf(pages)))
+        else:
+            corpus.append((DOCX_MIME, page_count, make_docx(lines)))
+    return corpus
+
+
+def extract_inline(content_type: str, data: bytes) -> str:
+    """process_resume_file before: the whole file, parsed on the calling thread."""
+    if content_type == PDF_MIME:
+        from PyPDF2 import PdfReader
+
+        text = ""
+        for page in PdfReader(io.BytesIO(data)).pages:
+            text += page.extract_text() or ""
+        return text
+    import docx
+
+    return "\n".join([paragraph.text for paragraph in docx.Document(io.BytesIO(data)).paragraphs])
+
+
+async def _run(corpus: list, concurrency: int, mode: str) -> dict:
+    from app.services import extract_resume
+
+    semaphore = asyncio.Semaphore(concurrency)
+    lags = []
+    running = True
+
+    async def ticker():
+        while running:
+            started = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(max(0.0, time.perf_counter() - started - 0.005))
+
+    async def extract(content_type: str, data: bytes) -> int:
+        async with semaphore:
+            if mode == "inline":
+                # As before: an async function doing the parsing without ever awaiting.
+                return len(extract_inline(content_type, data))
+            return len(await extract_resume(content_type, data))
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    chars = await asyncio.gather(*(extract(content_type, data) for content_type, _, data in corpus))
+    elapsed = time.perf_counter() - started
+    running = False
+    await tick
+    return {"elapsed": elapsed, "chars": sum(chars), "lags": lags}
+
+
+async def _warm_pool():
+    from app.extraction import preload
+    from app.services import RESUME_EXTRACT_WORKERS, _get_extraction_pool
+
+    loop = asyncio.get_running_loop()
+    pool = _get_extraction_pool()
+    await asyncio.gather(*(loop.run_in_executor(pool, preload) for _ in range(RESUME_EXTRACT_WORKERS)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", choices=["inline", "pool"], default=["inline", "pool"])
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.files)
+    pages = sum(page_count for _, page_count, _ in corpus)
+    size = sum(len(data) for _, _, data in corpus)
+    print(f"{len(corpus)} files ({pages} pages, {size / 1e6:.1f} MB), {args.concurrency} at a time")
+    print(f"{'mode':<7} {'files/s':>8} {'pages/s':>8} {'chars out':>10} {'stall p99':>10} {'stall max':>10} {'stalled':>8}")
+
+    for mode in args.modes:
+        # Start the workers and import the parsers outside the timing.
+        if mode == "pool":
+            asyncio.run(_warm_pool())
+        else:
+            extract_inline(PDF_MIME, corpus[0][2])
+            extract_inline(DOCX_MIME, corpus[1][2])
+        r = asyncio.run(_run(corpus, args.concurrency, mode))
+        stalled = sum(lag for lag in r["lags"] if lag > 0.02)
+        print(
+            f"{mode:<7} {len(corpus) / r['elapsed']:>8.1f} {pages / r['elapsed']:>8.1f} {r['chars']:>10}"
+            f" {percentile(r['lags'], 99) * 1000:>8.1f}ms {max(r['lags'], default=0) * 1000:>8.1f}ms"
+            f" {stalled / r['elapsed']:>7.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
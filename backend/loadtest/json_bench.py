@@ -0,0 +1,146 @@
+# backend/loadtest/json_bench.py
+"""
+CPU cost of handling a resume analysis from the model, at several sizes of output:
+what the resume route does now (app/services.py: parse_model_json with orjson, the
+ResumeAnalysis schema's validation, and the response_model serialization of FastAPI)
+against what it did before (json.loads, no validation, the dict encoded by
+jsonable_encoder and JSONResponse).
+
+    cd backend
+    python loadtest/json_bench.py --sizes 2 20 200
+
+Both paths run in this process: "parse" and "validate" are timed on their own, and
+"route" is a GET against a two-route app serving the parsed output through the same
+FastAPI machinery as /api/analyze-resume, called over ASGI without a server. The
+repair rows time parse_model_json on the output wrapped in a ```json fence and cut
+off part way, which json.loads could not parse at all before. The text is mostly
+ASCII, as analyses are; orjson's lead over json.loads shrinks, and turns into a loss,
+as the share of non-ASCII characters grows.
+"""
+
+import json
+import time
+import random
+import asyncio
+import argparse
+
+import common  # noqa: F401  (puts backend/ on sys.path)
+
+WORDS = (
+    "led built shipped owned designed reduced the latency of a service by scaling it to students across campus "
+    "with python sql react and aws for an internship project team club résumé"
+).split()
+
+
+def make_output(kilobytes: float) -> str:
+    """A valid resume analysis of about kilobytes KB, as the model would return it."""
+    rng = random.Random(1)
+
+    def sentence(words: int) -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+    recommendations = []
+    analysis = {
+        "overall_summary": " ".join(sentence(18) for _ in range(6)),
+        "ats_compatibility_score": {"score": 72, "explanation": " ".join(sentence(15) for _ in range(3))},
+        "section_feedback": {section: " ".join(sentence(16) for _ in range(3)) for section in ("contact_info", "work_experience", "skills", "education")},
+        "recommendations": recommendations,
+    }
+    while len(json.dumps({"analysis": analysis}, ensure_ascii=False).encode("utf-8")) < kilobytes * 1000:
+        recommendations.append(sentence(20))
+    return json.dumps({"analysis": analysis}, ensure_ascii=False, indent=2)
+
+
+def _best(function, seconds: float) -> float:
+    """Fastest time of one call, from runs of repeated calls within about seconds."""
+    calls, elapsed = 1, 0.0
+    while elapsed < seconds / 10:
+        started = time.perf_counter()
+        for _ in range(calls):
+            function()
+        elapsed = time.perf_counter() - started
+        calls *= 2
+    best = elapsed / (calls // 2)
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(calls // 2):
+            function()
+        best = min(best, (time.perf_counter() - started) / (calls // 2))
+    return best
+
+
+def _route_timer(data: dict):
+    """Returns {mode: callable} each serving data over ASGI as the old and the new route do."""
+    from fastapi import FastAPI
+    from app.schemas import ResumeAnalysis
+
+    app = FastAPI()
+
+    @app.get("/before")
+    async def before():
+        return data
+
+    @app.get("/now", response_model=ResumeAnalysis)
+    async def now():
+        return data
+
+    async def call(path: str):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+            "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+        }
+        body = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            if message["type"] == "http.response.body":
+                body.append(message.get("body", b""))
+
+        await app(scope, receive, send)
+        return b"".join(body)
+
+    loop = asyncio.new_event_loop()
+    # Both routes must send the same document; this also warms them up.
+    assert json.loads(loop.run_until_complete(call("/before"))) == json.loads(loop.run_until_complete(call("/now")))
+    return {mode: (lambda path=f"/{mode}": loop.run_until_complete(call(path))) for mode in ("before", "now")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[2, 20, 200], help="output sizes in KB")
+    parser.add_argument("--seconds", type=float, default=1, help="time spent on each measurement")
+    args = parser.parse_args()
+
+    from app.json_stream import parse_model_json
+    from app.schemas import ResumeAnalysis
+
+    print(f"{'size':>6} {'step':<10} {'before':>10} {'now':>10} {'speed-up':>9}")
+    for kilobytes in args.sizes:
+        text = make_output(kilobytes)
+        data = json.loads(text)
+        routes = _route_timer(data)
+        fenced = f"Here is the analysis:\n```json\n{text}\n```"
+        truncated = text[:int(len(text) * 0.8)]
+        rows = [
+            ("parse", _best(lambda: json.loads(text), args.seconds), _best(lambda: parse_model_json(text), args.seconds)),
+            ("validate", 0.0, _best(lambda: ResumeAnalysis.model_validate(data).model_dump(), args.seconds)),
+            ("route", _best(routes["before"], args.seconds), _best(routes["now"], args.seconds)),
+        ]
+        rows.append(("total", sum(r[1] for r in rows), sum(r[2] for r in rows)))
+        rows += [
+            ("fenced", None, _best(lambda: parse_model_json(fenced), args.seconds)),
+            ("truncated", None, _best(lambda: parse_model_json(truncated), args.seconds)),
+        ]
+        size = f"{len(text.encode('utf-8')) / 1000:.0f}KB"
+        for step, before, now in rows:
+            shown = "error" if before is None else f"{before * 1e6:.0f}us" if before else "-"
+            ratio = f"{before / now:.1f}x" if before else ""
+            print(f"{size:>6} {step:<10} {shown:>10} {now * 1e6:>8.0f}us {ratio:>9}")
+            size = ""
+
+
+if __name__ == "__main__":
+    main()
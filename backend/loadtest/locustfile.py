@@ -0,0 +1,153 @@
+# backend/loadtest/locustfile.py
+"""
+Load test covering every /api route. Run it against a server started with the stub
+model backend, so results measure our code rather than the model provider:
+
+    LLM_BACKEND=stub LLM_STUB_SEED=1 uvicorn main:app --workers 4
+    pip install locust
+    locust -f loadtest/locustfile.py --host http://127.0.0.1:8000 \
+        --headless -u 200 -r 20 -t 5m --csv loadtest/baseline
+
+Keep the stub settings, user count and duration fixed between runs so the CSV output
+can be compared with the previous baseline.
+"""
+
+import io
+import uuid
+import random
+from locust import HttpUser, between, task
+
+TEXTS = [
+    "Finish the report by Friday, book the dentist and plan the team offsite.",
+    "I have been feeling overwhelmed with exams and I can't sleep well.",
+    "Learn SQL window functions, refresh my resume and apply to three jobs this week.",
+    "Today was good, I went running and called my family.",
+]
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def _resume_docx() -> bytes:
+    import docx
+
+    document = docx.Document()
+    document.add_paragraph("Jane Doe - jane@example.com")
+    for i in range(30):
+        document.add_paragraph(f"Built and operated service {i} handling 10k requests per second with Python and PostgreSQL.")
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+RESUME = _resume_docx()
+
+
+def _read_sse(response) -> int:
+    """Reads an SSE chat reply to the end and returns the number of data frames."""
+    frames = 0
+    for line in response.iter_lines():
+        line = line.decode("utf-8") if isinstance(line, bytes) else line
+        if line.startswith("event: done"):
+            break
+        if line.startswith("data: "):
+            frames += 1
+    return frames
+
+
+class AnonymousUser(HttpUser):
+    """Uses the AI tools without signing in."""
+
+    weight = 2
+    wait_time = between(1, 3)
+
+    @task(4)
+    def generate_todo(self):
+        self.client.post("/api/generate-todo", json={"text": random.choice(TEXTS)})
+
+    @task(2)
+    def analyze_mental_health(self):
+        self.client.post("/api/analyze-mental-health", json={"text": random.choice(TEXTS)})
+
+    @task(2)
+    def analyze_resume(self):
+        self.client.post("/api/analyze-resume", files={"file": ("resume.docx", RESUME, DOCX_MIME)})
+
+    @task(4)
+    def chat(self):
+        messages = [{"role": "user", "content": random.choice(TEXTS)}]
+        with self.client.post("/api/chat", json={"messages": messages}, stream=True, catch_response=True) as response:
+            if _read_sse(response) == 0:
+                response.failure("Empty chat reply")
+
+    @task(1)
+    def model_stats(self):
+        self.client.get("/api/model-stats")
+
+    @task(1)
+    def batch_todos(self):
+        response = self.client.post("/api/batch/todos", json={"texts": random.sample(TEXTS, 3)})
+        if response.ok:
+            job_id = response.json()["job_id"]
+            self.client.get(f"/api/batch/{job_id}", name="/api/batch/[id]")
+            self.client.get(f"/api/batch/{job_id}/results", name="/api/batch/[id]/results")
+
+    @task(1)
+    def batch_resumes(self):
+        files = [("files", (f"resume-{i}.docx", RESUME, DOCX_MIME)) for i in range(3)]
+        response = self.client.post("/api/batch/resumes", files=files)
+        if response.ok:
+            self.client.get(f"/api/batch/{response.json()['job_id']}", name="/api/batch/[id]")
+
+
+class SignedInUser(HttpUser):
+    """Registers once, then chats, saves its conversation and records results."""
+
+    weight = 1
+    wait_time = between(1, 3)
+
+    def on_start(self):
+        username = f"load-{uuid.uuid4().hex[:12]}"
+        password = "load-test-password"
+        self.client.post("/api/auth/register", json={"username": username, "password": password})
+        token = self.client.post("/api/auth/login", json={"username": username, "password": password}).json()["access_token"]
+        self.client.headers["Authorization"] = f"Bearer {token}"
+        self.messages = []
+        self.last_seq = 0
+
+    @task(1)
+    def me(self):
+        self.client.get("/api/users/me")
+
+    @task(4)
+    def chat_and_save(self):
+        self.messages.append({"role": "user", "content": random.choice(TEXTS)})
+        with self.client.post(
+            "/api/chat", json={"category": "chat", "messages": self.messages}, stream=True, catch_response=True
+        ) as response:
+            _read_sse(response)
+        self.messages.append({"role": "assistant", "content": "(reply)"})
+        response = self.client.post(
+            "/api/users/conversation/chat/messages",
+            json={"messages": self.messages[-2:], "after_seq": self.last_seq, "idempotency_key": uuid.uuid4().hex},
+        )
+        if response.ok:
+            self.last_seq = response.json()["last_seq"]
+
+    @task(1)
+    def load_conversation(self):
+        self.client.get("/api/users/conversation/chat", name="/api/users/conversation/[category]")
+
+    @task(1)
+    def replace_conversation(self):
+        self.client.post("/api/users/conversation", json={"category": "scratch", "messages": self.messages[-4:]})
+
+    @task(3)
+    def save_result(self):
+        self.client.post("/api/users/results", json={"category": random.choice(["resume", "mood"]), "score": random.uniform(0, 100)})
+
+    @task(2)
+    def list_results(self):
+        self.client.get("/api/users/results?limit=100")
+
+    @task(2)
+    def result_stats(self):
+        self.client.get("/api/users/results/stats?bucket=day")
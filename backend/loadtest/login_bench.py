@@ -0,0 +1,129 @@
+# backend/loadtest/login_bench.py
+"""
+Login throughput during a burst (a class signing in at once) for several sizes of the
+password-hashing pool of app/auth.py, against what /api/auth/login did before: a sync
+route verifying the bcrypt hash on Starlette's shared threadpool.
+
+    cd backend
+    python loadtest/login_bench.py --workers 1 2 4 --clients 100 --seconds 15
+
+Each run starts a one-worker server with users whose passwords are hashed at
+--rounds, and has --clients clients log in back to back for --seconds. Reported:
+logins per second, their latency, how many were shed with a 503 (the pool runs queue at
+most --queue-limit logins), and the latency of /api/users/me (a cheap authenticated
+route) meanwhile. bcrypt releases the GIL, so the pool scales with the cores the
+machine has, which is printed first.
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+from common import create_users, fresh_database, percentile, start_server, stop_server
+
+PASSWORD = "class-of-2025"
+
+
+def serve_before(port: int):
+    """The app, plus the old login route: bcrypt on the shared threadpool."""
+    import uvicorn
+    from fastapi import Depends, HTTPException
+    from sqlalchemy.orm import Session
+    from app import models
+    from app.auth import create_access_token, get_db, pwd_context
+    from app.schemas_auth import UserLogin
+    from main import app
+
+    @app.post("/before/login")
+    def login(payload: UserLogin, db: Session = Depends(get_db)):
+        user = db.query(models.User).filter(models.User.username == payload.username).first()
+        if not user or not pwd_context.verify(payload.password, user.hashed_password):
+            raise HTTPException(status_code=401, detail="Invalid username or password")
+        return {"access_token": create_access_token({"sub": user.username, "user_id": user.id}), "token_type": "bearer"}
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+async def _measure(port: int, route: str, users: list, clients: int, seconds: float) -> dict:
+    import httpx
+
+    rng = random.Random(1)
+    logins, statuses, probes = [], {}, []
+    limits = httpx.Limits(max_connections=clients + 5, max_keepalive_connections=clients + 5)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+        deadline = time.perf_counter() + seconds
+
+        async def student():
+            while time.perf_counter() < deadline:
+                index = rng.randrange(len(users))
+                started = time.perf_counter()
+                try:
+                    response = await client.post(route, json={"username": f"student{index}", "password": PASSWORD})
+                except httpx.TransportError:
+                    statuses["error"] = statuses.get("error", 0) + 1
+                    continue
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 200:
+                    logins.append(time.perf_counter() - started)
+                elif response.status_code == 503:
+                    await asyncio.sleep(0.5)  # as a client honouring Retry-After would
+
+        async def probe():
+            headers = {"Authorization": f"Bearer {users[0][1]}"}
+            await asyncio.sleep(1)
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                await client.get("/api/users/me", headers=headers)
+                probes.append(time.perf_counter() - started)
+                await asyncio.sleep(0.1)
+
+        started = time.perf_counter()
+        await asyncio.gather(probe(), *(student() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+    return {"rate": len(logins) / elapsed, "logins": logins, "statuses": statuses, "probes": probes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="PASSWORD_HASH_WORKERS to run")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--queue-limit", type=int, default=16, help="PASSWORD_HASH_QUEUE_LIMIT for the pool runs")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost of the stored hashes")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--before", action=argparse.BooleanOptionalAction, default=True, help="also run the old route")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve_before(args.port)
+        return
+
+    from passlib.context import CryptContext
+
+    password_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=args.rounds).hash(PASSWORD)
+    print(f"{os.cpu_count()} CPU(s), bcrypt cost {args.rounds}, {args.clients} clients for {args.seconds:.0f} s, queue limit {args.queue_limit}")
+    print(f"{'run':<12} {'logins/s':>9} {'p50':>8} {'p99':>8} {'me p50':>9} {'me p99':>9}  statuses")
+    runs = [(f"pool {n}", n, False) for n in args.workers] + ([("before", 0, True)] if args.before else [])
+    for label, workers, before in runs:
+        env = {"DATABASE_URL": fresh_database(), "BCRYPT_ROUNDS": str(args.rounds)}
+        if workers:
+            env.update(PASSWORD_HASH_WORKERS=str(workers), PASSWORD_HASH_QUEUE_LIMIT=str(args.queue_limit))
+        users = create_users(env, args.users, password_hash)
+        process, port = start_server(env, [sys.executable, __file__, "--serve"] if before else None)
+        try:
+            r = asyncio.run(_measure(port, "/before/login" if before else "/api/auth/login", users, args.clients, args.seconds))
+        finally:
+            stop_server(process)
+        print(
+            f"{label:<12} {r['rate']:>9.1f} {percentile(r['logins'], 50):>7.2f}s {percentile(r['logins'], 99):>7.2f}s"
+            f" {percentile(r['probes'], 50) * 1000:>7.1f}ms {percentile(r['probes'], 99) * 1000:>7.1f}ms"
+            f"  {' '.join(f'{k}x{v}' for k, v in sorted(r['statuses'].items(), key=str))}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# backend/loadtest/mixed_rw_bench.py
+"""
+Mixed read/write traffic against the results endpoints on SQLite: the database setup
+of app/db.py (WAL, synchronous=NORMAL, busy_timeout, mmap, sized pool) against the
+engine as it was before (SQLAlchemy's defaults: rollback journal, synchronous=FULL,
+a pool of 5 plus 10 overflow).
+
+    cd backend
+    python loadtest/mixed_rw_bench.py --clients 32 --seconds 15 --write-share 0.2
+
+Each run starts a one-worker server on a fresh database holding --results results for
+each of --students students, then --clients clients each pick a random student and
+either list their latest page of results (GET /api/users/results) or save a new one
+(POST /api/users/results), for --seconds. Write-behind is off, so every write is its
+own commit.
+"""
+
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+from common import create_users, fresh_database, percentile, start_server, stop_server
+
+
+def serve_before(port: int):
+    """The app on the engine as it was: no PRAGMAs on connect, so SQLite's defaults apply."""
+    import uvicorn
+    from sqlalchemy import event
+    from app import db
+
+    event.remove(db.engine, "connect", db._set_sqlite_pragmas)
+    db._set_sqlite_pragmas = lambda dbapi_connection, connection_record: None  # the async engine is created later
+    from main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def _seed(database: str, user_ids: list, per_user: int, journal_mode: str):
+    import sqlite3
+    from datetime import datetime, timedelta
+
+    rng = random.Random(1)
+    start = datetime(2025, 1, 1)
+    connection = sqlite3.connect(database[len("sqlite:///"):])
+    connection.executemany(
+        "INSERT INTO results (user_id, category, score, created_at) VALUES (?, ?, ?, ?)",
+        (
+            (user_id, rng.choice(["dsa", "resume", "aptitude"]), rng.randint(0, 100), start + timedelta(minutes=i))
+            for user_id in user_ids for i in range(per_user)
+        ),
+    )
+    connection.commit()
+    # journal_mode is stored in the file, and create_users went through app.db.
+    connection.execute(f"PRAGMA journal_mode={journal_mode}")
+    connection.close()
+
+
+async def _measure(port: int, users: list, clients: int, seconds: float, write_share: float) -> dict:
+    import httpx
+
+    rng = random.Random(2)
+    latencies = {"read": [], "write": []}
+    statuses = {}
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+        deadline = time.perf_counter() + seconds
+
+        async def student():
+            while time.perf_counter() < deadline:
+                _, token = rng.choice(users)
+                headers = {"Authorization": f"Bearer {token}"}
+                kind = "write" if rng.random() < write_share else "read"
+                started = time.perf_counter()
+                if kind == "write":
+                    response = await client.post("/api/users/results", json={"category": "dsa", "score": rng.randint(0, 100)}, headers=headers)
+                else:
+                    response = await client.get("/api/users/results?category=dsa&limit=20", headers=headers)
+                latencies[kind].append(time.perf_counter() - started)
+                statuses[f"{kind} {response.status_code}"] = statuses.get(f"{kind} {response.status_code}", 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(student() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+    return {"elapsed": elapsed, "latencies": latencies, "statuses": statuses}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--write-share", type=float, default=0.2)
+    parser.add_argument("--students", type=int, default=100)
+    parser.add_argument("--results", type=int, default=500, help="results stored per student before the run")
+    parser.add_argument("--modes", nargs="+", choices=["tuned", "before"], default=["tuned", "before"])
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve_before(args.port)
+        return
+
+    print(f"{args.clients} clients, {args.write_share:.0%} writes, {args.students} students x {args.results} results, {args.seconds:.0f} s")
+    print(f"{'mode':<7} {'req/s':>6} {'reads/s':>8} {'read p50':>9} {'read p99':>9} {'writes/s':>9} {'write p50':>10} {'write p99':>10}  statuses")
+    for mode in args.modes:
+        database = fresh_database()
+        env = {"DATABASE_URL": database, "WRITE_BEHIND_ENABLED": "false"}
+        if mode == "before":
+            env.update(DB_POOL_SIZE="5", DB_MAX_OVERFLOW="10")
+        users = create_users(env, args.students)
+        _seed(database, [user_id for user_id, _ in users], args.results, "DELETE" if mode == "before" else "WAL")
+        process, port = start_server(env, [sys.executable, __file__, "--serve"] if mode == "before" else None)
+        try:
+            r = asyncio.run(_measure(port, users, args.clients, args.seconds, args.write_share))
+        finally:
+            stop_server(process)
+        reads, writes = r["latencies"]["read"], r["latencies"]["write"]
+        print(
+            f"{mode:<7} {(len(reads) + len(writes)) / r['elapsed']:>6.0f} {len(reads) / r['elapsed']:>8.0f}"
+            f" {percentile(reads, 50) * 1000:>7.1f}ms {percentile(reads, 99) * 1000:>7.1f}ms"
+            f" {len(writes) / r['elapsed']:>9.0f} {percentile(writes, 50) * 1000:>8.1f}ms {percentile(writes, 99) * 1000:>8.1f}ms"
+            f"  {' '.join(f'{k}x{v}' for k, v in sorted(r['statuses'].items()))}"
+        )
+
+
+if __name__ == "__main__":
+    main()
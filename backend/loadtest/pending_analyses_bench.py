@@ -0,0 +1,122 @@
+# backend/loadtest/pending_analyses_bench.py
+"""
+Latency of /api/users/me on one worker while resume analyses are waiting on the model,
+with the async model client (app/model_client.py) and with what /api/analyze-resume
+did before: an async route calling the model SDK synchronously, which blocks the
+event loop for the whole round-trip. The model is a local stand-in with a fixed
+latency: the stub backend, or for the old route a blocking sleep of the same length.
+
+    cd backend
+    python loadtest/pending_analyses_bench.py --analyses 50 --latency-ms 1000
+
+Each run starts a fresh single-worker server, sends --analyses distinct DOCX resumes at
+once, then calls /api/users/me back to back for --window seconds (or until the
+analyses are done) and reports its p50/p99, next to an idle baseline.
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+from common import create_users, fresh_database, percentile, start_server, stop_server
+from resume_bench import _docx_bytes, make_resume
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def serve_blocking(port: int):
+    """The app, plus the old resume route: text extracted and the model called on the event loop."""
+    import io
+    import uvicorn
+    from fastapi import File, UploadFile
+    from main import app
+
+    latency = float(os.environ["LLM_STUB_LATENCY_MS"]) / 1000
+
+    @app.post("/before/analyze-resume")
+    async def analyze_resume(file: UploadFile = File(...)):
+        import docx
+
+        text = "\n".join(p.text for p in docx.Document(io.BytesIO(await file.read())).paragraphs)
+        time.sleep(latency)  # generate_content() of the synchronous SDK
+        return {"ats_score": len(text) % 100}
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+async def _measure(port: int, route: str, token: str, resumes: list, window: float) -> tuple:
+    import httpx
+
+    base = f"http://127.0.0.1:{port}"
+    headers = {"Authorization": f"Bearer {token}"}
+    limits = httpx.Limits(max_connections=len(resumes) + 10)
+    async with httpx.AsyncClient(base_url=base, timeout=600, limits=limits) as client:
+        async def probe(seconds: float, stop: asyncio.Event = None) -> list:
+            latencies = []
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline and not (stop and stop.is_set()):
+                started = time.perf_counter()
+                response = await client.get("/api/users/me", headers=headers)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+            return latencies
+
+        idle = await probe(2)
+
+        async def analyze(data: bytes) -> int:
+            response = await client.post(route, files={"file": ("resume.docx", data, DOCX_MIME)}, headers=headers)
+            return response.status_code
+
+        started = time.perf_counter()
+        analyses = asyncio.gather(*(analyze(data) for data in resumes))
+        done = asyncio.Event()
+        analyses.add_done_callback(lambda _: done.set())
+        await asyncio.sleep(0.5)  # let every upload reach the server
+        busy = await probe(window, done)
+        statuses = await analyses
+        elapsed = time.perf_counter() - started
+    return idle, busy, statuses, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--analyses", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=1000)
+    parser.add_argument("--window", type=float, default=10, help="seconds to probe /users/me while analyses are pending")
+    parser.add_argument("--modes", nargs="+", choices=["async", "blocking"], default=["async", "blocking"])
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve_blocking(args.port)
+        return
+
+    rng = random.Random(1)
+    resumes = [_docx_bytes(make_resume(rng)[1]) for _ in range(args.analyses)]
+    print(f"{args.analyses} resume analyses at once, model latency {args.latency_ms:.0f} ms, one worker")
+    print(f"{'mode':<10} {'idle p50':>9} {'idle p99':>9} {'busy p50':>9} {'busy p99':>9} {'probes':>7} {'analyses s':>11}  statuses")
+    for mode in args.modes:
+        env = {"DATABASE_URL": fresh_database(), "LLM_STUB_LATENCY_MS": str(args.latency_ms)}
+        (_, token), = create_users(env, 1)
+        blocking = mode == "blocking"
+        process, port = start_server(env, [sys.executable, __file__, "--serve"] if blocking else None)
+        route = "/before/analyze-resume" if blocking else "/api/analyze-resume"
+        try:
+            idle, busy, statuses, elapsed = asyncio.run(_measure(port, route, token, resumes, args.window))
+        finally:
+            stop_server(process)
+        counts = {}
+        for status in statuses:
+            counts[status] = counts.get(status, 0) + 1
+        print(
+            f"{mode:<10} {percentile(idle, 50) * 1000:>8.1f}ms {percentile(idle, 99) * 1000:>8.1f}ms"
+            f" {percentile(busy, 50) * 1000:>8.1f}ms {percentile(busy, 99) * 1000:>8.1f}ms {len(busy):>7}"
+            f" {elapsed:>11.1f}  {' '.join(f'{k}x{v}' for k, v in sorted(counts.items()))}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# backend/loadtest/results_bench.py
+"""
+Reading the history of a student with --results results: the keyset-paginated
+GET /api/users/results and the SQL aggregation of /api/users/results/stats against
+what the endpoint did before, every result of the user in one response (and no
+index on results), which the dashboard then aggregated itself.
+
+    cd backend
+    python loadtest/results_bench.py --results 100000 --repeat 20
+
+Each request is sent --repeat times, one at a time, to a one-worker server.
+Reported: the JSON body size, the bytes on the wire (the client accepts gzip), and
+the latency. "walk" is every page of the history with limit=--page-size, timed as
+one; "304" is the first page again with the ETag of the previous response.
+"""
+
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+from common import create_users, fresh_database, percentile, start_server, stop_server
+
+NEW_INDEXES = ["ix_results_user_category_created", "ix_results_user_created"]
+
+
+def serve_before(port: int):
+    """The app, plus the old list route: every result of the user, oldest first."""
+    import uvicorn
+    from fastapi import Depends
+    from sqlalchemy.orm import Session
+    from app import models
+    from app.auth import get_current_user, get_db
+    from app.schemas_auth import ResultsList
+    from main import app
+
+    @app.get("/before/results", response_model=ResultsList)
+    def list_results(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+        results = db.query(models.Result)\
+                    .filter(models.Result.user_id == current_user.id)\
+                    .order_by(models.Result.created_at.asc())\
+                    .all()
+        return {"results": results}
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def _seed(database: str, user_id: int, count: int, drop_indexes: bool):
+    """count results over the last two years, plus a few for another student."""
+    import sqlite3
+    from datetime import datetime, timedelta
+
+    rng = random.Random(1)
+    start = datetime(2024, 1, 1)
+    step = timedelta(days=730) / count
+    connection = sqlite3.connect(database[len("sqlite:///"):])
+    connection.executemany(
+        "INSERT INTO results (user_id, category, score, meta, created_at) VALUES (?, ?, ?, ?, ?)",
+        (
+            (
+                user_id if i % 10 else user_id + 1,
+                rng.choice(["dsa", "resume", "aptitude", "mental"]),
+                rng.randint(0, 100),
+                '{"questions": %d, "duration_s": %d}' % (rng.randint(5, 30), rng.randint(60, 3600)),
+                start + step * i,
+            )
+            for i in range(count + count // 9)
+        ),
+    )
+    if drop_indexes:
+        for name in NEW_INDEXES:
+            connection.execute(f"DROP INDEX IF EXISTS {name}")
+    connection.commit()
+    connection.close()
+
+
+async def _measure(port: int, token: str, path: str, repeat: int, page_size: int) -> dict:
+    import httpx
+
+    latencies, size, wire = [], 0, 0
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=600) as client:
+        headers = {"Authorization": f"Bearer {token}"}
+        if path == "304":
+            headers["If-None-Match"] = (await client.get("/api/users/results", headers=headers)).headers["ETag"]
+        for _ in range(repeat):
+            started = time.perf_counter()
+            if path == "walk":
+                url = f"/api/users/results?limit={page_size}"
+                while url:
+                    response = await client.get(url, headers=headers)
+                    response.raise_for_status()
+                    size += len(response.content)
+                    wire += response.num_bytes_downloaded
+                    cursor = response.json()["next_cursor"]
+                    url = cursor and f"/api/users/results?limit={page_size}&cursor={cursor}"
+            else:
+                response = await client.get("/api/users/results" if path == "304" else path, headers=headers)
+                if response.status_code not in (200, 304):
+                    response.raise_for_status()
+                size += len(response.content)
+                wire += response.num_bytes_downloaded
+            latencies.append(time.perf_counter() - started)
+    return {"size": size / repeat, "wire": wire / repeat, "latencies": latencies}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=5000, help="limit for the walk")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve_before(args.port)
+        return
+
+    since = "2025-06-01T00:00:00Z"
+    runs = [
+        ("before: all results", True, "/before/results"),
+        ("first page", False, "/api/users/results"),
+        ("dsa, last 7 months", False, f"/api/users/results?category=dsa&since={since}"),
+        ("stats, weekly", False, "/api/users/results/stats?bucket=week&window=4"),
+        ("stats, monthly dsa", False, "/api/users/results/stats?bucket=month&category=dsa"),
+        ("304 revalidation", False, "304"),
+        (f"walk, {args.page_size}/page", False, "walk"),
+    ]
+    print(f"{args.results} results for one student, {args.repeat} requests each")
+    print(f"{'request':<22} {'json':>10} {'wire':>10} {'p50':>9} {'p99':>9}")
+    servers = {}  # before -> (process, port, token); one database each
+    try:
+        for label, before, path in runs:
+            if before not in servers:
+                database = fresh_database()
+                env = {"DATABASE_URL": database}
+                (user_id, token), _ = create_users(env, 2)
+                _seed(database, user_id, args.results, drop_indexes=before)
+                process, port = start_server(env, [sys.executable, __file__, "--serve"] if before else None)
+                servers[before] = (process, port, token)
+            _, port, token = servers[before]
+            repeat = max(1, args.repeat // 4) if path == "walk" else args.repeat
+            r = asyncio.run(_measure(port, token, path, repeat, args.page_size))
+            print(
+                f"{label:<22} {r['size'] / 1e3:>8.1f}kB {r['wire'] / 1e3:>8.1f}kB"
+                f" {percentile(r['latencies'], 50) * 1000:>7.1f}ms {percentile(r['latencies'], 99) * 1000:>7.1f}ms"
+            )
+    finally:
+        for process, _, _ in servers.values():
+            stop_server(process)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# backend/loadtest/results_write_bench.py
+"""
+Results inserts per second when a whole class submits at once: one commit per request
+(write-behind off) against batched commits (app/write_behind.py). Each run gets a fresh
+SQLite database, under each SQLITE_SYNCHRONOUS level given (FULL syncs every commit to
+disk, NORMAL does not):
+
+    cd backend
+    python loadtest/results_write_bench.py --students 300 --requests 6000 --concurrency 300
+
+Two measurements:
+  * storage: the persistence path alone, in one process. --concurrency writers save
+    results as the create_result route does, with no HTTP in the way.
+  * http: POST /api/users/results against a server, per request, batched with durable
+    acknowledgement, and batched acknowledged once queued (202). After each run the
+    server is stopped, which drains the queue, and the stored rows are counted, so
+    writes that were acknowledged but then lost would show.
+Students are created directly in the database and use minted tokens, so bcrypt is not
+measured. In the http runs, client and server share the machine; compare the modes,
+not the absolute numbers.
+"""
+
+import os
+import sys
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+JWT_SECRET = "results-write-bench"
+MODES = {
+    "per-request": {"WRITE_BEHIND_ENABLED": "false"},
+    "batched": {"WRITE_BEHIND_ENABLED": "true", "WRITE_BEHIND_ACK": "durable"},
+    "batched-queued": {"WRITE_BEHIND_ENABLED": "true", "WRITE_BEHIND_ACK": "queued"},
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _python(script: str, env: dict) -> str:
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=BACKEND_DIR, env=dict(os.environ, **env), check=True, capture_output=True, text=True,
+    )
+    return output.stdout
+
+
+def _prepare(env: dict, students: int) -> list:
+    """Creates the schema and the students in a fresh process; returns their tokens."""
+    return _python(
+        "from app.db import SessionLocal, init_db\n"
+        "from app import models\n"
+        "from app.auth import create_access_token\n"
+        "init_db()\n"
+        "db = SessionLocal()\n"
+        f"users = [models.User(username=f'student{{i}}', hashed_password='x') for i in range({students})]\n"
+        "db.add_all(users)\n"
+        "db.commit()\n"
+        "for user in users:\n"
+        "    print(user.id, create_access_token({'sub': user.username, 'user_id': user.id}))\n",
+        env,
+    ).split("\n")[:-1]
+
+
+def _count_rows(env: dict) -> int:
+    return int(_python("from app.db import SessionLocal\nfrom app import models\nprint(SessionLocal().query(models.Result).count())\n", env))
+
+
+def _store(env: dict, mode: str, user_ids: list, requests: int, concurrency: int):
+    """Runs in its own process (settings are read at import): saves results as create_result does."""
+    os.environ.update(env, **MODES[mode])
+    from app.write_behind import result_write, write_behind
+
+    rng = random.Random(1)
+    latencies = []
+    remaining = iter(range(requests))
+
+    async def student():
+        for _ in remaining:
+            started = time.perf_counter()
+            await write_behind.save(result_write(rng.choice(user_ids), "practice-test", rng.randint(0, 100), None))
+            latencies.append(time.perf_counter() - started)
+
+    async def run():
+        write_behind.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(student() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        await write_behind.stop()
+        return elapsed
+
+    elapsed = asyncio.run(run())
+    latencies.sort()
+    print(requests / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1])
+
+
+def _start_server(env: dict) -> tuple:
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=dict(os.environ, LLM_BACKEND="stub", WARMUP_ON_STARTUP="false", **env),
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("the server did not start")
+
+
+async def _post(port: int, tokens: list, requests: int, concurrency: int) -> tuple:
+    import httpx
+
+    rng = random.Random(1)
+    url = f"http://127.0.0.1:{port}/api/users/results"
+    latencies, statuses = [], {}
+    remaining = iter(range(requests))
+
+    async def student(client):
+        for _ in remaining:
+            headers = {"Authorization": f"Bearer {rng.choice(tokens)}"}
+            started = time.perf_counter()
+            try:
+                response = await client.post(url, json={"category": "practice-test", "score": rng.randint(0, 100)}, headers=headers)
+                outcome = str(response.status_code)
+            except httpx.TransportError as e:
+                outcome = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[outcome] = statuses.get(outcome, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(student(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return requests / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1], statuses
+
+
+def _row(label: str, rate: float, p50: float, p99: float, statuses: str, stored: int):
+    print(f"{label:<28} {rate:>10.0f} {p50 * 1000:>8.1f} {p99 * 1000:>8.1f} {statuses:<22} {stored:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=300)
+    parser.add_argument("--requests", type=int, default=6000)
+    parser.add_argument("--concurrency", type=int, default=300)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--synchronous", nargs="+", default=["FULL", "NORMAL"], help="SQLITE_SYNCHRONOUS levels to run")
+    parser.add_argument("--sections", nargs="+", choices=["storage", "http"], default=["storage", "http"])
+    parser.add_argument("--max-batch", type=int, default=200)
+    parser.add_argument("--max-delay-ms", type=float, default=20)
+    parser.add_argument("--store", help=argparse.SUPPRESS)
+    parser.add_argument("--user-ids", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    settings = {
+        "JWT_SECRET": JWT_SECRET,
+        "WRITE_BEHIND_MAX_BATCH": str(args.max_batch),
+        "WRITE_BEHIND_MAX_DELAY_MS": str(args.max_delay_ms),
+    }
+    if args.store:
+        _store(settings, args.store, [int(i) for i in args.user_ids.split(",")], args.requests, args.concurrency)
+        return
+
+    print(f"{args.requests} results from {args.students} students, {args.concurrency} at a time")
+    print(f"{'run':<28} {'inserts/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'statuses':<22} {'stored':>7}")
+    for section in args.sections:
+        for synchronous in args.synchronous:
+            for mode in args.modes:
+                if section == "storage" and mode == "batched-queued":
+                    continue  # the same commits as "batched"; only the answer comes sooner
+                database = os.path.join(tempfile.mkdtemp(prefix="results-bench-"), "bench.db")
+                env = dict(settings, DATABASE_URL=f"sqlite:///{database}", SQLITE_SYNCHRONOUS=synchronous)
+                students = [line.split() for line in _prepare(env, args.students)]
+                label = f"{section} {synchronous} {mode}"
+                if section == "storage":
+                    output = subprocess.run(
+                        [sys.executable, __file__, "--store", mode, "--user-ids", ",".join(i for i, _ in students),
+                         "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+                         "--max-batch", str(args.max_batch), "--max-delay-ms", str(args.max_delay_ms)],
+                        cwd=BACKEND_DIR, env=dict(os.environ, **env), check=True, capture_output=True, text=True,
+                    )
+                    rate, p50, p99 = (float(value) for value in output.stdout.split())
+                    _row(label, rate, p50, p99, "", _count_rows(env))
+                    continue
+                process, port = _start_server(dict(env, **MODES[mode]))
+                try:
+                    rate, p50, p99, statuses = asyncio.run(_post(port, [t for _, t in students], args.requests, args.concurrency))
+                finally:
+                    process.terminate()
+                    process.wait()
+                _row(label, rate, p50, p99, " ".join(f"{k}x{v}" for k, v in sorted(statuses.items())), _count_rows(env))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# backend/loadtest/resume_bench.py
+"""
+Prompt size and latency of resume analysis with and without the clean-up stage
+(app/resume_text.py), over a synthetic corpus of resumes. Nothing leaves the machine:
+the model is the stub, which here charges for the prompt it reads
+(LLM_STUB_PREFILL_TOKENS_PER_SECOND) as a hosted model does.
+
+    cd backend
+    python loadtest/resume_bench.py --resumes 40 --prefill-tps 2000
+
+Each resume is generated as the text PyPDF2 returns for a typical two-page PDF: page
+headers and footers, bullet glyphs, hyphenated line wraps, column gaps, ligatures, and a
+sidebar extracted twice. A DOCX copy of each is also run through the real extraction path.
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import statistics
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+ROLES = ["Software Engineer", "Data Analyst", "Backend Developer", "Product Designer", "ML Engineer", "DevOps Engineer"]
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella Labs", "Stark Industries", "Hooli", "Wayne Fintech"]
+SKILLS = ["Python", "Go", "Java", "SQL", "PostgreSQL", "Kafka", "Kubernetes", "AWS", "Docker", "React", "TensorFlow", "Airflow"]
+BULLETS = [
+    "Led the migration of the {thing} to {tech}, cutting deployment time by {n}%",
+    "Responsible for maintaining the {thing} and coordinating releases with the platform team",
+    "Built a {thing} processing {n}M events per day with {tech}",
+    "Worked on the {thing} together with stakeholders from several departments",
+    "Reduced infrastructure costs of the {thing} by {n}% through efficient resource scheduling",
+    "Mentored {n} junior engineers and ran weekly knowledge-sharing sessions on {tech}",
+    "Participated in code reviews and helped improve the reliability of the {thing}",
+]
+THINGS = ["payments service", "recommendation pipeline", "customer analytics dashboard", "identity platform", "search backend"]
+GLYPHS = ["•", "●", "▪", "", "o", "➢"]
+
+
+def _wrap(text: str, rng: random.Random, width: int = 72) -> list:
+    """Wraps like a PDF text layer does, hyphenating some long words at the line end."""
+    lines, line = [], ""
+    for word in text.split():
+        if len(line) + len(word) + 1 > width:
+            if len(word) > 7 and rng.random() < 0.5:
+                cut = len(word) // 2
+                lines.append(f"{line} {word[:cut]}-".strip())
+                line = word[cut:]
+                continue
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}".strip()
+    return lines + [line] if line else lines
+
+
+def make_resume(rng: random.Random) -> tuple:
+    """Returns (raw PDF-style text, paragraphs for a DOCX copy)."""
+    name = rng.choice(["Jane Doe", "Arjun Mehta", "Li Wei", "Maria Garcia", "Sam Okafor"])
+    role = rng.choice(ROLES)
+    skills = ", ".join(rng.sample(SKILLS, 7))
+    paragraphs = [
+        f"{name.upper()} · {role}",
+        f"{name.split()[0].lower()}@example.com | +91 98765 43210 | linkedin.com/in/{name.split()[0].lower()}",
+        "PROFESSIONAL SUMMARY",
+        f"{role} with {rng.randint(2, 9)} years of experience designing, building and operating data-intensive "
+        f"systems. Comfortable owning features end to end, from the initial specification through to production efﬁciency work.",
+        "WORK EXPERIENCE",
+    ]
+    for _ in range(rng.randint(2, 4)):
+        paragraphs.append(f"{rng.choice(COMPANIES)} — {rng.choice(ROLES)}            {rng.randint(2012, 2020)} – {rng.choice(['Present', '2023', '2021'])}")
+        for template in rng.sample(BULLETS, rng.randint(3, 5)):
+            paragraphs.append("• " + template.format(thing=rng.choice(THINGS), tech=rng.choice(SKILLS), n=rng.randint(2, 60)))
+    paragraphs += [
+        "PROJECTS",
+        f"Open-source contributor to a {rng.choice(THINGS)} written in {rng.choice(SKILLS)}, used by several teams.",
+        "EDUCATION",
+        f"B.Tech in Computer Science, National Institute of Technology     {rng.randint(2008, 2016)}",
+        "TECHNICAL SKILLS",
+        skills,
+    ]
+
+    lines = []
+    glyph = rng.choice(GLYPHS)
+    for paragraph in paragraphs:
+        if paragraph.startswith("• "):
+            wrapped = _wrap(paragraph[2:], rng)
+            lines.append(f"{glyph}  {wrapped[0]}")
+            lines += ["   " + rest for rest in wrapped[1:]]
+        else:
+            lines += _wrap(paragraph, rng, 90)
+    # A sidebar (skills) that the text layer returns again next to the main column.
+    if rng.random() < 0.7:
+        at = next(i for i in range(len(lines) // 3, len(lines)) if lines[i].startswith(glyph))
+        lines[at:at] = ["TECHNICAL SKILLS", skills]
+    pages = [lines[: len(lines) // 2], lines[len(lines) // 2:]]
+    raw_pages = []
+    for number, page in enumerate(pages, start=1):
+        header = f"{name.upper()} · {role}{' ' * 30}Page {number} of {len(pages)}"
+        footer = f"{name} — Resume{' ' * 40}{number}"
+        raw_pages.append("\n".join([header] + [line.replace(" ", "  ") if rng.random() < 0.2 else line for line in page] + [footer]))
+    return "\f".join(raw_pages), paragraphs
+
+
+def _docx_bytes(paragraphs: list) -> bytes:
+    import io
+    import docx
+
+    document = docx.Document()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+async def _timed_analysis(text: str) -> float:
+    from app.services import generate_ai_response
+
+    started = time.perf_counter()
+    await generate_ai_response("resume", text)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resumes", type=int, default=40)
+    parser.add_argument("--prefill-tps", type=float, default=2000, help="prompt tokens per second the stub model reads")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+    os.environ["LLM_BACKEND"] = "stub"
+    os.environ["LLM_STUB_LATENCY_DIST"] = "fixed"
+    os.environ["LLM_STUB_PREFILL_TOKENS_PER_SECOND"] = str(args.prefill_tps)
+    os.environ["RESPONSE_CACHE_DISABLED"] = "resume,mental_health"
+    os.chdir(BACKEND_DIR)
+    from app.llm import estimate_tokens
+    from app.prompts import prompt_registry
+    from app.resume_text import normalize_resume_text
+    from app.extraction import DOCX_MIME, extract_resume_text, prepare_resume_text
+    from app.services import render_prompt
+    prompt_registry.load()
+
+    rng = random.Random(args.seed)
+    corpus = [make_resume(rng) for _ in range(args.resumes)]
+    raw_tokens, clean_tokens, normalize_ms, docx_ratio = [], [], [], []
+    for raw, paragraphs in corpus:
+        started = time.perf_counter()
+        clean = normalize_resume_text(raw)
+        normalize_ms.append((time.perf_counter() - started) * 1000)
+        raw_tokens.append(estimate_tokens(raw))
+        clean_tokens.append(estimate_tokens(clean))
+        data = _docx_bytes(paragraphs)
+        docx_ratio.append(estimate_tokens(prepare_resume_text(DOCX_MIME, data)) / estimate_tokens(extract_resume_text(DOCX_MIME, data)))
+
+    print(f"{len(corpus)} resumes (PDF-style text)")
+    print(f"  resume tokens: raw median {statistics.median(raw_tokens):.0f}, cleaned median {statistics.median(clean_tokens):.0f} "
+          f"({1 - sum(clean_tokens) / sum(raw_tokens):.0%} fewer in total)")
+    template = prompt_registry.get("resume")
+    raw_prompt = statistics.median(estimate_tokens(render_prompt(template, "resume", raw)) for raw, _ in corpus)
+    clean_prompt = statistics.median(
+        estimate_tokens(render_prompt(template, "resume", normalize_resume_text(raw))) for raw, _ in corpus
+    )
+    print(f"  whole prompt tokens: raw median {raw_prompt:.0f}, cleaned with ATS hints median {clean_prompt:.0f}")
+    print(f"  clean-up time: median {statistics.median(normalize_ms):.2f} ms, max {max(normalize_ms):.2f} ms")
+    print(f"  DOCX copies: cleaned text is {statistics.median(docx_ratio):.0%} of the raw extraction (median)")
+
+    async def run():
+        raw_s = [await _timed_analysis(raw) for raw, _ in corpus]
+        clean_s = [await _timed_analysis(normalize_resume_text(raw)) for raw, _ in corpus]
+        return raw_s, clean_s
+
+    raw_s, clean_s = asyncio.run(run())
+    print(f"end to end with the stub at {args.prefill_tps:.0f} prompt tokens/s:")
+    print(f"  raw text:     median {statistics.median(raw_s) * 1000:.0f} ms")
+    print(f"  cleaned text: median {statistics.median(clean_s) * 1000:.0f} ms (ATS hints included)")
+
+
+if __name__ == "__main__":
+    main()
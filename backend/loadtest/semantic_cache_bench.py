@@ -0,0 +1,143 @@
+# backend/loadtest/semantic_cache_bench.py
+"""
+Offline benchmark of the semantic cache: how often a reworded question is answered from
+the cache, how often a different question is wrongly answered from it, and how long a
+lookup takes. Needs nothing but numpy; no server or model is involved.
+
+    cd backend
+    python loadtest/semantic_cache_bench.py --thresholds 0.6 0.7 0.75 0.8 --entries 2000
+
+The corpus is synthetic: families of questions that mean the same thing, each worded
+several ways and wrapped in the openers and sign-offs students type. The first wording
+of each family is stored, and every other wording should hit it. Questions from families
+that were never stored should miss. Pick the threshold where false hits are ~0.
+"""
+
+import os
+import sys
+import random
+import argparse
+import statistics
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.semantic_cache import SEMANTIC_CACHE_THRESHOLD, SemanticCache  # noqa: E402
+
+# Each family lists wordings of one question; the first is the one stored.
+FAMILIES = [
+    ["tell me about yourself", "how do I answer tell me about yourself", "how should I answer the tell me about yourself question", "tell me about yourself answer"],
+    ["how do I prepare for DSA rounds", "how to prepare for DSA rounds", "best way to prepare for DSA interview rounds", "how should I prepare for the DSA round"],
+    ["what are your strengths and weaknesses", "how do I answer what are your strengths and weaknesses", "how to talk about strengths and weaknesses", "strengths and weaknesses question"],
+    ["why do you want to work here", "how do I answer why do you want to work here", "how to answer why you want to work here", "why do you want to work at this company"],
+    ["how do I negotiate my salary offer", "how to negotiate a salary offer", "tips to negotiate my salary offer", "how should I negotiate the salary in my offer"],
+    ["how do I prepare for a system design interview", "how to prepare for system design interviews", "system design interview preparation", "best way to prepare for a system design interview"],
+    ["where do you see yourself in five years", "how do I answer where do you see yourself in five years", "where do you see yourself in 5 years", "answer for where do you see yourself in five years"],
+    ["how do I explain a gap in my resume", "how to explain a resume gap", "explaining a gap in my resume in interviews", "how should I explain the gap in my resume"],
+    ["what questions should I ask the interviewer", "which questions should I ask the interviewer", "good questions to ask the interviewer", "questions to ask the interviewer at the end"],
+    ["how do I answer behavioral questions with STAR", "how to use the STAR method for behavioral questions", "STAR method for behavioral interview questions", "answering behavioral questions using STAR"],
+    ["how do I handle a question I do not know", "what if I do not know the answer to a question", "how to handle a question I cannot answer", "what should I do when I do not know the answer in an interview"],
+    ["how should I follow up after an interview", "how to follow up after an interview", "follow up email after an interview", "should I send a follow up after the interview"],
+]
+# Never stored: every lookup of these should miss.
+DISTRACTORS = [
+    "how do I prepare for a product manager case interview",
+    "what is the difference between a process and a thread",
+    "how do I reverse a linked list",
+    "how do I answer why are you leaving your current job",
+    "how do I prepare for a data science take home assignment",
+    "what salary should I ask for as a fresher",
+    "how long should my resume be",
+    "how do I write a cover letter",
+    "what should I wear to an interview",
+    "how do I prepare for an HR round",
+    "how do I answer what is your greatest achievement",
+    "explain time complexity of binary search",
+]
+OPENERS = ["", "", "hi, ", "hey coach ", "quick question: ", "Hello! "]
+CLOSERS = ["", "", "?", " please", "??", ". thanks"]
+
+
+def _wrap(rng: random.Random, text: str) -> str:
+    text = rng.choice(OPENERS) + text + rng.choice(CLOSERS)
+    return text.capitalize() if rng.random() < 0.5 else text
+
+
+def _filler_question(rng: random.Random, i: int) -> str:
+    words = ["project", "team", "deadline", "python", "java", "sql", "cloud", "startup", "manager", "intern",
+             "exam", "campus", "placement", "offer", "fintech", "design", "testing", "api", "frontend", "backend"]
+    return f"question {i} about " + " ".join(rng.sample(words, 5))
+
+
+def evaluate(threshold: float, filler_entries: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    cache = SemanticCache(threshold, max_entries=filler_entries + len(FAMILIES) + 10, ttl_seconds=3600, prompts=["interview"])
+    namespace = "bench"
+    # Unrelated entries make the index the size it would be in production.
+    for i in range(filler_entries):
+        cache.set(namespace, _filler_question(rng, i), f"filler {i}", 0.0)
+    for family, wordings in enumerate(FAMILIES):
+        cache.set(namespace, wordings[0], family, 3.0)
+
+    same = correct = wrong_family = 0
+    for _ in range(5):
+        for family, wordings in enumerate(FAMILIES):
+            for wording in wordings[1:]:
+                same += 1
+                value = cache.get("interview", namespace, _wrap(rng, wording))
+                if value == family:
+                    correct += 1
+                elif value is not None:
+                    wrong_family += 1
+    false_hits = sum(
+        cache.get("interview", namespace, _wrap(rng, question)) is not None
+        for _ in range(5) for question in DISTRACTORS
+    )
+    hits = correct + wrong_family + false_hits
+    return {
+        "threshold": threshold,
+        "recall": correct / same,
+        "precision": correct / hits if hits else 1.0,
+        "false_hit_rate": false_hits / (5 * len(DISTRACTORS)),
+        "hit_rate": (correct + wrong_family + false_hits) / (same + 5 * len(DISTRACTORS)),
+    }
+
+
+def lookup_latency(entries: int, seed: int, lookups: int = 2000) -> dict:
+    rng = random.Random(seed)
+    cache = SemanticCache(SEMANTIC_CACHE_THRESHOLD, max_entries=entries, ttl_seconds=3600, prompts=["interview"])
+    for i in range(entries):
+        cache.set("bench", _filler_question(rng, i), i, 0.0)
+    questions = [_wrap(rng, rng.choice(rng.choice(FAMILIES))) for _ in range(lookups)]
+    timings = []
+    for question in questions:
+        started = time.perf_counter()
+        cache.get("interview", "bench", question)
+        timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+    return {
+        "p50_us": statistics.median(timings),
+        "p99_us": timings[int(len(timings) * 0.99) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.6, 0.7, 0.75, 0.8, 0.9])
+    parser.add_argument("--entries", type=int, default=2000, help="entries in the index while measuring")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'threshold':>9}  {'recall':>6}  {'precision':>9}  {'false hits':>10}  {'hit rate':>8}")
+    for threshold in args.thresholds:
+        result = evaluate(threshold, args.entries, args.seed)
+        print(
+            f"{result['threshold']:>9.2f}  {result['recall']:>6.1%}  {result['precision']:>9.1%}  "
+            f"{result['false_hit_rate']:>10.1%}  {result['hit_rate']:>8.1%}"
+        )
+    latency = lookup_latency(args.entries, args.seed)
+    print(f"lookup latency with {args.entries} entries: p50 {latency['p50_us']:.0f} us, p99 {latency['p99_us']:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
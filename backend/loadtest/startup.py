@@ -0,0 +1,76 @@
+# backend/loadtest/startup.py
+"""
+Startup benchmark and regression check. Imports the app in fresh interpreters with
+`python -X importtime`, reports the slowest imports, and fails (exit status 1) if any
+dependency that is meant to load lazily was imported, or if the median import time is
+over the target. Importing the app is all a worker does before it can serve auth and
+results requests, so this is the boot time of that path.
+
+    cd backend
+    python loadtest/startup.py --runs 5 --max-ms 1500
+
+Run it on the same machine before and after a change; absolute times vary by host.
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use (or by the warm-up), never while the app is imported.
+LAZY_MODULES = ("docx", "PyPDF2", "google.generativeai", "concurrent.futures.process", "redis", "pyinstrument", "numpy")
+
+
+def import_once() -> dict:
+    """Imports main in a fresh interpreter and returns {module: (self_us, cumulative_us)}."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    env.setdefault("DATABASE_URL", "sqlite:///:memory:")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"Importing the app failed:\n{result.stderr[-2000:]}")
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if self_us.isdigit():
+            modules[name] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=1500, help="target median import time of the app")
+    parser.add_argument("--top", type=int, default=15, help="how many of the slowest imports to list")
+    args = parser.parse_args()
+
+    runs = [import_once() for _ in range(args.runs)]
+    totals_ms = [run["main"][1] / 1000 for run in runs]
+    median_ms = statistics.median(totals_ms)
+    last = runs[-1]
+
+    print(f"import main: median {median_ms:.0f} ms over {args.runs} runs (min {min(totals_ms):.0f}, max {max(totals_ms):.0f})")
+    print("slowest imports by own time (last run):")
+    for name, (self_us, cumulative_us) in sorted(last.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms self  {cumulative_us / 1000:8.1f} ms total  {name}")
+
+    failures = []
+    eager = [name for name in LAZY_MODULES if name in last]
+    if eager:
+        failures.append(f"imported eagerly: {', '.join(eager)}")
+    if median_ms > args.max_ms:
+        failures.append(f"median import time {median_ms:.0f} ms is over the {args.max_ms:.0f} ms target")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
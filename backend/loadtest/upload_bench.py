@@ -0,0 +1,168 @@
+# backend/loadtest/upload_bench.py
+"""
+Peak server memory and time to response for large resume uploads under concurrent
+load: the streaming ingestion of app/uploads.py against what /api/analyze-resume did
+before (Starlette's spooled UploadFile, then the whole file read into memory, twice).
+Linux only (peak RSS is read from /proc). Each run starts its own server:
+
+    cd backend
+    python loadtest/upload_bench.py --sizes-mb 10 25 50 100 --concurrency 8
+
+Only ingestion is measured: the server reads, checks and hashes the upload and
+answers, with no extraction or model call. Uploads are fake PDFs (a PDF header and
+random bytes). With the default RESUME_MAX_UPLOAD_BYTES (10 MiB) the 10 MB uploads
+are accepted and the bigger ones rejected. Each size is sent with a Content-Length
+(as browsers send forms) and chunked without one, where the limit can only be
+enforced by counting.
+"""
+
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+BOUNDARY = "benchboundary7d1c"
+CHUNK = 256 * 1024
+
+
+def serve(mode: str, port: int):
+    import hashlib
+    import uvicorn
+    from fastapi import FastAPI, File, Request, UploadFile
+
+    app = FastAPI()
+    if mode == "spooled":
+        @app.post("/upload")
+        async def spooled(file: UploadFile = File(...)):
+            # The previous handler: read for the cache key, then seek back and read again to extract.
+            data = await file.read()
+            digest = hashlib.sha256(data).hexdigest()
+            await file.seek(0)
+            data = await file.read()
+            return {"bytes": len(data), "sha256": digest}
+    else:
+        from app.uploads import read_resume_upload
+
+        @app.post("/upload")
+        async def streaming(request: Request):
+            upload = await read_resume_upload(request)
+            try:
+                return {"bytes": upload.size, "sha256": upload.sha256.hex()}
+            finally:
+                upload.close()
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def _rss_kib(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                name, value = line.split(":")
+                values[name] = int(value.split()[0])
+    return values
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(mode: str) -> tuple:
+    port = _free_port()
+    process = subprocess.Popen([sys.executable, __file__, "--serve", mode, "--port", str(port)], cwd=BACKEND_DIR)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"the {mode} server did not start")
+
+
+async def _upload(client, url: str, size: int, block: bytes, with_length: bool) -> tuple:
+    head = (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.pdf\"\r\n"
+        f"Content-Type: application/pdf\r\n\r\n"
+    ).encode() + b"%PDF-1.7\n"
+    tail = f"\r\n--{BOUNDARY}--\r\n".encode()
+
+    async def body():
+        yield head
+        sent = len(b"%PDF-1.7\n")
+        while sent < size:
+            piece = block[: min(len(block), size - sent)]
+            sent += len(piece)
+            yield piece
+        yield tail
+
+    headers = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+    if with_length:
+        headers["Content-Length"] = str(len(head) + size - len(b"%PDF-1.7\n") + len(tail))
+    started = time.perf_counter()
+    try:
+        response = await client.post(url, content=body(), headers=headers)
+        outcome = str(response.status_code)
+    except Exception:
+        # The server answered and closed the connection while the body was still being sent.
+        outcome = "closed"
+    return outcome, time.perf_counter() - started
+
+
+async def _run(port: int, size: int, concurrency: int, with_length: bool) -> list:
+    import httpx
+
+    block = os.urandom(CHUNK)
+    async with httpx.AsyncClient(timeout=300) as client:
+        return await asyncio.gather(*(
+            _upload(client, f"http://127.0.0.1:{port}/upload", size, block, with_length) for _ in range(concurrency)
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[10, 25, 50, 100])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--serve", choices=["spooled", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    print(f"{args.concurrency} concurrent uploads per run")
+    print(f"{'mode':<10} {'size':>6} {'body':<8} {'outcomes':<18} {'p50 s':>7} {'max s':>7} {'peak RSS +MiB':>14}")
+    for size_mb in args.sizes_mb:
+        for mode in ("spooled", "streaming"):
+            for with_length in (True, False):
+                process, port = _start_server(mode)
+                try:
+                    idle = _rss_kib(process.pid)["VmRSS"]
+                    results = asyncio.run(_run(port, size_mb * 1024 * 1024, args.concurrency, with_length))
+                    peak = _rss_kib(process.pid)["VmHWM"]
+                finally:
+                    process.terminate()
+                    process.wait()
+                outcomes = {}
+                for outcome, _ in results:
+                    outcomes[outcome] = outcomes.get(outcome, 0) + 1
+                seconds = [elapsed for _, elapsed in results]
+                print(
+                    f"{mode:<10} {size_mb:>4}MB {'length' if with_length else 'chunked':<8} "
+                    f"{' '.join(f'{k}x{v}' for k, v in sorted(outcomes.items())):<18} "
+                    f"{statistics.median(seconds):>7.3f} {max(seconds):>7.3f} {(peak - idle) / 1024:>14.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
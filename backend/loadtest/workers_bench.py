@@ -0,0 +1,167 @@
+# backend/loadtest/workers_bench.py
+"""
+Startup time and throughput of `uvicorn --workers N` with shared state
+(STATE_BACKEND=sqlite), for several N.
+
+    cd backend
+    python loadtest/workers_bench.py --workers 1 2 4 --clients 32 --seconds 15
+
+startup: from launching uvicorn to every worker having finished its lifespan startup
+("Application startup complete" in the log), and to the first answered request. It is
+timed on a fresh database, which the workers migrate in turn under the migration lock
+(DB_AUTO_MIGRATE on), and on one migrated beforehand with `python -m app.migrations`
+(DB_AUTO_MIGRATE=false, as the README recommends for several workers).
+
+throughput: --clients clients for --seconds against a migrated database, after a short
+warm-up, sending a mix of requests: 70% GET /api/users/me, 20% GET /api/users/results,
+10% POST /api/generate-todo with a new text each time (the stub model answers after
+--latency-ms and streams its reply at 80 tokens/s). Reported: requests per second, the
+latency of the reads and of the generations apart, and errors.
+The machine's CPU count is printed first: workers only add throughput up to it.
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+import tempfile
+
+from common import (
+    BACKEND_DIR, SERVER_ENV, create_users, free_port, fresh_database, percentile, stop_server,
+)
+
+
+def _uvicorn(workers: int) -> list:
+    return [sys.executable, "-m", "uvicorn", "main:app", "--workers", str(workers)]
+
+
+def _serve(workers: int, env: dict) -> tuple:
+    """
+    Starts uvicorn with workers workers and waits until every one of them has started.
+    Returns (process, port, seconds until all started, seconds until the first answered
+    request). The port accepts connections as soon as the parent binds it, before any
+    worker is ready, so start_server's wait is not enough here.
+    """
+    import httpx
+
+    port = free_port()
+    log_path = os.path.join(tempfile.mkdtemp(prefix="loadtest-"), "server.log")
+    started = time.perf_counter()
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(
+            _uvicorn(workers) + ["--log-level", "info", "--port", str(port)], cwd=BACKEND_DIR,
+            env=dict(os.environ, **SERVER_ENV, **env), stdout=log, stderr=subprocess.STDOUT,
+        )
+    first_response = all_started = None
+    while all_started is None or first_response is None:
+        if process.poll() is not None or time.perf_counter() - started > 120:
+            stop_server(process)
+            raise RuntimeError(f"the server did not start; see {log_path}")
+        if first_response is None:
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/api/users/me", timeout=0.5)
+                first_response = time.perf_counter() - started
+            except httpx.TransportError:
+                pass
+        if all_started is None:
+            with open(log_path, encoding="utf-8", errors="replace") as log:
+                if log.read().count("Application startup complete") >= workers:
+                    all_started = time.perf_counter() - started
+        time.sleep(0.02)
+    return process, port, all_started, first_response
+
+
+def _startup(workers: int, env: dict) -> tuple:
+    """(seconds until every worker started, seconds until the first answered request)."""
+    process, _, all_started, first_response = _serve(workers, env)
+    stop_server(process)
+    return all_started, first_response
+
+
+def _env(database: str, **settings) -> dict:
+    """Settings for a server on database, with its shared state in a file beside it."""
+    return dict(settings, DATABASE_URL=database, STATE_BACKEND="sqlite", STATE_SQLITE_PATH=database[len("sqlite:///"):] + ".state")
+
+
+def _migrated_database() -> str:
+    database = fresh_database()
+    subprocess.run(
+        [sys.executable, "-m", "app.migrations"], cwd=BACKEND_DIR, check=True, capture_output=True,
+        env=dict(os.environ, **SERVER_ENV, DATABASE_URL=database),
+    )
+    return database
+
+
+async def _throughput(port: int, tokens: list, clients: int, seconds: float) -> dict:
+    import httpx
+
+    rng = random.Random(1)
+    latencies, errors = {"read": [], "generate": []}, 0
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits) as client:
+        async def user(deadline: float, record: bool):
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                headers = {"Authorization": f"Bearer {rng.choice(tokens)}"}
+                roll = rng.random()
+                started = time.perf_counter()
+                kind = "read" if roll < 0.9 else "generate"
+                if roll < 0.7:
+                    response = await client.get("/api/users/me", headers=headers)
+                elif roll < 0.9:
+                    response = await client.get("/api/users/results?limit=20", headers=headers)
+                else:
+                    text = f"Revise graphs and DP for the test on day {rng.randrange(10 ** 9)}."
+                    response = await client.post("/api/generate-todo", json={"text": text}, headers=headers)
+                if record:
+                    latencies[kind].append(time.perf_counter() - started)
+                    errors += response.status_code != 200
+
+        await asyncio.gather(*(user(time.perf_counter() + 2, False) for _ in range(clients)))
+        started = time.perf_counter()
+        await asyncio.gather(*(user(started + seconds, True) for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+    return {"rate": sum(map(len, latencies.values())) / elapsed, "latencies": latencies, "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--sections", nargs="+", choices=["startup", "throughput"], default=["startup", "throughput"])
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU(s)")
+    if "startup" in args.sections:
+        print(f"{'startup':<10} {'fresh db: all up':>17} {'first reply':>12} {'migrated: all up':>17} {'first reply':>12}")
+        for workers in args.workers:
+            fresh = _startup(workers, _env(fresh_database()))
+            migrated = _startup(workers, _env(_migrated_database(), DB_AUTO_MIGRATE="false"))
+            print(f"{workers:>2} worker(s) {fresh[0]:>15.2f}s {fresh[1]:>11.2f}s {migrated[0]:>16.2f}s {migrated[1]:>11.2f}s")
+
+    if "throughput" in args.sections:
+        print(f"{'throughput':<10} {'req/s':>8} {'read p50':>9} {'read p99':>9} {'gen p50':>9} {'gen p99':>9} {'errors':>7}"
+              f"   ({args.clients} clients, {args.seconds:.0f} s)")
+        for workers in args.workers:
+            database = _migrated_database()
+            env = _env(database, DB_AUTO_MIGRATE="false", LLM_STUB_LATENCY_MS=str(args.latency_ms))
+            tokens = [token for _, token in create_users(env, args.users)]
+            process, port, _, _ = _serve(workers, env)
+            try:
+                r = asyncio.run(_throughput(port, tokens, args.clients, args.seconds))
+            finally:
+                stop_server(process)
+            line = "".join(
+                f" {percentile(r['latencies'][kind], q) * 1000:>7.0f}ms" for kind in ("read", "generate") for q in (50, 99)
+            )
+            print(f"{workers:>2} worker(s) {r['rate']:>7.0f}{line} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,26 +2,32 @@
 # This is the SINGLE and ONLY entry point for your application.
 
 import os
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from dotenv import load_dotenv
 
-# --- FIX: Moved init_db to a more direct import path ---
-# This allows us to call it before the app is fully configured.
-from app.db import init_db 
-
-# Load environment variables FIRST, before anything else.
+# Load environment variables FIRST: the app modules read their settings at import time.
 load_dotenv()
 
-# --- FIX: Call init_db() here, at the top level ---
-# This creates the database file and all the tables BEFORE the FastAPI app
-# starts importing routers that depend on those tables. This solves the "no such table" error.
-init_db()
-
-# --- Now, we can safely import the rest of our application modules ---
+from app.db import DB_AUTO_MIGRATE, init_db, dispose_engines
 from app.routers import users
+from app.routers import batch
 from app.api import router as api_router
+from app.prompts import prompt_registry
+from app.services import WARMUP_ON_STARTUP, shutdown_extraction_pool, warm_up
+from app.llm import get_llm_backend
+from app.auth import password_pool
+from app.batch import batch_runner
+from app.usage import usage_ledger
+from app.write_behind import write_behind
+from app.shared_state import shared_state
+from app.lifecycle import stream_drain
+from app.metrics import MetricsMiddleware, router as metrics_router
+from starlette.concurrency import run_in_threadpool
 
 # --- Logging Configuration ---
 logging.basicConfig(
@@ -31,46 +37,97 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# --- FastAPI App Initialization ---
-app = FastAPI(
-    title="AI Assistant Suite API",
-    description="An API for AI-powered career and wellness tools."
-)
+# How long browsers may reuse a CORS preflight answer (most cap it at 2 hours).
+CORS_MAX_AGE = int(os.getenv("CORS_MAX_AGE", "7200"))
+# Responses at least this big are gzip-compressed for clients that accept it. Smaller
+# ones are not worth the CPU. Streams (text/event-stream) are never compressed.
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
 
-# --- CORS Middleware ---
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
-# --- ROUTER CONFIGURATION ---
-app.include_router(api_router, prefix="/api", tags=["AI Services"])
-app.include_router(users.router, prefix="/api", tags=["Authentication"])
-app.include_router(users.user_router, prefix="/api", tags=["Users"])
-
-
-# --- Application Lifecycle Events ---
-@app.on_event("startup")
-async def startup_event():
-    # Configure Google Gemini API
-    import google.generativeai as genai
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        logger.error("FATAL: GEMINI_API_KEY environment variable not found.")
-        raise RuntimeError("GEMINI_API_KEY is not set. The application cannot start.")
+# --- Application Lifecycle ---
+# Runs once per worker process. Nothing touches the database, the model or the shared
+# state at import time, so importing the app (or forking workers from it) is cheap.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema changes run here rather than at import. With several workers they take
+    # turns under a lock; with DB_AUTO_MIGRATE off, `python -m app.migrations` does it.
+    if DB_AUTO_MIGRATE:
+        await run_in_threadpool(init_db)
+
+    # Check the model backend's configuration (for Gemini, GEMINI_API_KEY) so a
+    # misconfigured deployment fails at startup rather than on the first request.
     try:
-        genai.configure(api_key=api_key)
-        logger.info("Gemini API configured successfully.")
-    except Exception as exc:
-        logger.exception("Failed to configure Gemini API during startup.")
+        get_llm_backend().check()
+    except Exception:
+        logger.exception("FATAL: the model backend could not be configured.")
         raise
-    
-    # NOTE: The init_db() call has been moved out of the startup event.
+
+    # Load every prompt template now so a missing or broken file stops startup
+    # instead of failing the first request that needs it.
+    prompt_registry.load()
+    if shared_state is not None:
+        await run_in_threadpool(shared_state.check)
+        logger.info(f"Sharing rate limits and the response cache through {shared_state.name}.")
+    batch_runner.start_recovery()
+    usage_ledger.start()
+    write_behind.start()
+    stream_drain.install_signal_handlers()
+    # Runs once the worker is accepting requests; until it has finished, the first
+    # request that needs a heavy dependency loads it itself.
+    warmup_task = asyncio.create_task(warm_up()) if WARMUP_ON_STARTUP else None
     logger.info("Application startup complete.")
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("Application shutdown.")
\ No newline at end of file
+    yield
+
+    if warmup_task is not None:
+        warmup_task.cancel()
+    await stream_drain.start()
+    await batch_runner.shutdown()
+    # After the streams and jobs have stopped, so the usage they recorded is written.
+    await usage_ledger.stop()
+    # Commits the queued results and conversations before the engines go away.
+    await write_behind.stop()
+    shutdown_extraction_pool()
+    password_pool.shutdown()
+    if shared_state is not None:
+        shared_state.close()
+    await dispose_engines()
+    logger.info("Application shutdown.")
+
+
+def create_app() -> FastAPI:
+    # --- FastAPI App Initialization ---
+    app = FastAPI(
+        title="AI Assistant Suite API",
+        description="An API for AI-powered career and wellness tools.",
+        lifespan=lifespan,
+    )
+
+    # --- CORS Middleware ---
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        max_age=CORS_MAX_AGE,
+    )
+
+    # --- Compression Middleware ---
+    app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_LEVEL)
+
+    # --- Metrics Middleware ---
+    # Added last so it is outermost and times the whole request, CORS included.
+    app.add_middleware(MetricsMiddleware)
+
+    # --- ROUTER CONFIGURATION ---
+    app.include_router(api_router, prefix="/api", tags=["AI Services"])
+    app.include_router(users.router, prefix="/api", tags=["Authentication"])
+    app.include_router(users.user_router, prefix="/api", tags=["Users"])
+    app.include_router(batch.router, prefix="/api", tags=["Batch"])
+    app.include_router(metrics_router)
+    return app
+
+
+app = create_app()
@@ -0,0 +1,36 @@
+# backend/tests/conftest.py
+import os
+import sys
+import tempfile
+
+# The app reads its settings at import time: point it at a throwaway database and the stub model.
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='studai-tests-')}/test.db")
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("LLM_STUB_LATENCY_MS", "0")
+os.environ.setdefault("WARMUP_ON_STARTUP", "false")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth_headers(client):
+    """A freshly registered user's bearer token."""
+    import uuid
+
+    username = f"user-{uuid.uuid4().hex[:12]}"
+    client.post("/api/auth/register", json={"username": username, "password": "secret123"})
+    token = client.post("/api/auth/login", json={"username": username, "password": "secret123"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
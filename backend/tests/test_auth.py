@@ -0,0 +1,50 @@
+# backend/tests/test_auth.py
+import uuid
+
+from sqlalchemy import text
+
+from app import auth, models
+from app.db import SessionLocal, engine
+from app.shared_state import SQLiteState
+
+
+def _new_user() -> tuple:
+    db = SessionLocal()
+    try:
+        user = models.User(username=f"user-{uuid.uuid4().hex[:12]}", hashed_password="x")
+        db.add(user)
+        db.commit()
+        return user.id, auth.create_access_token({"sub": user.username, "user_id": user.id})
+    finally:
+        db.close()
+
+
+def test_a_change_in_another_worker_drops_the_cached_user(client, monkeypatch, tmp_path):
+    state = SQLiteState(str(tmp_path / "state.db"))
+    monkeypatch.setattr(auth, "shared_state", state)
+    user_id, token = _new_user()
+    assert auth.get_current_user(token).semantic_cache_enabled is True
+
+    # Another worker commits a change (no ORM event fires here) and bumps the version.
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE users SET semantic_cache_enabled = 0 WHERE id = :id"), {"id": user_id})
+    state.incr(f"user-version:{user_id}", 1, 60)
+
+    assert auth.get_current_user(token).semantic_cache_enabled is False
+
+
+def test_committing_a_user_change_bumps_the_shared_version(client, monkeypatch, tmp_path):
+    state = SQLiteState(str(tmp_path / "state.db"))
+    monkeypatch.setattr(auth, "shared_state", state)
+    user_id, _ = _new_user()
+
+    db = SessionLocal()
+    try:
+        db.get(models.User, user_id).semantic_cache_enabled = False
+        db.flush()
+        assert state.counter(f"user-version:{user_id}") == 0
+        db.commit()
+    finally:
+        db.close()
+
+    assert state.counter(f"user-version:{user_id}") == 1
@@ -0,0 +1,89 @@
+# backend/tests/test_batch.py
+import io
+import time
+import asyncio
+import zipfile
+
+import pytest
+
+from app import batch, models
+from app.db import SessionLocal
+from app.routers import batch as batch_routes
+
+
+def _job_with_one_item() -> tuple:
+    job_id = batch.create_job("todo", None, [("item-1", None, b"study for the exam")])
+    db = SessionLocal()
+    try:
+        item_id = db.query(models.BatchItem.id).filter(models.BatchItem.job_id == job_id).scalar()
+    finally:
+        db.close()
+    return job_id, item_id
+
+
+def _take_over(job_id: str):
+    db = SessionLocal()
+    try:
+        db.query(models.BatchJob).filter(models.BatchJob.id == job_id).update({"worker_id": "another-worker"})
+        db.commit()
+    finally:
+        db.close()
+
+
+def _state(job_id: str) -> tuple:
+    db = SessionLocal()
+    try:
+        job = db.query(models.BatchJob).filter(models.BatchJob.id == job_id).one()
+        item = db.query(models.BatchItem).filter(models.BatchItem.job_id == job_id).one()
+        return job.status, item.status
+    finally:
+        db.close()
+
+
+def test_lost_job_does_not_write_item_results(client):
+    job_id, item_id = _job_with_one_item()
+    _take_over(job_id)
+
+    with pytest.raises(batch.JobLostError):
+        batch._record_attempt(item_id, job_id, "done", 1, result={"tasks": []})
+
+    assert _state(job_id) == ("queued", "pending")
+
+
+def test_heartbeat_stops_a_job_taken_over_by_another_worker(client, monkeypatch):
+    job_id, _ = _job_with_one_item()
+    monkeypatch.setattr(batch, "BATCH_HEARTBEAT_SECONDS", 0.05)
+
+    async def slow_item(*args):
+        _take_over(job_id)
+        await asyncio.sleep(5)
+        return {"tasks": []}
+
+    monkeypatch.setattr(batch, "_process_item", slow_item)
+    started = time.perf_counter()
+    asyncio.run(batch.BatchRunner(1)._run_job(job_id, "todo"))
+
+    assert time.perf_counter() - started < 2
+    assert _state(job_id) == ("running", "pending")
+
+
+def test_zip_unpacking_past_the_batch_budget_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(batch_routes, "BATCH_MAX_TOTAL_BYTES", 10_000)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as z:
+        for i in range(3):
+            z.writestr(f"resume-{i}.pdf", b"%PDF-1.4 " + b"0" * 6_000)
+
+    response = client.post("/api/batch/resumes", files=[("files", ("resumes.zip", archive.getvalue(), "application/zip"))])
+
+    assert len(archive.getvalue()) < 10_000
+    assert response.status_code == 413
+
+
+def test_batch_upload_past_the_total_size_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(batch_routes, "BATCH_MAX_TOTAL_BYTES", 10_000)
+    files = [("files", (f"resume-{i}.pdf", b"%PDF-1.4 " + b"0" * 4_000, "application/pdf")) for i in range(3)]
+
+    response = client.post("/api/batch/resumes", files=files)
+
+    assert response.status_code == 413
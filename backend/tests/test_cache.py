@@ -0,0 +1,31 @@
+# backend/tests/test_cache.py
+import asyncio
+import threading
+
+from app.cache import ResponseCache
+
+
+def test_async_lookups_read_the_second_tier_off_the_event_loop(tmp_path):
+    cache = ResponseCache(8, 3600, db_path=str(tmp_path / "cache.db"))
+    threads = []
+    tier_get = cache._disk.get
+
+    def recording_get(key, min_created_at):
+        threads.append(threading.get_ident())
+        return tier_get(key, min_created_at)
+
+    cache._disk.get = recording_get
+
+    async def lookups():
+        loop_thread = threading.get_ident()
+        await cache.aset("other", {"answer": 2})
+        cache._entries.clear()  # as in another worker: only the file has the entries
+        assert await cache.aget("other", "todo") == {"answer": 2}
+        # Now in memory: served without touching the file.
+        assert await cache.aget("other", "todo") == {"answer": 2}
+        assert await cache.aget("missing", "todo") is None
+        return loop_thread
+
+    loop_thread = asyncio.run(lookups())
+    assert len(threads) == 2 and loop_thread not in threads
+    assert cache.stats()["endpoints"]["todo"] == {"hits": 1, "disk_hits": 1, "misses": 1}
@@ -0,0 +1,85 @@
+# backend/tests/test_chat_stream.py
+import json
+import asyncio
+
+from app import services
+
+
+def _frames(body: str) -> list:
+    """(event, data) for each SSE frame, heartbeats skipped."""
+    frames = []
+    for frame in body.split("\n\n"):
+        lines = [line for line in frame.split("\n") if line and not line.startswith(":")]
+        if not lines:
+            continue
+        event = next((line[7:] for line in lines if line.startswith("event: ")), "message")
+        data = "".join(line[6:] for line in lines if line.startswith("data: "))
+        frames.append((event, json.loads(data)))
+    return frames
+
+
+def test_chat_stream_failure_ends_with_an_error_event(client, monkeypatch):
+    async def failing_model(system_instruction, history, message):
+        yield "Start with the basics, "
+        raise RuntimeError("connection reset by the model")
+
+    monkeypatch.setattr(services, "stream_chat_message", failing_model)
+    messages = [{"role": "user", "content": "What should I expect in a systems design round for juniors?"}]
+
+    response = client.post("/api/chat", json={"messages": messages})
+
+    frames = _frames(response.text)
+    assert frames[0] == ("message", "Start with the basics, ")
+    assert frames[1][0] == "error"
+    assert "error occurred" in frames[1][1]["detail"]
+    assert all(event != "message" for event, _ in frames[1:])
+
+
+def test_sse_stream_turns_an_upstream_exception_into_an_error_event(monkeypatch):
+    from app import sse
+    from app.lifecycle import StreamDrain
+
+    # The app's drain events belong to the test client's event loop.
+    monkeypatch.setattr(sse, "stream_drain", StreamDrain())
+
+    class ConnectedRequest:
+        async def is_disconnected(self):
+            return False
+
+    async def chunks():
+        yield "partial"
+        raise RuntimeError("upstream broke")
+
+    async def collect():
+        return "".join([frame async for frame in sse.sse_stream(ConnectedRequest(), chunks())])
+
+    frames = _frames(asyncio.run(collect()))
+    assert [event for event, _ in frames] == ["message", "error"]
+
+
+def test_chat_reservation_is_released_when_the_stream_is_dropped_unread():
+    from starlette.requests import Request
+    from app import api
+    from app.schemas import ChatPayload
+    from app.usage import Account, current_account, usage_ledger
+
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}, "method": "POST", "path": "/api/chat", "headers": []}
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def gone(message):
+        raise OSError("client went away")
+
+    async def drop_unread():
+        current_account.set(Account("ip:dropped-chat", None, budget=100_000))
+        payload = ChatPayload(messages=[{"role": "user", "content": "Tell me about yourself."}])
+        response = await api.handle_chat(payload, Request(scope, receive), current_user=None)
+        assert usage_ledger.window.used("ip:dropped-chat") > 0
+        try:
+            await response(scope, receive, gone)
+        except Exception:
+            pass
+        return usage_ledger.window.used("ip:dropped-chat")
+
+    assert asyncio.run(drop_unread()) == 0
@@ -0,0 +1,40 @@
+# backend/tests/test_db.py
+import tempfile
+import threading
+
+from sqlalchemy import create_engine, text
+
+from app.db import _engine_options
+
+
+def test_in_memory_sqlite_is_one_database_across_threads():
+    engine = create_engine("sqlite:///:memory:", **_engine_options("sqlite:///:memory:"))
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE notes (body TEXT)"))
+        connection.execute(text("INSERT INTO notes VALUES ('hello')"))
+
+    # Request handlers run on threadpool threads, not the thread that created the schema.
+    seen = []
+    def read():
+        with engine.connect() as connection:
+            seen.append(connection.execute(text("SELECT body FROM notes")).scalar())
+    thread = threading.Thread(target=read)
+    thread.start()
+    thread.join()
+
+    assert seen == ["hello"]
+
+
+def test_migration_lock_follows_the_database_not_the_working_directory(tmp_path, monkeypatch):
+    from app.migrations import _lock_path
+
+    (tmp_path / "elsewhere").mkdir()
+    monkeypatch.chdir(tmp_path)
+    relative = _lock_path(create_engine("sqlite:///./app.db"))
+    monkeypatch.chdir(tmp_path / "elsewhere")
+    absolute = _lock_path(create_engine(f"sqlite:///{tmp_path}/app.db"))
+
+    assert relative == absolute == f"{tmp_path}/app.db.migrations.lock"
+    # No file to sit next to: a lock in the temp dir, the same for the same URL.
+    assert _lock_path(create_engine("sqlite://")).startswith(tempfile.gettempdir())
+    assert _lock_path(create_engine("sqlite://")) == _lock_path(create_engine("sqlite://"))
@@ -0,0 +1,17 @@
+# backend/tests/test_json_stream.py
+import pytest
+from app.json_stream import parse_model_json
+
+
+def test_parse_model_json_repairs_wrapped_and_truncated_output():
+    document = '{"analysis": {"summary": "ok", "tips": ["a", "b"]}}'
+    assert parse_model_json(document) == ({"analysis": {"summary": "ok", "tips": ["a", "b"]}}, False)
+    assert parse_model_json(f"Here it is:\n```json\n{document}\n```") == (parse_model_json(document)[0], True)
+
+    # A brace after the document defeats the bracket span; the scan still finds the document.
+    assert parse_model_json(f"{document}\nSee {{notes}}.") == (parse_model_json(document)[0], True)
+    # Cut inside an array: the half-written array is dropped and the rest closed.
+    assert parse_model_json(document[:-12]) == ({"analysis": {"summary": "ok"}}, True)
+
+    with pytest.raises(ValueError):
+        parse_model_json("no json here")
@@ -0,0 +1,30 @@
+# backend/tests/test_results.py
+from datetime import datetime, timedelta, timezone
+
+
+def test_since_and_until_with_utc_offset(client, auth_headers):
+    created = client.post("/api/users/results", json={"category": "dsa", "score": 8}, headers=auth_headers)
+    assert created.status_code == 201
+    created_at = datetime.fromisoformat(created.json()["created_at"]).replace(tzinfo=timezone.utc)
+    ist = timezone(timedelta(hours=5, minutes=30))
+
+    # 30 minutes before the result, written in a +05:30 offset: naively that is hours later.
+    since = (created_at - timedelta(minutes=30)).astimezone(ist).isoformat()
+    listed = client.get("/api/users/results", params={"since": since}, headers=auth_headers).json()
+    assert [r["score"] for r in listed["results"]] == [8]
+    stats = client.get("/api/users/results/stats", params={"since": since}, headers=auth_headers).json()
+    assert [s["count"] for s in stats["stats"]] == [1]
+
+    until = (created_at - timedelta(minutes=1)).astimezone(timezone(timedelta(hours=-7))).isoformat()
+    assert client.get("/api/users/results", params={"until": until}, headers=auth_headers).json()["results"] == []
+
+
+def test_stats_etag_changes_while_a_result_is_pending(client, auth_headers, monkeypatch):
+    from app.write_behind import write_behind
+
+    etag = client.get("/api/users/results/stats", headers=auth_headers).headers["etag"]
+    assert client.get("/api/users/results/stats", headers={**auth_headers, "If-None-Match": etag}).status_code == 304
+
+    # A result queued by write-behind: the cached stats must not be confirmed as current.
+    monkeypatch.setattr(write_behind, "pending_marker", lambda user_id: (1, 1))
+    assert client.get("/api/users/results/stats", headers={**auth_headers, "If-None-Match": etag}).status_code == 200
@@ -0,0 +1,21 @@
+# backend/tests/test_semantic_cache.py
+from app.semantic_cache import SEMANTIC_CACHE_PROMPTS, semantic_cache
+
+
+def _hits() -> int:
+    return semantic_cache.stats()["prompts"].get("mental_health", {}).get("hits", 0)
+
+
+def test_check_ins_are_served_from_the_semantic_cache_unless_the_user_opts_out(client, auth_headers):
+    assert SEMANTIC_CACHE_PROMPTS >= {"interview", "mental_health"}
+    hits = _hits()
+
+    first = client.post("/api/analyze-mental-health", json={"text": "I feel anxious before my exams"}, headers=auth_headers)
+    again = client.post("/api/analyze-mental-health", json={"text": "i feel anxious before my exams!"}, headers=auth_headers)
+    assert first.status_code == again.status_code == 200
+    assert again.json() == first.json() and _hits() == hits + 1
+
+    response = client.patch("/api/users/me/settings", json={"semantic_cache_enabled": False}, headers=auth_headers)
+    assert response.status_code == 200
+    client.post("/api/analyze-mental-health", json={"text": "I feel anxious before my exams."}, headers=auth_headers)
+    assert _hits() == hits + 1
@@ -0,0 +1,51 @@
+# backend/tests/test_usage.py
+import asyncio
+
+import pytest
+
+from app.shared_state import SQLiteState
+from app.usage import Account, QuotaExceededError, UsageLedger, current_account
+
+
+def _ledger(store=None) -> UsageLedger:
+    return UsageLedger(window_seconds=3600, flush_seconds=30, store=store)
+
+
+async def _admit_all(ledger: UsageLedger, requests: int, tokens: int) -> list:
+    async def one():
+        try:
+            await ledger.admit(tokens)
+            return "admitted"
+        except QuotaExceededError:
+            return "rejected"
+
+    current_account.set(Account("user:1", None, budget=1000))
+    return await asyncio.gather(*(one() for _ in range(requests)))
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_concurrent_admits_cannot_overspend_budget(shared, tmp_path):
+    store = SQLiteState(str(tmp_path / "state.db")) if shared else None
+    ledger = _ledger(store)
+    outcomes = asyncio.run(_admit_all(ledger, requests=10, tokens=300))
+    assert outcomes.count("admitted") == 3
+    assert outcomes.count("rejected") == 7
+    assert ledger.window.used("user:1") == pytest.approx(900)
+
+
+def test_record_charges_only_difference_from_reservation():
+    ledger = _ledger()
+
+    async def request(actual: int):
+        await ledger.admit(300)
+        ledger.record("resume", actual, 0, 0.1)
+        ledger.release()
+
+    async def run():
+        current_account.set(Account("user:1", None, budget=1000))
+        await request(100)
+        assert ledger.window.used("user:1") == pytest.approx(100)
+        await request(450)
+        assert ledger.window.used("user:1") == pytest.approx(550)
+
+    asyncio.run(run())
@@ -15,17 +15,21 @@ export default function ResultsChart() {
     if (!token) return;
     setLoading(true);
     try {
-      const res = await fetch(`${API_BASE_URL}/api/users/results`, {
+      // Daily averages are aggregated server-side, so the chart never downloads the full history.
+      const res = await fetch(`${API_BASE_URL}/api/users/results/stats?bucket=day`, {
         headers: { Authorization: `Bearer ${token}` },
       });
       if (!res.ok) throw new Error("Failed to fetch results");
       const json = await res.json();
-      const mapped = json.results.map((r) => ({
-        id: r.id,
-        category: r.category,
-        score: r.score,
-        created_at: new Date(r.created_at).toLocaleDateString(),
-      }));
+      const mapped = json.stats
+        .slice()
+        .sort((a, b) => a.bucket.localeCompare(b.bucket))
+        .map((s) => ({
+          id: `${s.category}-${s.bucket}`,
+          category: s.category,
+          score: Math.round(s.avg * 10) / 10,
+          created_at: new Date(`${s.bucket}T00:00:00`).toLocaleDateString(),
+        }));
       setData(mapped);
     } catch (err) {
       console.error(err);
@@ -14,6 +14,9 @@ export default function ChatView() {
   const [input, setInput] = useState("");
   const [loading, setLoading] = useState(true);
   const endRef = useRef(null);
+  // How much of the conversation the server already has, so saves only send new turns.
+  const savedCountRef = useRef(0);
+  const lastSeqRef = useRef(0);
   const { token } = useContext(AuthContext);
 
   const {
@@ -46,7 +49,11 @@ export default function ChatView() {
         if (res.ok) {
           const data = await res.json();
           setMessages(data.messages);
+          savedCountRef.current = data.messages.length;
+          lastSeqRef.current = data.last_seq;
         } else {
+          savedCountRef.current = 0;
+          lastSeqRef.current = 0;
           setMessages([{ role: "assistant", content: "Hi — I'm MentorBot. Tell me the role/company and we'll start mock questions." }]);
         }
       } catch (error) {
@@ -65,15 +72,41 @@ export default function ChatView() {
 
   const saveConversation = async (updatedMessages) => {
     if (!token) return;
+    const newMessages = updatedMessages
+      .slice(savedCountRef.current)
+      .map(({ role, content }) => ({ role, content }));
+    if (newMessages.length === 0) return;
+    const headers = {
+      "Content-Type": "application/json",
+      Authorization: `Bearer ${token}`,
+    };
     try {
-      await fetch("http://127.0.0.1:8000/api/users/conversation", {
+      const res = await fetch(`http://127.0.0.1:8000/api/users/conversation/${CHAT_CATEGORY}/messages`, {
         method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-          Authorization: `Bearer ${token}`,
-        },
-        body: JSON.stringify({ category: CHAT_CATEGORY, messages: updatedMessages }),
+        headers,
+        body: JSON.stringify({
+          messages: newMessages,
+          after_seq: lastSeqRef.current,
+          idempotency_key: crypto.randomUUID(),
+        }),
       });
+      let data;
+      if (res.status === 409) {
+        // Another tab changed the conversation; fall back to saving the full history.
+        const full = await fetch("http://127.0.0.1:8000/api/users/conversation", {
+          method: "POST",
+          headers,
+          body: JSON.stringify({ category: CHAT_CATEGORY, messages: updatedMessages }),
+        });
+        if (!full.ok) throw new Error("Failed to save conversation");
+        data = await full.json();
+      } else if (res.ok) {
+        data = await res.json();
+      } else {
+        throw new Error("Failed to save conversation");
+      }
+      savedCountRef.current = updatedMessages.length;
+      lastSeqRef.current = data.last_seq;
     } catch (error) {
       console.error("Failed to save conversation", error);
     }
@@ -100,19 +133,48 @@ export default function ChatView() {
     try {
       const res = await fetch("http://127.0.0.1:8000/api/chat", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ messages: newMessages }),
+        headers: {
+          "Content-Type": "application/json",
+          // Lets the server keep this conversation's rolling summary with the account.
+          ...(token ? { Authorization: `Bearer ${token}` } : {}),
+        },
+        body: JSON.stringify({
+          category: CHAT_CATEGORY,
+          messages: newMessages.map(({ role, content }) => ({ role, content })),
+        }),
       });
-      
+      // A 429 means the usage limit was reached; the reply is never started.
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+
       const reader = res.body.getReader();
       const decoder = new TextDecoder();
       let accumulatedResponse = "";
+      let buffer = "";
+      let finished = false;
 
-      while (true) {
+      // The server sends SSE frames separated by a blank line: "data:" frames carry
+      // JSON-encoded text, ":" lines are heartbeats and "event: done" ends the reply;
+      // "event: error" means the reply was cut off (e.g. the server is restarting).
+      while (!finished) {
         const { done, value } = await reader.read();
         if (done) break;
-        accumulatedResponse += decoder.decode(value, { stream: true });
-        
+        buffer += decoder.decode(value, { stream: true });
+
+        const frames = buffer.split("\n\n");
+        buffer = frames.pop();
+        for (const frame of frames) {
+          let event = "message";
+          let data = "";
+          for (const line of frame.split("\n")) {
+            if (line.startsWith("event: ")) event = line.slice(7);
+            else if (line.startsWith("data: ")) data += line.slice(6);
+          }
+          if (event === "done") { finished = true; break; }
+          if (!data) continue;
+          if (event === "error") throw new Error(JSON.parse(data).detail);
+          accumulatedResponse += JSON.parse(data);
+        }
+
         setMessages(prev => {
             const updated = [...prev];
             updated[assistantMessageIndex] = { role: 'assistant', content: accumulatedResponse };
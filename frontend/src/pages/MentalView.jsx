@@ -2,6 +2,8 @@
 import React, { useState, useEffect } from "react";
 import { useSpeechRecognition } from "../hooks/useSpeechRecognition";
 import { MicrophoneButton } from "../components/MicrophoneButton";
+import { useAuth } from "../context/AuthProvider";
+import { readSSE, setPath } from "../utils/sse";
 
 const CardShell = ({ children }) => <div className="p-6 bg-gradient-to-b from-white/3 to-white/2 rounded-2xl border border-white/6 shadow-2xl">{children}</div>;
 
@@ -9,6 +11,7 @@ const MENTAL_TEXT_KEY = 'mental_view_text';
 const MENTAL_ANALYSIS_KEY = 'mental_view_analysis';
 
 export default function MentalView() {
+  const { token } = useAuth();
   const [text, setText] = useState(() => localStorage.getItem(MENTAL_TEXT_KEY) || "");
   const [loading, setLoading] = useState(false);
   const [analysis, setAnalysis] = useState(() => {
@@ -62,14 +65,25 @@ export default function MentalView() {
     setError(null);
     setAnalysis(null);
     try {
-      const res = await fetch("http://127.0.0.1:8000/api/analyze-mental-health", {
+      const res = await fetch("http://127.0.0.1:8000/api/analyze-mental-health/stream", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        // Signed-in users' model usage counts towards their own limit, not a shared anonymous one.
+        headers: { "Content-Type": "application/json", ...(token ? { Authorization: `Bearer ${token}` } : {}) },
         body: JSON.stringify({ text }),
       });
       if (!res.ok) throw new Error(`HTTP ${res.status}`);
-      const data = await res.json();
-      setAnalysis(data);
+      // Fields arrive one at a time ("field"), then the validated whole ("result").
+      let partial = null;
+      await readSSE(res, (event, data) => {
+        if (event === "field") {
+          partial = setPath(partial, data.path, data.value);
+          setAnalysis(partial);
+        } else if (event === "result") {
+          setAnalysis(data);
+        } else if (event === "error") {
+          throw new Error(data.detail);
+        }
+      });
     } catch (err) {
       setError(err.message);
     } finally {
@@ -128,7 +142,7 @@ export default function MentalView() {
             <div className="p-4 bg-black/40 rounded-xl border border-white/6">
               <h4 className="font-semibold">Suggestions</h4>
               <ul className="list-disc list-inside mt-2 text-white/70">
-                {analysis.analysis.suggestions.map((s, i) => (
+                {(analysis.analysis.suggestions || []).map((s, i) => (
                   <li key={i}>{s}</li>
                 ))}
               </ul>
@@ -1,11 +1,12 @@
 // frontend/src/pages/ResumeView.jsx
 import React, { useState, useEffect, useRef } from "react";
 import { useAuth } from "../context/AuthProvider";
+import { readSSE, setPath } from "../utils/sse";
 
 const CardShell = ({ children }) => <div className="p-6 bg-gradient-to-b from-white/3 to-white/2 rounded-2xl border border-white/6 shadow-2xl">{children}</div>;
 
 export default function ResumeView() {
-  const { user } = useAuth();
+  const { user, token } = useAuth();
   const RESUME_ANALYSIS_KEY = `resume_view_analysis_${user?.id}`;
 
   const [file, setFile] = useState(null);
@@ -57,10 +58,24 @@ export default function ResumeView() {
     const form = new FormData();
     form.append("file", file);
     try {
-      const res = await fetch("http://127.0.0.1:8000/api/analyze-resume", { method: "POST", body: form });
+      const res = await fetch("http://127.0.0.1:8000/api/analyze-resume/stream", {
+        method: "POST",
+        headers: token ? { Authorization: `Bearer ${token}` } : {},
+        body: form,
+      });
       if (!res.ok) throw new Error(`HTTP ${res.status}`);
-      const data = await res.json();
-      setAnalysis(data.analysis || data);
+      // Fields arrive one at a time ("field"), then the validated whole ("result").
+      let partial = null;
+      await readSSE(res, (event, data) => {
+        if (event === "field") {
+          partial = setPath(partial, data.path, data.value);
+          setAnalysis(partial.analysis || partial);
+        } else if (event === "result") {
+          setAnalysis(data.analysis || data);
+        } else if (event === "error") {
+          throw new Error(data.detail);
+        }
+      });
     } catch (err) {
       setError(err.message || "An error occurred during analysis.");
     } finally {
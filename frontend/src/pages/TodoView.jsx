@@ -3,6 +3,8 @@ import React, { useState, useEffect } from "react";
 import { motion } from "framer-motion";
 import { useSpeechRecognition } from "../hooks/useSpeechRecognition";
 import { MicrophoneButton } from "../components/MicrophoneButton";
+import { useAuth } from "../context/AuthProvider";
+import { readSSE, setPath } from "../utils/sse";
 
 const CardShell = ({ children }) => <div className="p-6 bg-gradient-to-b from-white/3 to-white/2 rounded-2xl border border-white/6 shadow-2xl">{children}</div>;
 
@@ -10,6 +12,7 @@ const TODO_TEXT_KEY = 'todo_view_text';
 const TODO_RESULT_KEY = 'todo_view_result';
 
 export default function TodoView() {
+  const { token } = useAuth();
   const [text, setText] = useState(() => localStorage.getItem(TODO_TEXT_KEY) || "");
   const [loading, setLoading] = useState(false);
   const [result, setResult] = useState(() => {
@@ -63,14 +66,25 @@ export default function TodoView() {
     setError(null);
     setResult(null);
     try {
-      const res = await fetch("http://127.0.0.1:8000/api/generate-todo", {
+      const res = await fetch("http://127.0.0.1:8000/api/generate-todo/stream", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        // Signed-in users' model usage counts towards their own limit, not a shared anonymous one.
+        headers: { "Content-Type": "application/json", ...(token ? { Authorization: `Bearer ${token}` } : {}) },
         body: JSON.stringify({ text }),
       });
       if (!res.ok) throw new Error(`HTTP ${res.status}`);
-      const json = await res.json();
-      setResult(json);
+      // Fields arrive one at a time ("field"), then the validated whole ("result").
+      let partial = null;
+      await readSSE(res, (event, data) => {
+        if (event === "field") {
+          partial = setPath(partial, data.path, data.value);
+          setResult(partial);
+        } else if (event === "result") {
+          setResult(data);
+        } else if (event === "error") {
+          throw new Error(data.detail);
+        }
+      });
     } catch (err) {
       setError(err.message);
     } finally {
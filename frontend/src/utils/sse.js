@@ -0,0 +1,40 @@
+// frontend/src/utils/sse.js
+
+// Reads a text/event-stream response, calling onEvent(event, data) for each frame with
+// its JSON data parsed. Heartbeat (":") lines are skipped; "done" ends the stream.
+export async function readSSE(res, onEvent) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) return;
+    buffer += decoder.decode(value, { stream: true });
+    const frames = buffer.split("\n\n");
+    buffer = frames.pop();
+    for (const frame of frames) {
+      let event = "message";
+      let data = "";
+      for (const line of frame.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      if (event === "done") {
+        reader.cancel();
+        return;
+      }
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
+}
+
+// Returns a copy of obj with value set at path (object keys and array indexes),
+// creating the objects and arrays along the way.
+export function setPath(obj, path, value) {
+  if (path.length === 0) return value;
+  const [key, ...rest] = path;
+  const copy = Array.isArray(obj) ? [...obj] : { ...(obj || {}) };
+  const child = copy[key] ?? (typeof rest[0] === "number" ? [] : {});
+  copy[key] = setPath(child, rest, value);
+  return copy;
+}